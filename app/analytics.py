@@ -1,28 +1,222 @@
-import pandas as pd
+# analytics.py
+#
+# Usage log plus streaming, time-bucketed rollups over it.
+#
+# log_usage() appends one CSV line per recommendation session to
+# usage_data.csv. update_rollups() folds the part of the log it has not seen
+# yet into usage_rollups.json. It reads the log in fixed-size byte chunks,
+# aggregates each chunk with pandas, and stores per-day buckets:
+#   sessions      sessions per hour of the day (24 counts)
+#   top_matches   how often each title was the top match
+#   match_score   count and sum of the top match scores
+#   riasec        per education level, session count and RIASEC sums (centroids)
+#   skills        how often each skill was selected
+# Like feedback_aggregates.json, the rollups file records the byte offset of
+# the log it covers. A log that shrank is replayed from the start, and an
+# update only ever reads the bytes appended since the last one.
+
+import csv
+import io
+import json
 import os
 from datetime import datetime
 
+import numpy as np
+import pandas as pd
+
 USAGE_LOG = "usage_data.csv"
+ROLLUPS_PATH = "usage_rollups.json"
+RIASEC_COLUMNS = ["R", "I", "A", "S", "E", "C"]
+USAGE_COLUMNS = ["timestamp", "session_id", "user_name"] + RIASEC_COLUMNS + [
+    "education", "skills", "top_match", "match_score"
+]
+SKILL_SEPARATOR = ", "
+# Education choices as app.py offers and logs them; a profile's education_level is (position + 1) / 8
+EDUCATION_LEVELS = [
+    "Less than High School", "High School Diploma or Equivalent", "Some College Courses",
+    "Associate Degree", "Bachelor's Degree", "Master's Degree",
+    "Doctoral or Professional Degree", "Post-Doctoral Training",
+]
+CHUNK_BYTES = 4 << 20  # log bytes aggregated per pandas chunk
 
 def log_usage(session_id, user_name, riasec_scores, education, skills, top_match, match_score):
-    data = {
-        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-        "session_id": session_id,
-        "user_name": user_name,
-        **riasec_scores,  # dictionary with R, I, A, S, E, C
-        "education": education,
-        "skills": ", ".join(skills),
-        "top_match": top_match,
-        "match_score": match_score,
-    }
-
-    df = pd.DataFrame([data])
-    if os.path.exists(USAGE_LOG):
-        df.to_csv(USAGE_LOG, mode='a', header=False, index=False)
-    else:
-        df.to_csv(USAGE_LOG, mode='w', header=True, index=False)
+    row = [
+        datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        session_id,
+        user_name,
+        *(riasec_scores[trait] for trait in RIASEC_COLUMNS),
+        education,
+        SKILL_SEPARATOR.join(skills),
+        top_match,
+        match_score,
+    ]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if not os.path.exists(USAGE_LOG) or os.path.getsize(USAGE_LOG) == 0:
+        writer.writerow(USAGE_COLUMNS)
+    writer.writerow(row)
+    # One write per session, so concurrent appends do not interleave
+    with open(USAGE_LOG, "a", encoding="utf-8", newline="") as f:
+        f.write(buffer.getvalue())
 
 def load_usage_data():
     if os.path.exists(USAGE_LOG):
         return pd.read_csv(USAGE_LOG)
     return pd.DataFrame()
+
+
+# --- Rollups ---
+def _empty_bucket():
+    return {"sessions": [0] * 24, "top_matches": {}, "match_score": [0, 0.0], "riasec": {}, "skills": {}}
+
+
+def _add_counts(counts, series):
+    for key, n in series.items():
+        counts[key] = counts.get(key, 0) + int(n)
+
+
+class UsageRollups:
+    """Per-day usage rollups covering the first ``log_offset`` bytes of the usage log."""
+
+    def __init__(self, days=None, log_offset=0):
+        self.days = days or {}
+        self.log_offset = log_offset
+
+    def add_chunk(self, chunk):
+        """Fold a DataFrame of usage log rows into the day buckets."""
+        timestamps = pd.to_datetime(chunk["timestamp"], errors="coerce")
+        chunk = chunk.assign(day=timestamps.dt.strftime("%Y-%m-%d"), hour=timestamps.dt.hour)
+        chunk = chunk[timestamps.notna()]
+        for day, rows in chunk.groupby("day"):
+            bucket = self.days.setdefault(day, _empty_bucket())
+
+            hours = np.bincount(rows["hour"].astype(int), minlength=24)
+            bucket["sessions"] = [int(n) for n in np.add(bucket["sessions"], hours)]
+
+            _add_counts(bucket["top_matches"], rows["top_match"].dropna().value_counts())
+
+            scores = pd.to_numeric(rows["match_score"], errors="coerce").dropna()
+            bucket["match_score"][0] += int(scores.size)
+            bucket["match_score"][1] += float(scores.sum())
+
+            riasec = rows[RIASEC_COLUMNS].apply(pd.to_numeric, errors="coerce")
+            riasec["education"] = rows["education"].fillna("Unknown").astype(str)
+            riasec = riasec.dropna()
+            for education, group in riasec.groupby("education"):
+                entry = bucket["riasec"].setdefault(education, {"count": 0, "sum": [0.0] * len(RIASEC_COLUMNS)})
+                entry["count"] += len(group)
+                entry["sum"] = [float(x) for x in np.add(entry["sum"], group[RIASEC_COLUMNS].sum().to_numpy())]
+
+            skills = rows["skills"].dropna().astype(str)
+            skills = skills[skills != ""].str.split(SKILL_SEPARATOR).explode()
+            _add_counts(bucket["skills"], skills.value_counts())
+
+    # --- Queries (all accept an optional inclusive 'YYYY-MM-DD' range) ---
+    def _buckets(self, since=None, until=None):
+        for day, bucket in sorted(self.days.items()):
+            if (since is None or day >= since) and (until is None or day <= until):
+                yield day, bucket
+
+    def sessions_per_hour(self, since=None, until=None):
+        """Session counts indexed by hour (a Timestamp), hours without traffic omitted."""
+        counts = {
+            pd.Timestamp(day) + pd.Timedelta(hours=hour): n
+            for day, bucket in self._buckets(since, until)
+            for hour, n in enumerate(bucket["sessions"]) if n
+        }
+        return pd.Series(counts, name="sessions", dtype=int)
+
+    def top_matches(self, n=10, since=None, until=None):
+        counts = {}
+        for _, bucket in self._buckets(since, until):
+            _add_counts(counts, bucket["top_matches"])
+        return pd.Series(counts, name="sessions", dtype=int).sort_values(ascending=False, kind="stable").head(n)
+
+    def mean_match_score(self, since=None, until=None):
+        count = total = 0
+        for _, bucket in self._buckets(since, until):
+            count += bucket["match_score"][0]
+            total += bucket["match_score"][1]
+        return total / count if count else None
+
+    def riasec_centroids(self, since=None, until=None):
+        """Mean RIASEC profile per education level, with the number of sessions behind it."""
+        counts, sums = {}, {}
+        for _, bucket in self._buckets(since, until):
+            for education, entry in bucket["riasec"].items():
+                counts[education] = counts.get(education, 0) + entry["count"]
+                sums[education] = np.add(sums.get(education, 0.0), entry["sum"])
+        centroids = pd.DataFrame(
+            [sums[education] / counts[education] for education in counts],
+            index=list(counts), columns=RIASEC_COLUMNS
+        )
+        centroids["sessions"] = pd.Series(counts)
+        return centroids
+
+    def skill_frequencies(self, n=None, since=None, until=None):
+        counts = {}
+        for _, bucket in self._buckets(since, until):
+            _add_counts(counts, bucket["skills"])
+        frequencies = pd.Series(counts, name="selections", dtype=int).sort_values(ascending=False, kind="stable")
+        return frequencies if n is None else frequencies.head(n)
+
+    def save(self, path=ROLLUPS_PATH):
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"log_offset": self.log_offset, "days": self.days}, f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path=ROLLUPS_PATH):
+        """The saved rollups, or None if the file is missing or unreadable."""
+        try:
+            with open(path, encoding="utf-8") as f:
+                saved = json.load(f)
+            return cls(saved["days"], saved["log_offset"])
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+
+def update_rollups(log_path=USAGE_LOG, rollups_path=ROLLUPS_PATH, chunk_bytes=CHUNK_BYTES):
+    """
+    Bring the saved rollups up to date with the usage log and return them.
+
+    Only complete lines appended since the last update are read, one
+    ``chunk_bytes`` block at a time. Concurrent updaters are harmless: each
+    covers a log prefix, and the file is replaced atomically.
+    """
+    rollups = UsageRollups.load(rollups_path)
+    log_size = os.path.getsize(log_path) if os.path.exists(log_path) else 0
+    if rollups is None or rollups.log_offset > log_size:
+        rollups = UsageRollups()
+    if rollups.log_offset == log_size:
+        return rollups
+
+    with open(log_path, "rb") as f:
+        header = next(csv.reader([f.readline().decode("utf-8")]), None)
+        if not header:
+            return rollups
+        position = max(rollups.log_offset, f.tell())
+        f.seek(position)
+        carry = b""
+        while position < log_size:
+            block = f.read(min(chunk_bytes, log_size - position))
+            if not block:
+                break
+            position += len(block)
+            block = carry + block
+            end = block.rfind(b"\n") + 1  # a partial last line waits for the next block or update
+            carry = block[end:]
+            if end:
+                chunk = pd.read_csv(io.BytesIO(block[:end]), names=header, header=None, dtype=str,
+                                    keep_default_na=False, na_values=[""], on_bad_lines="skip")
+                rollups.add_chunk(chunk)
+        rollups.log_offset = position - len(carry)
+
+    rollups.save(rollups_path)
+    return rollups
+
+
+def load_usage_rollups():
+    """Up-to-date usage rollups; the cost is proportional to traffic since the last call."""
+    return update_rollups()
@@ -6,3 +6,6 @@ def log_usage(*args, **kwargs):
 
 def load_usage_data():
     return []  # Return empty list or DataFrame
+
+def load_usage_rollups():
+    return None  # No usage log, so no rollups to show
@@ -1,50 +1,37 @@
 # --- Required Libraries ---
-import streamlit as st
-from recommender_engine import generate_recommendations
-import numpy as np
-import pandas as pd
-import altair as alt
+# Keep this list light: it runs on every rerun. Charting libraries (altair,
+# plotly) are imported inside the sections that draw with them.
+import time
+_page_started = time.perf_counter()
+
 import os
 import re
-import json
-import random
-import plotly.graph_objects as go
-from sklearn.metrics.pairwise import cosine_similarity
-from datetime import datetime
-import time
 import uuid
-from feedback import save_feedback, get_average_rating, load_all_feedback
+
+import streamlit as st
+from recommender_engine import ScoringSession, adjacent_careers, get_catalog, profile_from_job, recommend, result_cache
+from title_index import suggest_titles
+import metrics
+import pandas as pd
+from feedback import save_feedback, get_average_rating, load_feedback_aggregates, load_recent_feedback, iter_feedback_csv
 try:
-    from analytics import log_usage, load_usage_data
+    from analytics import log_usage, load_usage_rollups
 except ImportError:
-    from analytics_stub import log_usage, load_usage_data
-
-FEEDBACK_FILE = "feedback.csv"
-
-def save_feedback(rating, comment, session_id, user_name=None):
-    feedback_entry = {
-        "timestamp": datetime.now().isoformat(),
-        "session_id": session_id,
-        "user_name": user_name if user_name else "Anonymous",
-        "rating": rating,
-        "comment": comment
-    }
+    from analytics_stub import log_usage, load_usage_rollups
 
-    if os.path.exists(FEEDBACK_FILE):
-        df = pd.read_csv(FEEDBACK_FILE)
-        df = pd.concat([df, pd.DataFrame([feedback_entry])], ignore_index=True)
-    else:
-        df = pd.DataFrame([feedback_entry])
+# --- Render Budget ---
+# Each full script run is recorded as "render.page" (the first run of a browser
+# session as "render.startup"), and each fragment rerun as "render.fragment.*".
+# The admin Stage Latency table compares their p95 against these budgets.
+STARTUP_BUDGET_MS = float(os.environ.get("SMARTPATH_STARTUP_BUDGET_MS", 1500))
+RERUN_BUDGET_MS = float(os.environ.get("SMARTPATH_RERUN_BUDGET_MS", 300))
 
-    df.to_csv(FEEDBACK_FILE, index=False)
+# Fragments rerun on their own when a widget inside them changes, instead of the whole page
+fragment = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None) or (lambda func: func)
 
-def get_average_rating():
-    if os.path.exists(FEEDBACK_FILE):
-        df = pd.read_csv(FEEDBACK_FILE)
-        if not df.empty:
-            return round(df["rating"].mean(), 2)
-    return None
-session_id = str(uuid.uuid4())
+# Stage timings are written to metrics.prom periodically when SMARTPATH_METRICS=1
+if metrics.is_enabled():
+    metrics.start_exporter()
 
 # --- Page Config ---
 st.set_page_config(
@@ -55,15 +42,254 @@ st.set_page_config(
 )
 
 # --- Load Metadata ---
+# One catalog per rerun: a snapshot activated meanwhile is picked up on the next rerun
+catalog = get_catalog()
+
 @st.cache_data
-def load_metadata():
-    df = pd.read_csv("data/job_profiles_clean.csv")
-    skill_cols = [c for c in df.columns if c.startswith("Skill List_")]
-    skill_options = [c.replace("Skill List_", "") for c in skill_cols]
-    max_edu_norm = df["Normalized Education Score"].max()
+def load_metadata(version, _catalog):
+    catalog = _catalog
+    skill_cols = list(catalog.skill_cols)
+    skill_options = catalog.skill_options
+    max_edu_norm = float(catalog.education_scores.max())
     return skill_cols, skill_options, max_edu_norm
 
-skill_cols, skill_options, max_edu_norm = load_metadata()
+skill_cols, skill_options, max_edu_norm = load_metadata(catalog.version, catalog)
+
+
+# --- Sections ---
+def render_breakdown(results):
+    import altair as alt
+
+    st.markdown("### 📊 Hybrid Recommendation Score Breakdown (Top 5 Careers)")
+
+    melted = results.head(5).melt(
+        id_vars=["Title"],
+        value_vars=["User RIASEC Similarity", "Normalized Education Score", "User Skill Similarity"],
+        var_name="Metric",
+        value_name="Score"
+    )
+
+    color_map = {
+        "User RIASEC Similarity": "#1f77b4",
+        "Normalized Education Score": "#2ca02c",
+        "User Skill Similarity": "#ff7f0e"
+    }
+
+    chart = alt.Chart(melted).mark_bar().encode(
+        x=alt.X("Score:Q", title="Score", scale=alt.Scale(domain=[0, 1])),
+        y=alt.Y("Title:N", title="Job Title", sort='-x'),
+        color=alt.Color(
+            "Metric:N",
+            scale=alt.Scale(domain=list(color_map.keys()), range=list(color_map.values())),
+            legend=alt.Legend(
+                orient="bottom",  # change to "bottom" if you want it below
+                title="Metric Breakdown"
+            )
+        ),
+        tooltip=["Title", "Metric", "Score"]
+    ).properties(
+        width="container",
+        height=400
+    )
+
+    st.altair_chart(chart, use_container_width=True)
+
+    st.markdown("### 📈 Average Scores Across Top 5")
+    avg_scores = results.head(5)[["User RIASEC Similarity", "Normalized Education Score", "User Skill Similarity"]].mean()
+    st.write(avg_scores.to_frame("Average Score"))
+
+
+def render_radar(r, i, a, s, e, c):
+    import plotly.graph_objects as go
+
+    st.markdown("### 🔸 RIASEC Radar Chart")
+    fig = go.Figure()
+    fig.add_trace(go.Scatterpolar(r=[r, i, a, s, e, c], theta=['Realistic', 'Investigative', 'Artistic', 'Social', 'Enterprising', 'Conventional'], fill='toself'))
+    fig.update_layout(polar=dict(radialaxis=dict(visible=True, range=[0, 7])), width=700, height=550, showlegend=True)
+    st.plotly_chart(fig)
+
+    st.markdown("""
+        > _This radar chart visualizes how your personality aligns across the six RIASEC dimensions. Peaks indicate stronger traits. Your top career matches are more aligned with your dominant RIASEC traits._
+
+    **RIASEC Meanings:**
+    - R: Practical, hands-on
+    - I: Analytical, science-driven
+    - A: Creative, expressive
+    - S: Social, helper
+    - E: Leader, business
+    - C: Organized, structured
+
+    **Alignment Insight:**
+    You closely align with: <strong>{}</strong>
+    """.format(max(zip(['R','I','A','S','E','C'], [r,i,a,s,e,c]), key=lambda x: x[1])[0]), unsafe_allow_html=True)
+
+
+@fragment
+def insights_dashboard(results):
+    # Expanders run their body even when collapsed, so the dashboard is only built once asked for
+    with st.expander("📈 User Insights Dashboard"):
+        if not st.toggle("Show insights", key="show_insights"):
+            return
+        with metrics.stage("render.fragment.insights"):
+            if not results.empty:
+                st.markdown("### 🎓 Education Levels")
+                edu_avg_scores = results.groupby("Education Category Label")["Hybrid Recommendation Score"].mean()
+                st.bar_chart(edu_avg_scores)
+
+                st.markdown("### 💼 Most Recommended Careers")
+                top_titles = results['Title'].value_counts().head(10)
+                st.bar_chart(top_titles)
+
+                st.markdown("### 🧠 Avg Match Score by RIASEC")
+                avg_scores = results[["R", "I", "A", "S", "E", "C"]].mean()
+                st.line_chart(avg_scores)
+
+            else:
+                st.info("No results data available for insights.")
+
+            usage = load_usage_rollups()
+            if usage is not None and usage.days:
+                st.markdown("### 🌍 Usage Trends")
+                st.line_chart(usage.sessions_per_hour())
+                mean_score = usage.mean_match_score()
+                if mean_score is not None:
+                    st.write(f"**Average top match score:** {mean_score:.3f}")
+                st.markdown("#### Most common top matches")
+                st.bar_chart(usage.top_matches(10))
+                st.markdown("#### RIASEC centroid by education level")
+                st.dataframe(usage.riasec_centroids(), use_container_width=True)
+                st.markdown("#### Most selected skills")
+                st.bar_chart(usage.skill_frequencies(10))
+
+
+@fragment
+def admin_section():
+    with st.expander("🔐 Admin Section"):
+        admin_pw = st.text_input("Enter Admin Password", type="password")
+        if admin_pw == "admin123":
+            st.subheader("Total Users")
+            st.write("(Placeholder) Total Users Count: 128")
+
+
+def stage_latency_frame():
+    """metrics.snapshot() as a table, with each page stage's p95 checked against its budget."""
+    stage_stats = pd.DataFrame.from_dict(metrics.snapshot(), orient="index")
+    if stage_stats.empty:
+        return stage_stats
+    budgets = pd.Series(RERUN_BUDGET_MS, index=stage_stats.index).where(
+        stage_stats.index.str.startswith(("render.page", "render.fragment.")))
+    budgets[stage_stats.index == "render.startup"] = STARTUP_BUDGET_MS
+    stage_stats["budget_ms"] = budgets
+    stage_stats["within_budget"] = (stage_stats["p95_ms"] <= budgets).where(budgets.notna())
+    return stage_stats
+
+
+# --- Optional Access Control ---
+@fragment
+def admin_panel():
+    with st.expander("🔐 Admin Panel"):
+        is_admin = st.checkbox("I am an admin")
+        if not is_admin:
+            return
+
+        feedback_summary = load_feedback_aggregates()
+        if feedback_summary is not None and feedback_summary.overall.count:
+            st.markdown(
+                f"**{feedback_summary.overall.count}** ratings, "
+                f"average **{feedback_summary.overall.mean:.2f}/5**"
+            )
+            st.bar_chart(pd.Series(feedback_summary.overall.histogram, name="Ratings").sort_index())
+            st.dataframe(feedback_summary.daily_frame(), use_container_width=True)
+
+            st.markdown("#### Latest feedback")
+            st.dataframe(load_recent_feedback(100))
+
+            st.download_button(
+                label="⬇️ Download feedback.csv",
+                data=lambda: b"".join(iter_feedback_csv()),  # built only when clicked
+                file_name="feedback.csv",
+                mime="text/csv"
+            )
+
+        st.markdown("### ⏱️ Stage Latency")
+        if metrics.is_enabled():
+            st.dataframe(stage_latency_frame(), use_container_width=True)
+        else:
+            st.caption("Set SMARTPATH_METRICS=1 to record stage timings.")
+        st.write(result_cache.stats())
+
+        st.markdown("### 🧠 Catalog Memory")
+        st.caption(f"Catalog version {catalog.version}, {catalog.size} jobs")
+        report = catalog.memory_report()
+        st.caption(f"{report.pop('total') / 1e6:.2f} MB, of which {report.pop('mapped') / 1e6:.2f} MB memory-mapped")
+        st.dataframe(pd.Series(report, name="bytes").to_frame(), use_container_width=True)
+
+
+# --- 🔎 Similar Careers ---
+@fragment
+def similar_careers():
+    with st.expander("🔎 Find careers similar to a job you know"):
+        job_query = st.text_input("Start typing a job title")
+        if not job_query:
+            return
+        with metrics.stage("render.fragment.similar"):
+            suggestions = suggest_titles(job_query)
+            if not suggestions:
+                st.caption("No matching job titles.")
+                return
+            seed = st.selectbox("Matching titles", suggestions, format_func=lambda match: f"{match.title} ({match.onet_code})")
+            catalog = get_catalog()
+            try:
+                similar = recommend(profile_from_job(seed.onet_code, catalog), top_n=6, catalog=catalog)
+            except KeyError:
+                st.info("This occupation is not in the recommendation catalog yet.")
+            else:
+                seed_row = catalog.row_for_code(seed.onet_code)
+                for rec in similar:
+                    if rec.job != seed_row:
+                        st.write(f"**{rec.title}** — {rec.education_category_label} ({rec.hybrid_score:.2f})")
+
+
+# --- 📣 Feedback Section ---
+@fragment
+def feedback_section(session_id, user_name):
+    st.markdown("---")
+    st.subheader("💬 We'd love your feedback!")
+
+    with st.form("feedback_form"):
+        col1, col2 = st.columns([1, 3])
+
+        with col1:
+            rating = st.slider("How would you rate your results?", 1, 5, 3)
+        with col2:
+            comment = st.text_area("Any comments or suggestions?")
+
+        submit_feedback = st.form_submit_button("Submit Feedback")
+
+        if submit_feedback:
+            anon = st.checkbox("Submit anonymously", value=False)
+            save_feedback(rating, comment, session_id, user_name if not anon else None)
+            st.success("✅ Thank you! Your feedback has been recorded.")
+
+            avg_rating = get_average_rating()
+            if avg_rating:
+                st.markdown(f"⭐ Average user rating so far: **{avg_rating}/5**")
+
+    # Emoji Feedback
+    st.markdown("Or leave a quick emoji reaction to your result:")
+    emoji_col1, emoji_col2, emoji_col3 = st.columns(3)
+    with emoji_col1:
+        if st.button("😊 Yes, I liked it"):
+            save_feedback(5, "Positive emoji reaction", session_id)
+            st.toast("Thanks for the smile!")
+    with emoji_col2:
+        if st.button("😐"):
+            save_feedback(3, "Neutral emoji reaction", session_id)
+            st.toast("Thanks for your input!")
+    with emoji_col3:
+        if st.button("😞"):
+            save_feedback(1, "Negative emoji reaction", session_id)
+            st.toast("Sorry to hear that. We'll improve!")
 
 # --- Session State Setup ---
 if "submitted" not in st.session_state:
@@ -74,6 +300,12 @@ if 'name_submitted' not in st.session_state:
     st.session_state['name_submitted'] = False
 if 'career_submitted' not in st.session_state:
     st.session_state['career_submitted'] = False
+if 'session_id' not in st.session_state:
+    # Kept for the whole browser session, so weight_tuning.py can join feedback to the usage it rates
+    st.session_state['session_id'] = str(uuid.uuid4())
+session_id = st.session_state['session_id']
+if 'scoring_session' not in st.session_state:
+    st.session_state['scoring_session'] = ScoringSession()
 
 # --- Global Styling ---
 st.markdown("""
@@ -193,8 +425,12 @@ if st.session_state["submitted"]:
     st.info("Recommendations generated successfully.")
     st.info(f"Hi \n{user_name}, here are your top careers matches based on your interests, skills, and education level.")
 
+    # Only the inputs that changed since the last rerun are re-scored
+    scoring_session = st.session_state['scoring_session']
     try:
-        results, _ = generate_recommendations(user_profile)
+        with metrics.stage("render.score"):
+            scoring_session.update(user_profile, catalog=catalog)
+            results = scoring_session.frame()
     except Exception as err:
         st.error("Something went wrong. Please try again.")
         st.exception(err)
@@ -202,187 +438,88 @@ if st.session_state["submitted"]:
         if results.empty:
             st.warning("No matching careers found for this combination.")
         else:
+            if scoring_session.last_update:
+                # Log once per changed profile, not on every rerun
+                top_match = results.iloc[0]
+                log_usage(
+                    session_id, user_name, {trait: user_profile[trait] for trait in "RIASEC"},
+                    edu_level, selected_skills_ui, top_match['Title'], top_match['Hybrid Recommendation Score']
+                )
+
             sort_metric = st.selectbox("🔽 Sort Top Careers By", [
                 "Hybrid Recommendation Score",
                 "User RIASEC Similarity", 
                 "Education Similarity", 
                 "User Skill Similarity"
             ])
-            results = results.sort_values(sort_metric, ascending=False)
-            top5 = results.head(10).reset_index(drop=True)
-            top5.index = top5.index + 1
-
-            highlight = top5.iloc[0]
-
-            st.markdown("""
-            ### 🌟 Your Top Career Match:
-            <div style='background-color: #fff3cd; border: 2px solid #dc3545; padding: 1em; border-radius: 12px;'>
-                <h3 style='color: green;'><strong>💼 {}</strong></h3>
-                <p style='font-size: 16px; color: #333;'>{}</p>
-            </div>
-            """.format(highlight['Title'], highlight['Description']), unsafe_allow_html=True)
-
-            st.markdown("### 📌 Top Career Matches")
-            st.dataframe(top5, use_container_width=True)
-
-            st.info("""
-            #### 📘 Interpretation:
-            - **Higher values** indicate stronger alignment.
-            - **User RIASEC Similarity**: Match with interests
-            - **User Skill Similarity**: Match with skills
-            - **Education Score**: Education fit with job
-            """)
-
-            st.markdown("### 📊 Hybrid Recommendation Score Breakdown (Top 5 Careers)")
-
-            melted = results.head(5).melt(
-                id_vars=["Title"],
-                value_vars=["User RIASEC Similarity", "Normalized Education Score", "User Skill Similarity"],
-                var_name="Metric",
-                value_name="Score"
-            )
-
-            color_map = {
-                "User RIASEC Similarity": "#1f77b4",
-                "Normalized Education Score": "#2ca02c",
-                "User Skill Similarity": "#ff7f0e"
-            }
-
-            chart = alt.Chart(melted).mark_bar().encode(
-                x=alt.X("Score:Q", title="Score", scale=alt.Scale(domain=[0, 1])),
-                y=alt.Y("Title:N", title="Job Title", sort='-x'),
-                color=alt.Color(
-                    "Metric:N",
-                    scale=alt.Scale(domain=list(color_map.keys()), range=list(color_map.values())),
-                    legend=alt.Legend(
-                        orient="bottom",  # change to "bottom" if you want it below
-                        title="Metric Breakdown"
-                    )
-                ),
-                tooltip=["Title", "Metric", "Score"]
-            ).properties(
-                width="container",
-                height=400
-            )
-
-            st.altair_chart(chart, use_container_width=True)
-
-            st.markdown("### 📈 Average Scores Across Top 5")
-            avg_scores = results.head(5)[["User RIASEC Similarity", "Normalized Education Score", "User Skill Similarity"]].mean()
-            st.write(avg_scores.to_frame("Average Score"))
-
-            st.markdown("### 🔸 RIASEC Radar Chart")
-            fig = go.Figure()
-            fig.add_trace(go.Scatterpolar(r=[r, i, a, s, e, c], theta=['Realistic', 'Investigative', 'Artistic', 'Social', 'Enterprising', 'Conventional'], fill='toself'))
-            fig.update_layout(polar=dict(radialaxis=dict(visible=True, range=[0, 7])), width=700, height=550, showlegend=True)
-            st.plotly_chart(fig)
-
-            st.markdown("""
-                > _This radar chart visualizes how your personality aligns across the six RIASEC dimensions. Peaks indicate stronger traits. Your top career matches are more aligned with your dominant RIASEC traits._
-
-            **RIASEC Meanings:**
-            - R: Practical, hands-on
-            - I: Analytical, science-driven
-            - A: Creative, expressive
-            - S: Social, helper
-            - E: Leader, business
-            - C: Organized, structured
-
-            **Alignment Insight:**
-            You closely align with: <strong>{}</strong>
-            """.format(max(zip(['R','I','A','S','E','C'], [r,i,a,s,e,c]), key=lambda x: x[1])[0]), unsafe_allow_html=True)
-
-            st.markdown("### 📝 Detailed Overview of Your Top Careers")
-            for _, row in results.head().iterrows():
-                with st.expander(f"🔹 {row['Title']}"):
-                    st.write(row['Description'])
-                    st.write(f"**Education Level:** {row['Education Level']} — _{row['Education Category Label']}_")
-                    st.write(f"**Preparation Level:** {row['Preparation Level']}")
-                    st.write(f"**RIASEC Scores:** R={row['R']}, I={row['I']}, A={row['A']}, S={row['S']}, E={row['E']}, C={row['C']}")
-
-            # --- Optional Fun Career ---
-            st.markdown("### 🎉 Surprise Career Match (just for fun!)")
-            fun_career = results.sample(1).iloc[0]
-            st.info(f"💼 **{fun_career['Title']}** — {fun_career['Description']}")
+            results = scoring_session.frame(sort_by=sort_metric)
+            with metrics.stage("render.top_matches"):
+                top5 = results.head(10).reset_index(drop=True)
+                top5.index = top5.index + 1
+
+                highlight = top5.iloc[0]
+
+                st.markdown("""
+                ### 🌟 Your Top Career Match:
+                <div style='background-color: #fff3cd; border: 2px solid #dc3545; padding: 1em; border-radius: 12px;'>
+                    <h3 style='color: green;'><strong>💼 {}</strong></h3>
+                    <p style='font-size: 16px; color: #333;'>{}</p>
+                </div>
+                """.format(highlight['Title'], highlight['Description']), unsafe_allow_html=True)
+
+                st.markdown("### 📌 Top Career Matches")
+                st.dataframe(top5, use_container_width=True)
+
+                st.info("""
+                #### 📘 Interpretation:
+                - **Higher values** indicate stronger alignment.
+                - **User RIASEC Similarity**: Match with interests
+                - **User Skill Similarity**: Match with skills
+                - **Education Score**: Education fit with job
+                """)
+
+            with metrics.stage("render.breakdown"):
+                render_breakdown(results)
+
+            with metrics.stage("render.radar"):
+                render_radar(r, i, a, s, e, c)
+
+            with metrics.stage("render.overview"):
+                st.markdown("### 📝 Detailed Overview of Your Top Careers")
+                for _, row in results.head().iterrows():
+                    with st.expander(f"🔹 {row['Title']}"):
+                        st.write(row['Description'])
+                        st.write(f"**Education Level:** {row['Education Level']} — _{row['Education Category Label']}_")
+                        st.write(f"**Preparation Level:** {row['Preparation Level']}")
+                        st.write(f"**RIASEC Scores:** R={row['R']}, I={row['I']}, A={row['A']}, S={row['S']}, E={row['E']}, C={row['C']}")
+
+                # --- Optional Fun Career ---
+                st.markdown("### 🎉 Surprise Career Match (just for fun!)")
+                fun_career = results.sample(1).iloc[0]
+                st.info(f"💼 **{fun_career['Title']}** — {fun_career['Description']}")
+
+            with metrics.stage("render.adjacent"):
+                adjacent = adjacent_careers(
+                    scoring_session.recommendations(), top_n=5, catalog=scoring_session.catalog,
+                    education_level=user_profile['education_level']
+                )
+                if adjacent:
+                    st.markdown("### 🧭 Adjacent Careers")
+                    st.caption("Occupations O*NET lists as related to your top matches.")
+                    for career in adjacent:
+                        link = "related to your matches" if career.hops == 1 else f"{career.hops} steps from your matches"
+                        st.write(f"**{career.title}** — {link}")
             
             # --- Insights Dashboard ---
-            with st.expander("📈 User Insights Dashboard"):
-                if not results.empty:
-                    st.markdown("### 🎓 Education Levels")
-                    edu_avg_scores = results.groupby("Education Category Label")["Hybrid Recommendation Score"].mean()
-                    st.bar_chart(edu_avg_scores)
-
-                    st.markdown("### 💼 Most Recommended Careers")
-                    top_titles = results['Title'].value_counts().head(10)
-                    st.bar_chart(top_titles)
-
-                    st.markdown("### 🧠 Avg Match Score by RIASEC")
-                    avg_scores = results[["R", "I", "A", "S", "E", "C"]].mean()
-                    st.line_chart(avg_scores)
-
-                else:
-                    st.info("No results data available for insights.")
-
-            with st.expander("🔐 Admin Section"):
-                admin_pw = st.text_input("Enter Admin Password", type="password")
-                if admin_pw == "admin123":
-                    st.subheader("Total Users")
-                    st.write("(Placeholder) Total Users Count: 128")
-            # --- Optional Access Control ---
-            with st.expander("🔐 Admin Panel"):
-                is_admin = st.checkbox("I am an admin")
-
-                if is_admin and os.path.exists(FEEDBACK_FILE):
-                    feedback_df = pd.read_csv(FEEDBACK_FILE)
-                    st.dataframe(feedback_df)
-
-                    csv = feedback_df.to_csv(index=False).encode("utf-8")
-                    st.download_button(
-                        label="⬇️ Download feedback.csv",
-                        data=csv,
-                        file_name="feedback.csv",
-                        mime="text/csv"
-                    )
+            insights_dashboard(results)
 
+            admin_section()
+            admin_panel()
 
-# --- 📣 Feedback Section ---
-st.markdown("---")
-st.subheader("💬 We'd love your feedback!")
-
-with st.form("feedback_form"):
-    col1, col2 = st.columns([1, 3])
-
-    with col1:
-        rating = st.slider("How would you rate your results?", 1, 5, 3)
-    with col2:
-        comment = st.text_area("Any comments or suggestions?")
-
-    submit_feedback = st.form_submit_button("Submit Feedback")
-
-    if submit_feedback:
-        anon = st.checkbox("Submit anonymously", value=False)
-        save_feedback(rating, comment, session_id, user_name if not anon else None)
-        st.success("✅ Thank you! Your feedback has been recorded.")
-
-        avg_rating = get_average_rating()
-        if avg_rating:
-            st.markdown(f"⭐ Average user rating so far: **{avg_rating}/5**")
-
-# Emoji Feedback
-st.markdown("Or leave a quick emoji reaction to your result:")
-emoji_col1, emoji_col2, emoji_col3 = st.columns(3)
-with emoji_col1:
-    if st.button("😊 Yes, I liked it"):
-        save_feedback(5, "Positive emoji reaction", session_id)
-        st.toast("Thanks for the smile!")
-with emoji_col2:
-    if st.button("😐"):
-        save_feedback(3, "Neutral emoji reaction", session_id)
-        st.toast("Thanks for your input!")
-with emoji_col3:
-    if st.button("😞"):
-        save_feedback(1, "Negative emoji reaction", session_id)
-        st.toast("Sorry to hear that. We'll improve!")
+
+similar_careers()
+
+feedback_section(session_id, user_name)
 
 
 
@@ -400,3 +537,9 @@ st.markdown("""
     Youth Advocate | Data Scientist 
 </div>
 """, unsafe_allow_html=True)
+
+# --- Render Timing ---
+if metrics.is_enabled():
+    page_stage = "render.page" if st.session_state.get("rendered") else "render.startup"
+    metrics.record(page_stage, time.perf_counter() - _page_started)
+st.session_state["rendered"] = True
@@ -0,0 +1,227 @@
+# benchmark.py
+#
+# Benchmarks of the recommendation engine on synthetic catalogs
+# (synthetic_catalog.py) from 1k to 1M jobs:
+#   import    cold `import recommender_engine` in a fresh interpreter
+#   build     JobCatalog construction from the job profiles table
+#   single    recommend() and generate_recommendations() latency, uncached
+#   batch     generate_recommendations_batch() throughput, and its speedup
+#             over calling recommend() once per profile
+#   memory    peak traced allocation (tracemalloc) of the build, one query
+#             and one batch, the catalog's own memory_report() breakdown,
+#             plus the process's peak RSS
+#
+# Results are written as JSON together with the commit and environment, so
+# runs on two commits can be compared:
+#
+#   python benchmark.py --sizes 1k 10k 100k --output bench-main.json
+#   python benchmark.py --sizes 1k 10k 100k --output bench-branch.json --compare bench-main.json
+
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_SIZES = ["1k", "10k", "100k"]
+TOP_N = 10
+
+
+def _latency_summary(samples):
+    samples = np.asarray(samples) * 1000
+    return {
+        "mean_ms": float(samples.mean()),
+        "p50_ms": float(np.percentile(samples, 50)),
+        "p95_ms": float(np.percentile(samples, 95)),
+        "p99_ms": float(np.percentile(samples, 99)),
+    }
+
+
+def _traced_peak(func, *args, **kwargs):
+    """Run ``func`` under tracemalloc; returns (result, peak bytes allocated during the call)."""
+    tracemalloc.start()
+    try:
+        result = func(*args, **kwargs)
+        return result, tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def bench_import(repeats=5):
+    """Cold import time of the engine, each in a fresh interpreter (interpreter startup excluded)."""
+    code = "import time; started = time.perf_counter(); import recommender_engine; print(time.perf_counter() - started)"
+    samples = [
+        float(subprocess.run([sys.executable, "-c", code], cwd=APP_DIR, check=True,
+                             capture_output=True, text=True).stdout)
+        for _ in range(repeats)
+    ]
+    return {"repeats": repeats, "min_ms": min(samples) * 1000, "median_ms": float(np.median(samples)) * 1000}
+
+
+def bench_catalog(num_jobs, queries=500, batch_size=1024, seed=0):
+    """Build, single-query, batch and memory benchmarks on one synthetic catalog of ``num_jobs`` jobs."""
+    from recommender_engine import JobCatalog, generate_recommendations, generate_recommendations_batch, recommend
+    from synthetic_catalog import random_profiles, synthetic_job_profiles
+
+    job_profiles = synthetic_job_profiles(num_jobs, seed)
+    started = time.perf_counter()
+    catalog = JobCatalog(job_profiles, version=f"synthetic-{num_jobs}-{seed}")
+    build_s = time.perf_counter() - started
+
+    # A second, traced build: what the catalog keeps, and the peak while building it
+    tracemalloc.start()
+    traced = JobCatalog(job_profiles, version="traced")
+    catalog_bytes, build_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del job_profiles, traced
+
+    # --- Single query ---
+    users = random_profiles(catalog, queries, seed)
+    for profile in users[:10]:  # allocate the per-thread workspace before timing
+        recommend(profile, TOP_N, catalog, use_cache=False)
+    single = []
+    for profile in users:
+        started = time.perf_counter()
+        recommend(profile, TOP_N, catalog, use_cache=False)
+        single.append(time.perf_counter() - started)
+    frames = []
+    for profile in users:
+        started = time.perf_counter()
+        generate_recommendations(profile, TOP_N, catalog, use_cache=False)
+        frames.append(time.perf_counter() - started)
+    _, single_peak = _traced_peak(recommend, users[0], TOP_N, catalog, use_cache=False)
+
+    # --- Batch ---
+    batch_users = random_profiles(catalog, batch_size, seed + 1)
+    elapsed = []
+    for _ in range(3):
+        started = time.perf_counter()
+        generate_recommendations_batch(batch_users, TOP_N, catalog)
+        elapsed.append(time.perf_counter() - started)
+    _, batch_peak = _traced_peak(generate_recommendations_batch, batch_users, TOP_N, catalog)
+
+    return {
+        "jobs": num_jobs,
+        "build_s": build_s,
+        "single": {"queries": queries, **_latency_summary(single)},
+        "single_frame": {"queries": queries, **_latency_summary(frames)},
+        "batch": {
+            "profiles": batch_size,
+            "best_s": min(elapsed),
+            "profiles_per_s": batch_size / min(elapsed),
+            "speedup_vs_single": batch_size / min(elapsed) / (len(single) / sum(single)),
+        },
+        "memory": {
+            "catalog_mb": catalog_bytes / 1e6,
+            "build_peak_mb": build_peak / 1e6,
+            "single_peak_mb": single_peak / 1e6,
+            "batch_peak_mb": batch_peak / 1e6,
+            "catalog_components_mb": {name: size / 1e6 for name, size in catalog.memory_report().items()},
+        },
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=APP_DIR, check=True,
+                              capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(sizes, queries=500, batch_size=1024, seed=0, log=print):
+    """Run every benchmark for each size ('1k', '10k', ... or a job count) and return the results dict."""
+    from synthetic_catalog import parse_size
+
+    results = {
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "import": bench_import(),
+        "catalogs": {},
+    }
+    log(f"import: {results['import']['median_ms']:.1f} ms")
+    for size in sizes:
+        report = bench_catalog(parse_size(size), queries, batch_size, seed)
+        results["catalogs"][size] = report
+        log(f"{size}: build {report['build_s']:.2f}s, single p50 {report['single']['p50_ms']:.3f} ms "
+            f"p99 {report['single']['p99_ms']:.3f} ms, batch {report['batch']['profiles_per_s']:.0f} profiles/s "
+            f"({report['batch']['speedup_vs_single']:.1f}x single), "
+            f"batch peak {report['memory']['batch_peak_mb']:.1f} MB")
+    results["max_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return results
+
+
+# Metrics compared between runs, and whether higher is better
+COMPARED = [
+    (("build_s",), False),
+    (("single", "p50_ms"), False),
+    (("single", "p99_ms"), False),
+    (("single_frame", "p50_ms"), False),
+    (("batch", "profiles_per_s"), True),
+    (("batch", "speedup_vs_single"), True),
+    (("memory", "catalog_mb"), False),
+    (("memory", "batch_peak_mb"), False),
+]
+
+
+def compare(results, baseline, log=print):
+    """Print each shared metric of ``results`` next to ``baseline`` with the relative change."""
+    log(f"{'metric':<32} {'baseline':>12} {'current':>12} {'change':>8}")
+    rows = [("import median_ms", baseline["import"]["median_ms"], results["import"]["median_ms"], False)]
+    for size, report in results["catalogs"].items():
+        if size not in baseline["catalogs"]:
+            continue
+        for path, higher_is_better in COMPARED:
+            old, new = baseline["catalogs"][size], report
+            for key in path:
+                old, new = old.get(key), new[key]
+                if old is None:  # metric added after the baseline was recorded
+                    break
+            if old is None:
+                continue
+            rows.append((f"{size} {' '.join(path)}", old, new, higher_is_better))
+    for name, old, new, higher_is_better in rows:
+        change = (new - old) / old if old else 0.0
+        worse = change < 0 if higher_is_better else change > 0
+        flag = " *" if worse and abs(change) > 0.1 else ""
+        log(f"{name:<32} {old:>12.3f} {new:>12.3f} {change:>+8.1%}{flag}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the recommendation engine on synthetic catalogs.")
+    parser.add_argument("--sizes", nargs="+", default=DEFAULT_SIZES, help="catalog sizes: 1k, 10k, 100k, 1m or job counts (default: %(default)s)")
+    parser.add_argument("--queries", type=int, default=500, help="single queries timed per size (default: %(default)s)")
+    parser.add_argument("--batch-size", type=int, default=1024, help="profiles per batch run (default: %(default)s)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="JSON file to write the results to")
+    parser.add_argument("--compare", default=None, help="earlier results JSON to compare against; regressions over 10%% are starred")
+    args = parser.parse_args(argv)
+
+    results = run(args.sizes, args.queries, args.batch_size, args.seed)
+    if args.output:
+        tmp_path = f"{args.output}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        os.replace(tmp_path, args.output)
+        print(f"Wrote {args.output}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(results, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
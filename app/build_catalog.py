@@ -0,0 +1,223 @@
+# build_catalog.py
+#
+# Builds the job profiles table the engine consumes (data/job_profiles_clean.csv)
+# from the O*NET workbooks shipped in data/:
+#
+#   python build_catalog.py [--data-dir data] [--output data/job_profiles_clean.csv]
+#                           [--workers N] [--artifact]
+#
+# Workbooks are parsed in parallel across a process pool. Each parsed sheet is
+# cached under <data-dir>/.ingest_cache keyed by the workbook's SHA-256, so a
+# rebuild after an O*NET release only re-parses the workbooks that changed.
+
+import argparse
+import hashlib
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+DATA_DIR = "data"
+OUTPUT_PATH = "data/job_profiles_clean.csv"
+CACHE_DIRNAME = ".ingest_cache"
+PARSER_VERSION = 1  # bump when parse_workbook changes to invalidate the cache
+
+WORKBOOKS = {
+    "occupations": "Occupation Data.xlsx",
+    "interests": "Interests.xlsx",
+    "education": "Education, Training, and Experience.xlsx",
+    "education_categories": "Education, Training, and Experience Categories.xlsx",
+    "job_zones": "Job Zones.xlsx",
+    "skills": "Skills.xlsx",
+    "technology_skills": "Technology Skills.xlsx",
+    "tools_used": "Tools Used.xlsx",
+    "alternate_titles": "Alternate Titles.xlsx",
+    "reported_titles": "Sample of Reported Titles.xlsx",
+    "related_occupations": "Related Occupations.xlsx",
+}
+# Workbooks the job profiles table is built from
+CATALOG_WORKBOOKS = ["occupations", "interests", "education", "education_categories", "job_zones"]
+
+RIASEC_NAMES = {
+    'Realistic': 'R',
+    'Investigative': 'I',
+    'Artistic': 'A',
+    'Social': 'S',
+    'Enterprising': 'E',
+    'Conventional': 'C'
+}
+INTEREST_HIGH_POINTS = ['First Interest High-Point', 'Second Interest High-Point', 'Third Interest High-Point']
+
+# Required Level of Education categories
+EDUCATION_LEVEL_MAP = {
+    1.0: "Less than High School",
+    2.0: "High School Diploma or equivalent",
+    3.0: "Post-Secondary Certificate",
+    4.0: "Some College Courses",
+    5.0: "Associate's Degree",
+    6.0: "Bachelor's Degree",
+    7.0: "Post-Baccalaureate Certificate",
+    8.0: "Master's Degree",
+    9.0: "Post-Master's Certificate",
+    10.0: "First Professional Degree",
+    11.0: "Doctoral Degree",
+    12.0: "Post-Doctoral Training"
+}
+
+
+# --- Parsing ---
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _cache_path(cache_dir, digest):
+    return os.path.join(cache_dir, f"{digest}-v{PARSER_VERSION}.pkl")
+
+
+def parse_workbook(path, cache_path):
+    """Parse one workbook and store the result at ``cache_path``. Runs in a worker process."""
+    df = pd.read_excel(path, engine="openpyxl")
+    df = df.rename(columns={'O*NET-SOC Code': 'ONET_Code'})
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    df.to_pickle(tmp_path)
+    os.replace(tmp_path, cache_path)
+    return cache_path
+
+
+def load_workbooks(names, data_dir=DATA_DIR, workers=None, log=print):
+    """
+    Return ``{name: DataFrame}`` for the named entries of WORKBOOKS.
+
+    Workbooks whose hash is already in the cache are loaded from it; the
+    rest are parsed in parallel across a process pool.
+    """
+    cache_dir = os.path.join(data_dir, CACHE_DIRNAME)
+    os.makedirs(cache_dir, exist_ok=True)
+
+    cache_paths = {}
+    misses = []
+    for name in names:
+        path = os.path.join(data_dir, WORKBOOKS[name])
+        cache_paths[name] = _cache_path(cache_dir, file_hash(path))
+        if not os.path.exists(cache_paths[name]):
+            misses.append(name)
+
+    if misses:
+        log(f"Parsing {len(misses)} workbook(s): {', '.join(WORKBOOKS[name] for name in misses)}")
+        with ProcessPoolExecutor(max_workers=workers or min(len(misses), os.cpu_count() or 1)) as pool:
+            futures = [
+                pool.submit(parse_workbook, os.path.join(data_dir, WORKBOOKS[name]), cache_paths[name])
+                for name in misses
+            ]
+            for future in futures:
+                future.result()
+    log(f"Loaded {len(names) - len(misses)} workbook(s) from cache")
+
+    return {name: pd.read_pickle(cache_paths[name]) for name in names}
+
+
+# --- Joining ---
+def _min_max(values):
+    values = values.astype(float)
+    spread = values.max() - values.min()
+    return (values - values.min()) / spread if spread else values * 0
+
+
+def build_job_profiles(sheets):
+    """
+    Join and pivot the parsed O*NET sheets into the job profiles table:
+    one row per occupation with min-max scaled RIASEC scores, the dominant
+    education/training component and its category, a normalized education
+    score, the Job Zone, and one-hot 'Skill List_' columns.
+    """
+    occupations = sheets["occupations"][['ONET_Code', 'Title', 'Description']]
+
+    # --- RIASEC vectors and interest high-points, one row per job ---
+    riasec = sheets["interests"].pivot_table(
+        index='ONET_Code', columns='Element Name', values='Data Value'
+    ).reset_index()
+    riasec.columns.name = None
+    riasec = riasec.rename(columns=RIASEC_NAMES)
+
+    # --- Education: the highest-rated component per job, with its category ---
+    education = sheets["education"].merge(
+        sheets["education_categories"][['Element ID', 'Scale ID', 'Category', 'Category Description']],
+        on=['Element ID', 'Scale ID', 'Category'],
+        how='left'
+    )
+    dominant_education = (
+        education
+        .sort_values(['Data Value', 'ONET_Code'], ascending=[False, True], kind="mergesort")
+        .drop_duplicates(subset='ONET_Code')
+        [['ONET_Code', 'Element Name', 'Data Value', 'Category', 'Category Description']]
+        .rename(columns={
+            'Element Name': 'Education Level',
+            'Category': 'Education Category',
+            'Category Description': 'Preparation Level'
+        })
+    )
+
+    job_zones = sheets["job_zones"][['ONET_Code', 'Job Zone']]
+
+    job_profiles = (
+        occupations
+        .merge(riasec, on='ONET_Code', how='left')
+        .merge(dominant_education, on='ONET_Code', how='left')
+        .merge(job_zones, on='ONET_Code', how='left')
+    )
+    job_profiles = job_profiles.dropna(
+        subset=['Education Level', 'Education Category', 'Preparation Level']
+    ).reset_index(drop=True)
+
+    interest_cols = [col for col in INTEREST_HIGH_POINTS if col in job_profiles.columns]
+    job_profiles[interest_cols] = job_profiles[interest_cols].fillna('Unknown')
+
+    # --- Scaling ---
+    for trait in RIASEC_NAMES.values():
+        job_profiles[trait] = _min_max(job_profiles[trait])
+    job_profiles['Normalized Education Score'] = _min_max(job_profiles['Education Category'])
+    job_profiles['Education Category Label'] = job_profiles['Education Category'].map(EDUCATION_LEVEL_MAP)
+
+    # --- One-hot 'Skill List_' columns from the education/training components ---
+    skill_features = pd.crosstab(education['ONET_Code'], education['Element Name']).clip(upper=1).astype(float)
+    skill_features.columns = ["Skill List_" + col for col in skill_features.columns]
+    job_profiles = job_profiles.merge(skill_features, left_on='ONET_Code', right_index=True, how='left')
+
+    return job_profiles
+
+
+def build(data_dir=DATA_DIR, output=OUTPUT_PATH, workers=None, artifact=False, log=print):
+    started = time.perf_counter()
+    sheets = load_workbooks(CATALOG_WORKBOOKS, data_dir, workers, log)
+    job_profiles = build_job_profiles(sheets)
+
+    tmp_path = f"{output}.tmp"
+    job_profiles.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, output)
+    log(f"Wrote {output}: {len(job_profiles)} jobs in {time.perf_counter() - started:.1f}s")
+
+    if artifact:
+        from catalog_artifact import ARTIFACT_PATH, compile_catalog
+        from recommender_engine import JobCatalog
+        compile_catalog(JobCatalog.from_csv(output), ARTIFACT_PATH)
+        log(f"Wrote {ARTIFACT_PATH}")
+    return job_profiles
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the job profiles table from the O*NET workbooks.")
+    parser.add_argument("--data-dir", default=DATA_DIR, help="directory holding the O*NET .xlsx files (default: %(default)s)")
+    parser.add_argument("--output", default=OUTPUT_PATH, help="job profiles CSV to write (default: %(default)s)")
+    parser.add_argument("--workers", type=int, default=None, help="parser processes (default: one per workbook, up to the CPU count)")
+    parser.add_argument("--artifact", action="store_true", help="also compile the memory-mapped catalog artifact")
+    args = parser.parse_args(argv)
+    build(args.data_dir, args.output, args.workers, args.artifact)
+
+
+if __name__ == "__main__":
+    main()
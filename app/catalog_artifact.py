@@ -0,0 +1,159 @@
+# catalog_artifact.py
+#
+# Compiled, memory-mapped form of the job catalog.
+#
+# Layout (all integers little-endian):
+#   8 bytes   magic b"SPCATLG1"
+#   8 bytes   header length (uint64)
+#   N bytes   JSON header: format, catalog version, row count, skill columns,
+#             and for every array its dtype, shape and byte offset
+#   ...       data section, starting at the first ALIGNMENT boundary after
+#             the header; array offsets are relative to it and aligned too
+#
+# Strings (Title, Description, ...) are stored as a UTF-8 blob plus an
+# int64 offsets array, so a single row is decoded only when it is read.
+# Label columns the catalog keeps as categories (Education Level, ...) are
+# stored as their integer codes, with the category names in the header.
+# Every process maps the same file read-only, so the OS page cache holds
+# one copy per host.
+
+import argparse
+import json
+import os
+import struct
+
+import numpy as np
+
+from catalog_columns import CategoryColumn, StringTable
+from recommender_engine import CATALOG_ARTIFACT_PATH, CATALOG_PATH, JobCatalog
+
+ARTIFACT_PATH = CATALOG_ARTIFACT_PATH
+MAGIC = b"SPCATLG1"
+FORMAT_VERSION = 2
+READABLE_FORMATS = {1, 2}  # format 1 stored every metadata column as strings
+ALIGNMENT = 64
+FLOAT_DTYPE = np.dtype("<f4")
+
+
+def compile_catalog(catalog, path=ARTIFACT_PATH):
+    """
+    Write ``catalog`` to a memory-mappable artifact at ``path``.
+
+    The file is written next to the target and renamed into place, so
+    processes that already mapped the old artifact keep a consistent view.
+    """
+    arrays = {
+        "job_ids": np.asarray(catalog.job_ids, dtype="<i8"),
+        "riasec_scores": np.asarray(catalog.riasec_scores, dtype=FLOAT_DTYPE),
+        "riasec_matrix": np.asarray(catalog.riasec_matrix, dtype=FLOAT_DTYPE),
+        "skill_matrix": np.asarray(catalog.skill_matrix, dtype=FLOAT_DTYPE),
+        "inv_skill_norms": np.asarray(catalog.inv_skill_norms, dtype=FLOAT_DTYPE),
+        "education_scores": np.asarray(catalog.education_scores, dtype=FLOAT_DTYPE),
+    }
+    strings = {}
+    categories = {}
+    for col, values in catalog.metadata.items():
+        if isinstance(values, CategoryColumn):
+            categories[col] = {"codes": f"{col}/codes", "values": values.categories}
+            arrays[f"{col}/codes"] = np.asarray(values.codes)
+            continue
+        offsets, data = StringTable.encode(values)
+        strings[col] = {"offsets": f"{col}/offsets", "data": f"{col}/data"}
+        arrays[f"{col}/offsets"] = offsets
+        arrays[f"{col}/data"] = data
+
+    layout = {}
+    position = 0
+    for name, array in arrays.items():
+        position = _align(position)
+        layout[name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": position}
+        position += array.nbytes
+
+    header = {
+        "format": FORMAT_VERSION,
+        "version": catalog.version,
+        "size": catalog.size,
+        "skill_cols": list(catalog.skill_cols),
+        "strings": strings,
+        "categories": categories,
+        "arrays": layout,
+    }
+    header_bytes = json.dumps(header).encode("utf-8")
+    data_start = _align(len(MAGIC) + 8 + len(header_bytes))
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<Q", len(header_bytes)))
+        f.write(header_bytes)
+        for name, array in arrays.items():
+            f.write(b"\0" * (data_start + layout[name]["offset"] - f.tell()))
+            f.write(np.ascontiguousarray(array).tobytes())
+    os.replace(tmp_path, path)
+    return path
+
+
+def read_header(path=ARTIFACT_PATH):
+    """Read and validate the JSON header of an artifact."""
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a SmartPath catalog artifact")
+        (length,) = struct.unpack("<Q", f.read(8))
+        header = json.loads(f.read(length).decode("utf-8"))
+    if header.get("format") not in READABLE_FORMATS:
+        raise ValueError(f"Unsupported catalog artifact format: {header.get('format')}")
+    header["data_start"] = _align(len(MAGIC) + 8 + length)
+    return header
+
+
+def open_catalog(path=ARTIFACT_PATH):
+    """
+    Open an artifact as a JobCatalog whose arrays are read-only views into
+    one shared memory map of the file.
+    """
+    header = read_header(path)
+    buffer = np.memmap(path, dtype=np.uint8, mode="r")
+
+    def array(name):
+        entry = header["arrays"][name]
+        dtype = np.dtype(entry["dtype"])
+        count = int(np.prod(entry["shape"], dtype=np.int64))
+        start = header["data_start"] + entry["offset"]
+        return buffer[start:start + count * dtype.itemsize].view(dtype).reshape(entry["shape"])
+
+    metadata = {
+        col: StringTable(array(names["offsets"]), array(names["data"]))
+        for col, names in header["strings"].items()
+    }
+    for col, names in header.get("categories", {}).items():
+        metadata[col] = CategoryColumn(array(names["codes"]), names["values"])
+    return JobCatalog.from_arrays(
+        version=header["version"],
+        job_ids=array("job_ids"),
+        riasec_scores=array("riasec_scores"),
+        skill_cols=header["skill_cols"],
+        skill_matrix=array("skill_matrix"),
+        education_scores=array("education_scores"),
+        metadata=metadata,
+        riasec_matrix=array("riasec_matrix"),
+        inv_skill_norms=array("inv_skill_norms"),
+    )
+
+
+def _align(position):
+    return -(-position // ALIGNMENT) * ALIGNMENT
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compile the job profiles CSV into a memory-mapped catalog artifact.")
+    parser.add_argument("csv", nargs="?", default=CATALOG_PATH, help="job profiles CSV (default: %(default)s)")
+    parser.add_argument("-o", "--output", default=ARTIFACT_PATH, help="artifact path (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    catalog = JobCatalog.from_csv(args.csv)
+    compile_catalog(catalog, args.output)
+    print(f"Wrote {args.output}: {catalog.size} jobs, version {catalog.version}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+# catalog_columns.py
+#
+# Compact read-only columns for the catalog's text metadata:
+#   StringTable     UTF-8 blob plus an int64 offsets array; a row is decoded
+#                   only when it is read (free text such as Description)
+#   CategoryColumn  small integer codes into a list of categories (labels
+#                   with a handful of distinct values, such as Education Level)
+# Both index like the object arrays they replace: an integer gives one
+# value, an array of rows gives an object array of values.
+
+import mmap
+import sys
+
+import numpy as np
+
+
+def _is_missing(value):
+    return value is None or (isinstance(value, float) and np.isnan(value))
+
+
+class StringTable:
+    """Read-only sequence of strings backed by an offsets array and a UTF-8 blob."""
+
+    def __init__(self, offsets, data):
+        self.offsets = offsets
+        self.data = data
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        if isinstance(index, (int, np.integer)):
+            start, end = self.offsets[index], self.offsets[index + 1]
+            return self.data[start:end].tobytes().decode("utf-8")
+        return np.array([self[int(i)] for i in np.asarray(index).ravel()], dtype=object)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    @property
+    def nbytes(self):
+        return self.offsets.nbytes + self.data.nbytes
+
+    def take(self, rows):
+        """A new table of the given rows, gathered without decoding them."""
+        rows = np.asarray(rows, dtype=np.int64)
+        starts = self.offsets[rows]
+        lengths = self.offsets[rows + 1] - starts
+        offsets = np.zeros(len(rows) + 1, dtype="<i8")
+        np.cumsum(lengths, out=offsets[1:])
+        positions = np.repeat(starts - offsets[:-1], lengths) + np.arange(offsets[-1])
+        return StringTable(offsets, np.asarray(self.data)[positions])
+
+    def concat(self, other):
+        """A new table of these rows followed by ``other``'s."""
+        offsets = np.concatenate([self.offsets[:-1], np.asarray(other.offsets) + self.offsets[-1]])
+        return StringTable(offsets.astype("<i8"), np.concatenate([self.data, other.data]))
+
+    @classmethod
+    def encode(cls, values):
+        """Build the offsets and data arrays for a sequence of values (None/NaN become '')."""
+        encoded = [
+            value.encode("utf-8") if isinstance(value, str) else b"" if _is_missing(value) else str(value).encode("utf-8")
+            for value in values
+        ]
+        offsets = np.zeros(len(encoded) + 1, dtype="<i8")
+        np.cumsum([len(value) for value in encoded], out=offsets[1:])
+        data = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+        return offsets, data
+
+
+class CategoryColumn:
+    """Read-only sequence of labels stored as codes into ``categories``; code -1 is a missing (NaN) value."""
+
+    def __init__(self, codes, categories):
+        self.codes = codes
+        self.categories = list(categories)
+        # The trailing NaN is what code -1 picks
+        self._values = np.array(self.categories + [np.nan], dtype=object)
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, index):
+        if isinstance(index, (int, np.integer)):
+            return self._values[self.codes[index]]
+        return self._values[self.codes[np.asarray(index).ravel()]]
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    @property
+    def nbytes(self):
+        return self.codes.nbytes + object_nbytes(self._values)
+
+    def take(self, rows):
+        """A new column of the given rows, over the same categories."""
+        return CategoryColumn(np.asarray(self.codes)[np.asarray(rows, dtype=np.int64)], self.categories)
+
+    def concat(self, other):
+        """A new column of these rows followed by ``other``'s, with ``other``'s new categories appended."""
+        positions = {category: code for code, category in enumerate(self.categories)}
+        for category in other.categories:
+            positions.setdefault(category, len(positions))
+        remap = np.array([positions[category] for category in other.categories] + [-1])
+        return CategoryColumn.from_codes(
+            np.concatenate([np.asarray(self.codes, dtype=np.int64), remap[np.asarray(other.codes)]]), list(positions)
+        )
+
+    @classmethod
+    def from_codes(cls, codes, categories):
+        """Column over ``codes`` (e.g. from pandas.factorize), stored in the smallest signed integer type that fits."""
+        dtype = np.int8 if len(categories) < 1 << 7 else np.int16 if len(categories) < 1 << 15 else np.int32
+        return cls(np.asarray(codes).astype(dtype), categories)
+
+
+def object_nbytes(values):
+    """Bytes held by an object array: its pointers plus each distinct object it references."""
+    seen = {}
+    for value in values:
+        seen.setdefault(id(value), value)
+    return values.nbytes + sum(sys.getsizeof(value) for value in seen.values())
+
+
+def column_nbytes(values):
+    """Bytes held by a catalog column: a numpy array, object array, StringTable or CategoryColumn."""
+    if isinstance(values, np.ndarray) and values.dtype == object:
+        return object_nbytes(values)
+    return int(values.nbytes)
+
+
+def is_mapped(values):
+    """Whether a column's data is a view into a memory-mapped file (shared through the page cache)."""
+    if isinstance(values, (StringTable, CategoryColumn)):
+        return is_mapped(values.data if isinstance(values, StringTable) else values.codes)
+    base = values
+    while base is not None:
+        if isinstance(base, (np.memmap, mmap.mmap)):
+            return True
+        base = getattr(base, "base", None)
+    return False
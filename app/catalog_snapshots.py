@@ -0,0 +1,340 @@
+# catalog_snapshots.py
+#
+# Versioned catalog snapshots, incremental deltas and the pointer that
+# running processes follow.
+#
+# Layout under SNAPSHOT_DIR (data/snapshots):
+#   <version>/job_catalog.bin           compiled artifact (catalog_artifact.py)
+#   <version>/skill_index.npz           derived indexes, when the parent had them
+#   <version>/related_occupations.npz
+#   <version>/cluster_index.npz
+#   <version>/snapshot.json             parent version, creation time, delta summary
+#   CURRENT                             the version served; replaced atomically
+# A snapshot directory is written under a temporary name and renamed into
+# place, and is never modified afterwards: processes that still map an older
+# snapshot keep a consistent view, and any snapshot can be re-activated.
+#
+# A delta adds, modifies or removes occupations by ONET_Code:
+#   upserts    rows in the job_profiles_clean.csv schema; a code already in
+#              the catalog is replaced, a new code is added
+#   removals   codes to drop
+# apply_delta() derives the new catalog from the old one's arrays. Surviving
+# rows keep their normalized RIASEC rows and inverse skill norms, only the
+# delta's rows are prepared, and both are merged in education order. The
+# skill index and the occupation graph are remapped by code instead of being
+# re-parsed from the O*NET workbooks: added occupations get their catalog
+# skill features, but no related-occupation edges until the next full build.
+# The cluster index keeps its clusters; added and modified occupations join
+# the nearest one.
+#
+# recommender_engine.get_catalog() re-reads CURRENT every CATALOG_POLL_SECONDS
+# and swaps to a newly activated snapshot between requests. Result caches are
+# keyed on the catalog version, so nothing scored against the old snapshot
+# is served after the swap.
+#
+#   python catalog_snapshots.py publish [--csv data/job_profiles_clean.csv]
+#   python catalog_snapshots.py apply --upserts changes.csv [--remove 11-1011.00 ...]
+#   python catalog_snapshots.py list
+#   python catalog_snapshots.py activate <version>    # roll back or forward
+
+import argparse
+import hashlib
+import json
+import os
+import tempfile
+from datetime import datetime, timezone
+
+import numpy as np
+
+from catalog_artifact import compile_catalog, open_catalog
+from catalog_columns import CategoryColumn, StringTable
+from cluster_index import CLUSTER_INDEX_PATH, ClusterIndex
+from occupation_graph import GRAPH_PATH, OccupationGraph
+from recommender_engine import (
+    CATALOG_PATH, CATEGORY_COLUMNS, SNAPSHOT_DIR, JobCatalog, current_snapshot_version,
+)
+from sparse_skills import SKILL_INDEX_PATH, SparseSkillIndex
+
+ARTIFACT_NAME = "job_catalog.bin"
+MANIFEST_NAME = "snapshot.json"
+POINTER_NAME = "CURRENT"
+
+
+# --- Deltas ---
+def _as_column(values, col, size):
+    """``values`` in the compact form the engine keeps ``col`` in; all missing when None."""
+    if col in CATEGORY_COLUMNS:
+        if values is None:
+            return CategoryColumn.from_codes(np.full(size, -1), [])
+        if isinstance(values, CategoryColumn):
+            return values
+        import pandas as pd
+        codes, categories = pd.factorize(np.asarray(list(values), dtype=object))
+        return CategoryColumn.from_codes(codes, categories.tolist())
+    if values is None:
+        return StringTable(np.zeros(size + 1, dtype="<i8"), np.zeros(0, dtype=np.uint8))
+    if isinstance(values, StringTable):
+        return values
+    return StringTable(*StringTable.encode(values))
+
+
+def _align_skills(catalog, skill_cols):
+    """``catalog``'s skill matrix with columns in ``skill_cols`` order (0 for columns it lacks)."""
+    matrix = np.zeros((catalog.size, len(skill_cols)), dtype=catalog.dtype)
+    positions = {col: i for i, col in enumerate(skill_cols)}
+    for position, col in enumerate(catalog.skill_cols):
+        matrix[:, positions[col]] = catalog.skill_matrix[:, position]
+    return matrix
+
+
+def delta_version(parent_version, upserts, removals):
+    """Content-derived version of the catalog a delta produces."""
+    digest = hashlib.sha256(parent_version.encode("utf-8"))
+    if upserts is not None and len(upserts):
+        digest.update(upserts.to_csv(index=False).encode("utf-8"))
+    digest.update("\n".join(sorted(removals)).encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+def apply_delta(catalog, upserts=None, removals=()):
+    """
+    Apply a delta to ``catalog``: ``upserts`` (a job profiles DataFrame) add
+    or replace occupations by ONET_Code, ``removals`` drop codes.
+
+    Returns (new catalog, previous_rows, changed): ``previous_rows[r]`` is
+    the row of the same code in ``catalog`` (-1 for an added code) and
+    ``changed[r]`` is True for rows taken from ``upserts``.
+    """
+    codes = catalog.onet_codes
+    if codes is None:
+        raise KeyError("Missing 'ONET_Code' in dataset; deltas are keyed by O*NET-SOC code")
+    removals = list(removals)
+    unknown = [code for code in removals if catalog.row_for_code(code) is None]
+    if unknown:
+        raise KeyError(f"Not in the catalog: {', '.join(unknown)}")
+    upsert_codes = [] if upserts is None or not len(upserts) else list(upserts['ONET_Code'])
+    if len(set(upsert_codes)) != len(upsert_codes):
+        raise ValueError("Duplicate ONET_Code in the upserts")
+    overlap = set(upsert_codes) & set(removals)
+    if overlap:
+        raise ValueError(f"Both upserted and removed: {', '.join(sorted(overlap))}")
+
+    # --- Rows: surviving old rows, then the delta's rows, merged in education order ---
+    replaced = [catalog.row_for_code(code) for code in upsert_codes + removals]
+    keep = np.ones(catalog.size, dtype=bool)
+    keep[[row for row in replaced if row is not None]] = False
+    kept_rows = np.flatnonzero(keep)
+    added = JobCatalog(upserts, version="delta", dtype=catalog.dtype) if upsert_codes else None
+    added_size = 0 if added is None else added.size
+
+    education = np.concatenate([catalog.education_scores[kept_rows]] + ([added.education_scores] if added else []))
+    order = np.argsort(education, kind="stable")
+
+    skill_cols = list(catalog.skill_cols)
+    if added is not None:
+        skill_cols += [col for col in added.skill_cols if col not in catalog._skill_positions]
+
+    def merged(name, old_values=None, new_values=None):
+        old_values = getattr(catalog, name)[kept_rows] if old_values is None else old_values
+        parts = [np.asarray(old_values)]
+        if added is not None:
+            parts.append(np.asarray(getattr(added, name) if new_values is None else new_values, dtype=catalog.dtype))
+        return np.concatenate(parts)[order]
+
+    old_skills = np.asarray(catalog.skill_matrix)[kept_rows]
+    if len(skill_cols) > len(catalog.skill_cols):
+        old_skills = np.hstack([old_skills, np.zeros((len(kept_rows), len(skill_cols) - len(catalog.skill_cols)),
+                                                     dtype=catalog.dtype)])
+
+    metadata = {}
+    for col in list(catalog.metadata) + [col for col in (added.metadata if added else {}) if col not in catalog.metadata]:
+        column = _as_column(catalog.metadata.get(col), col, catalog.size).take(kept_rows)
+        if added is not None:
+            column = column.concat(_as_column(added.metadata.get(col), col, added_size))
+        metadata[col] = column.take(order)
+
+    next_id = int(np.max(catalog.job_ids)) + 1 if catalog.size else 0
+    job_ids = np.concatenate([np.asarray(catalog.job_ids)[kept_rows], next_id + np.arange(added_size)])[order]
+    new_catalog = JobCatalog.from_arrays(
+        version=delta_version(catalog.version, upserts, removals),
+        job_ids=job_ids,
+        riasec_scores=merged("riasec_scores"),
+        skill_cols=skill_cols,
+        skill_matrix=merged("skill_matrix", old_skills, _align_skills(added, skill_cols) if added else None),
+        education_scores=education[order],
+        metadata=metadata,
+        riasec_matrix=merged("riasec_matrix"),
+        inv_skill_norms=merged("inv_skill_norms"),
+    )
+
+    # A replaced occupation keeps its identity for the derived indexes
+    added_rows = [] if added is None else [catalog.row_for_code(code) for code in added.onet_codes]
+    added_rows = np.array([-1 if row is None else row for row in added_rows], dtype=np.int64)
+    previous = np.concatenate([kept_rows, added_rows])[order]
+    changed = np.concatenate([np.zeros(len(kept_rows), dtype=bool), np.ones(added_size, dtype=bool)])[order]
+    return new_catalog, previous, changed
+
+
+# --- Snapshots ---
+def snapshot_path(version, name=ARTIFACT_NAME, snapshot_dir=None):
+    return os.path.join(snapshot_dir or SNAPSHOT_DIR, version, name)
+
+
+def open_snapshot(version, snapshot_dir=None):
+    """Memory-map a published snapshot as a JobCatalog whose derived files are looked up next to it."""
+    catalog = open_catalog(snapshot_path(version, snapshot_dir=snapshot_dir))
+    if catalog.version != version:
+        raise ValueError(f"Snapshot {version} holds catalog version {catalog.version}")
+    catalog.snapshot_dir = os.path.dirname(snapshot_path(version, snapshot_dir=snapshot_dir))
+    return catalog
+
+
+def publish_snapshot(catalog, skill_index=None, graph=None, parent=None, delta=None, snapshot_dir=None,
+                     cluster_index=None):
+    """
+    Write ``catalog`` (and the derived indexes given) as the snapshot of its
+    version; returns the version. A version already published is left as is.
+    """
+    snapshot_dir = snapshot_dir or SNAPSHOT_DIR
+    directory = os.path.join(snapshot_dir, catalog.version)
+    if os.path.exists(directory):
+        return catalog.version
+    os.makedirs(snapshot_dir, exist_ok=True)
+
+    staging = tempfile.mkdtemp(prefix=f".{catalog.version}-", dir=snapshot_dir)
+    compile_catalog(catalog, os.path.join(staging, ARTIFACT_NAME))
+    if skill_index is not None:
+        skill_index.save(os.path.join(staging, os.path.basename(SKILL_INDEX_PATH)))
+    if graph is not None:
+        graph.save(os.path.join(staging, os.path.basename(GRAPH_PATH)))
+    if cluster_index is not None:
+        cluster_index.save(os.path.join(staging, os.path.basename(CLUSTER_INDEX_PATH)))
+    manifest = {
+        "version": catalog.version,
+        "parent": parent,
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "size": catalog.size,
+        "delta": delta,
+    }
+    with open(os.path.join(staging, MANIFEST_NAME), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.rename(staging, directory)
+    return catalog.version
+
+
+def activate(version, snapshot_dir=None):
+    """Point CURRENT at a published snapshot; running processes pick it up on their next check."""
+    snapshot_dir = snapshot_dir or SNAPSHOT_DIR
+    if not os.path.exists(os.path.join(snapshot_dir, version, ARTIFACT_NAME)):
+        raise FileNotFoundError(f"No snapshot {version} in {snapshot_dir}")
+    tmp_path = os.path.join(snapshot_dir, f"{POINTER_NAME}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(version + "\n")
+    os.replace(tmp_path, os.path.join(snapshot_dir, POINTER_NAME))
+
+
+def list_snapshots(snapshot_dir=None):
+    """Manifests of every published snapshot, oldest first."""
+    snapshot_dir = snapshot_dir or SNAPSHOT_DIR
+    manifests = []
+    for name in os.listdir(snapshot_dir) if os.path.isdir(snapshot_dir) else []:
+        path = os.path.join(snapshot_dir, name, MANIFEST_NAME)
+        if not name.startswith(".") and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                manifests.append(json.load(f))
+    return sorted(manifests, key=lambda manifest: manifest["created"])
+
+
+def _derived_indexes(catalog):
+    """The skill index, occupation graph and cluster index saved for ``catalog``'s version, or None for each."""
+    def load(cls, default):
+        try:
+            index = cls.load(catalog.data_path(default))
+        except FileNotFoundError:
+            return None
+        return index if index.catalog_version == catalog.version else None
+
+    return (load(SparseSkillIndex, SKILL_INDEX_PATH), load(OccupationGraph, GRAPH_PATH),
+            load(ClusterIndex, CLUSTER_INDEX_PATH))
+
+
+def publish_delta(upserts=None, removals=(), base=None, snapshot_dir=None, make_current=True):
+    """
+    Apply a delta to snapshot ``base`` (default: the current one), publish
+    the result with its remapped indexes and, unless ``make_current`` is
+    False, activate it. Returns the new version.
+    """
+    base = base or current_snapshot_version(snapshot_dir)
+    if base is None:
+        raise FileNotFoundError("No current snapshot to apply the delta to; publish one first")
+    catalog = open_snapshot(base, snapshot_dir)
+    new_catalog, previous_rows, changed = apply_delta(catalog, upserts, removals)
+
+    skill_index, graph, cluster_index = _derived_indexes(catalog)
+    if skill_index is not None:
+        skill_index = skill_index.remap(new_catalog, previous_rows, changed)
+    if graph is not None:
+        graph = graph.remap(previous_rows, new_catalog.version)
+    if cluster_index is not None:
+        cluster_index = cluster_index.remap(new_catalog, previous_rows, changed)
+    summary = {
+        "added": int(np.count_nonzero(changed & (previous_rows < 0))),
+        "modified": int(np.count_nonzero(changed & (previous_rows >= 0))),
+        "removed": len(removals),
+    }
+    version = publish_snapshot(new_catalog, skill_index, graph, parent=base, delta=summary, snapshot_dir=snapshot_dir,
+                               cluster_index=cluster_index)
+    if make_current:
+        activate(version, snapshot_dir)
+    return version
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Publish, update and activate versioned catalog snapshots.")
+    parser.add_argument("--snapshot-dir", default=SNAPSHOT_DIR, help="snapshot directory (default: %(default)s)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    publish = commands.add_parser("publish", help="publish a full snapshot built from a job profiles CSV")
+    publish.add_argument("--csv", default=CATALOG_PATH, help="job profiles CSV (default: %(default)s)")
+    publish.add_argument("--no-activate", action="store_true", help="publish without making it current")
+
+    apply = commands.add_parser("apply", help="publish the current snapshot with a delta applied")
+    apply.add_argument("--upserts", default=None, help="CSV of job profile rows to add or replace, by ONET_Code")
+    apply.add_argument("--remove", nargs="*", default=[], help="O*NET-SOC codes to remove")
+    apply.add_argument("--base", default=None, help="snapshot version to apply the delta to (default: current)")
+    apply.add_argument("--no-activate", action="store_true", help="publish without making it current")
+
+    commands.add_parser("list", help="list published snapshots")
+    activate_command = commands.add_parser("activate", help="make a published snapshot current")
+    activate_command.add_argument("version")
+    args = parser.parse_args(argv)
+
+    if args.command == "publish":
+        catalog = JobCatalog.from_csv(args.csv)
+        skill_index, graph, cluster_index = _derived_indexes(catalog)
+        version = publish_snapshot(catalog, skill_index, graph, snapshot_dir=args.snapshot_dir,
+                                   cluster_index=cluster_index)
+        if not args.no_activate:
+            activate(version, args.snapshot_dir)
+        print(f"Published {version}: {catalog.size} jobs"
+              f"{'' if skill_index else ', no skill index'}{'' if graph else ', no occupation graph'}"
+              f"{'' if cluster_index else ', no cluster index'}")
+    elif args.command == "apply":
+        import pandas as pd
+
+        upserts = pd.read_csv(args.upserts) if args.upserts else None
+        version = publish_delta(upserts, args.remove, args.base, args.snapshot_dir, not args.no_activate)
+        print(f"Published {version}")
+    elif args.command == "activate":
+        activate(args.version, args.snapshot_dir)
+        print(f"Activated {args.version}")
+    else:
+        current = current_snapshot_version(args.snapshot_dir)
+        for manifest in list_snapshots(args.snapshot_dir):
+            marker = "*" if manifest["version"] == current else " "
+            print(f"{marker} {manifest['version']}  {manifest['created']}  {manifest['size']:>7} jobs  "
+                  f"parent {manifest['parent'] or '-'}  {manifest['delta'] or ''}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,444 @@
+# cluster_index.py
+#
+# Optional approximate search over large job catalogs (IVF-style).
+#
+# Each job is embedded as its weighted, normalized RIASEC and skill vectors
+# plus its education score:
+#   [0.4 * riasec_unit, 0.3 * skill_unit, education]
+# Jobs are grouped by k-means (trained on a sample, then every job assigned
+# to its nearest centroid), with an inverted list of rows per cluster. The
+# index is built offline and saved next to the catalog like the skill index
+# and the occupation graph; serving processes only load it.
+#
+# Centroids are kept unweighted, so a cluster's score for a user, under the
+# current hybrid weights, is the mean RIASEC + skill score of its jobs plus
+# an education term: centroids are ranked exactly like jobs, and changing
+# the weights never requires a rebuild. A query probes the ``nprobe`` best
+# clusters the user is eligible for and re-ranks only their jobs with the
+# exact hybrid score, building the same Recommendation records as
+# recommend() (scores equal up to float rounding). The features are copied into cluster order when the index is
+# loaded, so probing reads contiguous plain arrays.
+#
+# ``nprobe`` trades recall for latency; measure_recall() reports both
+# against the exact path. By default a query probes PROBE_FRACTION of the
+# clusters. On synthetic catalogs (synthetic_catalog.py, sqrt(n) clusters,
+# 500 random profiles, one core) recall@10 and mean latency per query were:
+#
+#   jobs    clusters  nprobe  recall  scanned  approx ms  exact ms
+#   20k          141      14   0.957     7.0%       0.57      0.59
+#   100k         316      16   0.906     3.4%       0.81      1.32
+#   100k         316      32   0.973     7.2%       0.94      1.44
+#   300k         548      27   0.908     3.2%       1.02      3.36
+#   300k         548      55   0.968     7.1%       1.34      3.10
+#   300k         548     110   0.993    15.4%       2.22      2.80
+#
+# Both paths spend about 0.5 ms building the ten records. Below
+# MIN_APPROXIMATE_JOBS probing saves little or nothing over an exact scan,
+# so recommend_approximate() routes smaller catalogs to recommend().
+#
+#   python cluster_index.py [--clusters N]             # build data/cluster_index.npz for the current catalog
+#   python cluster_index.py --measure [--nprobe 16 32 64] [--profiles 500]
+
+import argparse
+import threading
+import time
+
+import numpy as np
+
+from recommender_engine import (
+    HYBRID_WEIGHTS, _recommendation, _top_k, _user_matrices, _Workspace, get_catalog, recommend,
+)
+from similarity import cosine_similarities, inverse_norm
+
+CLUSTER_INDEX_PATH = "data/cluster_index.npz"
+PROBE_FRACTION = 0.1  # default share of the clusters probed per query
+MIN_APPROXIMATE_JOBS = 100_000
+KMEANS_ITERATIONS = 25
+TRAIN_POINTS_PER_CLUSTER = 128  # k-means trains on this many sampled jobs per cluster
+ASSIGN_CHUNK = 16_384  # jobs per distance block when assigning to centroids
+
+
+def _job_embeddings(catalog, weights, rows=slice(None)):
+    skill_units = np.asarray(catalog.skill_matrix[rows], dtype=float) * np.asarray(catalog.inv_skill_norms[rows])[:, None]
+    return np.hstack([
+        weights[0] * np.asarray(catalog.riasec_matrix[rows], dtype=float),
+        weights[2] * skill_units,
+        np.asarray(catalog.education_scores[rows], dtype=float)[:, None],
+    ])
+
+
+def nearest_centroids(points, centroids, chunk=ASSIGN_CHUNK):
+    """Index of, and squared distance to, each point's nearest centroid, ``chunk`` points at a time."""
+    centroid_norms = np.einsum("ij,ij->i", centroids, centroids)
+    assignments = np.empty(len(points), dtype=np.intp)
+    distances = np.empty(len(points))
+    for start in range(0, len(points), chunk):
+        block = points[start:start + chunk]
+        block_distances = centroid_norms[None, :] - 2 * block @ centroids.T
+        block_assignments = block_distances.argmin(axis=1)
+        assignments[start:start + chunk] = block_assignments
+        distances[start:start + chunk] = (
+            block_distances[np.arange(len(block)), block_assignments] + np.einsum("ij,ij->i", block, block)
+        )
+    return assignments, np.maximum(distances, 0)
+
+
+def kmeans(points, n_clusters, iterations=KMEANS_ITERATIONS, seed=0):
+    """Lloyd's k-means with k-means++ seeding; returns (centroids, assignments)."""
+    rng = np.random.default_rng(seed)
+    n_clusters = min(n_clusters, len(points))
+    squared_norms = np.einsum("ij,ij->i", points, points)
+
+    centroids = np.empty((n_clusters, points.shape[1]))
+    centroids[0] = points[rng.integers(len(points))]
+    closest = np.full(len(points), np.inf)
+    for cluster in range(1, n_clusters):
+        distances = squared_norms - 2 * points @ centroids[cluster - 1] + centroids[cluster - 1] @ centroids[cluster - 1]
+        np.minimum(closest, np.maximum(distances, 0), out=closest)
+        total = closest.sum()
+        choice = rng.choice(len(points), p=closest / total) if total > 0 else rng.integers(len(points))
+        centroids[cluster] = points[choice]
+
+    assignments = np.zeros(len(points), dtype=np.intp)
+    for _ in range(iterations):
+        new_assignments, distances = nearest_centroids(points, centroids)
+        counts = np.bincount(new_assignments, minlength=n_clusters)
+        for empty in np.flatnonzero(counts == 0):
+            # Re-seed an empty cluster with the point farthest from its centroid
+            farthest = distances.argmax()
+            new_assignments[farthest] = empty
+            distances[farthest] = -np.inf
+            counts = np.bincount(new_assignments, minlength=n_clusters)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, new_assignments, points)
+        centroids = sums / counts[:, None]
+        if np.array_equal(new_assignments, assignments):
+            break
+        assignments = new_assignments
+    return centroids, assignments
+
+
+def _cluster_means(values, assignments, n_clusters):
+    """Mean of ``values`` rows per cluster; 0 for empty clusters."""
+    counts = np.maximum(np.bincount(assignments, minlength=n_clusters), 1)
+    sums = np.column_stack([
+        np.bincount(assignments, weights=values[:, col], minlength=n_clusters) for col in range(values.shape[1])
+    ])
+    return sums / counts[:, None]
+
+
+class ClusterIndex:
+    """
+    K-means inverted lists over a catalog's job embeddings.
+
+    ``assignments`` (cluster of every catalog row) is what is saved; the
+    cluster-ordered feature copies are laid out by ``attach``.
+    """
+
+    def __init__(self, assignments, weights, catalog_version):
+        self.assignments = np.asarray(assignments, dtype=np.int32)
+        self.weights = np.array(weights, dtype=float)  # the hybrid weights the clusters were trained with
+        self.catalog_version = catalog_version
+        self.n_clusters = int(self.assignments.max()) + 1 if len(self.assignments) else 0
+        self.catalog = None
+        self._local = threading.local()
+
+    @classmethod
+    def build(cls, catalog=None, n_clusters=None, iterations=KMEANS_ITERATIONS, seed=0, log=print):
+        """
+        Cluster ``catalog`` (default: the current one) and attach to it;
+        ``n_clusters`` defaults to about sqrt(catalog size).
+        """
+        if catalog is None:
+            catalog = get_catalog()
+        n_clusters = n_clusters or max(1, int(round(np.sqrt(catalog.size))))
+        weights = HYBRID_WEIGHTS.copy()
+        points = _job_embeddings(catalog, weights)
+        rng = np.random.default_rng(seed)
+        sample_size = min(len(points), n_clusters * TRAIN_POINTS_PER_CLUSTER)
+        sample = np.sort(rng.choice(len(points), sample_size, replace=False))
+        centroids, _ = kmeans(points[sample], n_clusters, iterations, seed)
+        assignments, _ = nearest_centroids(points, centroids)
+        # Compact the cluster ids: a centroid may end up with no job once every job is assigned
+        _, assignments = np.unique(assignments, return_inverse=True)
+        index = cls(assignments, weights, catalog.version).attach(catalog)
+        log(f"Cluster index: {catalog.size} jobs in {index.n_clusters} clusters")
+        return index
+
+    def attach(self, catalog):
+        """Lay ``catalog``'s features out in cluster order for querying; returns the index."""
+        if catalog.version != self.catalog_version or catalog.size != len(self.assignments):
+            raise ValueError(f"Cluster index was built for catalog {self.catalog_version}, not {catalog.version}")
+        rows = np.argsort(self.assignments, kind="stable")  # rows stay ascending within each list
+        self.rows = rows
+        self.offsets = np.zeros(self.n_clusters + 1, dtype=np.intp)
+        np.cumsum(np.bincount(self.assignments, minlength=self.n_clusters), out=self.offsets[1:])
+        # Sorted keys of (cluster, row): one searchsorted finds every cluster's eligible prefix
+        self._keys = self.assignments[rows].astype(np.int64) * (catalog.size + 1) + rows
+        self._cluster_keys = np.arange(self.n_clusters, dtype=np.int64) * (catalog.size + 1)
+
+        # One row per job, [riasec_unit, skills, inverse skill norm, education]: a probe
+        # gathers its rows with a single take instead of one per array
+        n_riasec, n_skills = catalog.riasec_matrix.shape[1], len(catalog.skill_cols)
+        self._features = np.hstack([
+            catalog.riasec_matrix[rows], catalog.skill_matrix[rows],
+            catalog.inv_skill_norms[rows][:, None], catalog.education_scores[rows][:, None],
+        ]).astype(catalog.dtype, copy=False)
+        self._skill_columns = slice(n_riasec, n_riasec + n_skills)
+
+        # Unweighted centroids: [riasec_unit, skill_unit] and the mean education score
+        features = np.asarray(self._features, dtype=float)
+        units = np.hstack([
+            features[:, :n_riasec],
+            features[:, self._skill_columns] * features[:, -2:-1],
+            features[:, -1:],
+        ])
+        centroids = _cluster_means(units, self.assignments[rows], self.n_clusters)
+        self._riasec_centroids = centroids[:, :n_riasec]
+        self._skill_centroids = centroids[:, n_riasec:-1]
+        self._education_centroids = centroids[:, -1]
+        self.catalog = catalog
+        return self
+
+    def _workspace(self):
+        workspace = getattr(self._local, "workspace", None)
+        if workspace is None:
+            workspace = self._local.workspace = _Workspace(self.catalog.size, self.catalog.dtype)
+        return workspace
+
+    @property
+    def default_nprobe(self):
+        """PROBE_FRACTION of the clusters, at least one."""
+        return max(1, int(round(PROBE_FRACTION * self.n_clusters)))
+
+    def probe(self, user_riasec, user_education, user_skills, top_n, nprobe=None):
+        """
+        Positions (into the cluster-ordered arrays) of the eligible jobs in
+        the ``nprobe`` (default: ``default_nprobe``) best clusters the user
+        can enter; more clusters are probed while fewer than ``top_n`` jobs
+        were found.
+        """
+        if nprobe is None:
+            nprobe = self.default_nprobe
+        num_eligible = self.catalog.eligible_count(user_education)
+        starts = self.offsets[:-1]
+        counts = np.searchsorted(self._keys, self._cluster_keys + num_eligible) - starts
+        reachable = np.flatnonzero(counts > 0)
+        if not len(reachable):
+            return np.empty(0, dtype=np.intp)
+
+        skill_unit = np.asarray(user_skills, dtype=float) * inverse_norm(user_skills)
+        scores = (
+            HYBRID_WEIGHTS[0] * (self._riasec_centroids[reachable] @ np.asarray(user_riasec, dtype=float)) +
+            HYBRID_WEIGHTS[1] * (1 - np.abs(self._education_centroids[reachable] - user_education)) +
+            HYBRID_WEIGHTS[2] * (self._skill_centroids[reachable] @ skill_unit)
+        )
+        probed = reachable[np.argsort(-scores, kind="stable")]
+        found = np.cumsum(counts[probed])
+        probed = probed[:max(nprobe, int(np.searchsorted(found, top_n)) + 1)]
+
+        lengths = counts[probed]
+        first = np.cumsum(lengths) - lengths
+        owners = np.repeat(np.arange(len(probed)), lengths)
+        return starts[probed][owners] + np.arange(int(lengths.sum())) - first[owners]
+
+    def recommend(self, user_profile, top_n=10, nprobe=None):
+        """Approximate recommend(): exact hybrid scores, computed only for the probed clusters' jobs."""
+        catalog = self.catalog
+        if user_profile.get("skill_features") is not None:
+            return recommend(user_profile, top_n, catalog)  # the sparse skill path is not clustered
+
+        user_riasec, user_education, user_skills = _user_matrices(catalog, [user_profile])
+        positions = self.probe(user_riasec[0], user_education[0], user_skills[0], top_n, nprobe)
+        count = len(positions)
+        if not count:
+            return []
+
+        # The same operations as the full scan's _score_into, on the probed rows only
+        workspace = self._workspace()
+        components = workspace.components[:, :count]
+        riasec, education, skill = components
+        features = np.take(self._features, positions, axis=0)
+        np.matmul(features[:, :self._skill_columns.start], user_riasec[0], out=riasec)
+        np.subtract(features[:, -1], user_education[0], out=education)
+        np.abs(education, out=education)
+        np.subtract(1, education, out=education)
+        cosine_similarities(features[:, self._skill_columns], features[:, -2], user_skills[0], out=skill)
+        hybrid = workspace.hybrid[:count]
+        np.matmul(HYBRID_WEIGHTS.astype(components.dtype), components, out=hybrid)
+
+        rows = self.rows[positions]
+        top = _top_k(hybrid, top_n, workspace.scratch[:count], workspace.mask[:count], tie_keys=rows)
+
+        # Records read their scores at catalog rows, as the full scan leaves them
+        results = catalog.workspace()
+        results.components[:, rows[top]] = components[:, top]
+        results.hybrid[rows[top]] = hybrid[top]
+        return [_recommendation(catalog, job, results) for job in rows[top]]
+
+    def remap(self, catalog, previous_rows, changed):
+        """
+        The index for ``catalog``, derived from this one after a delta
+        (catalog_snapshots.apply_delta): row r keeps the cluster of old row
+        ``previous_rows[r]``, while added rows and rows in ``changed`` join
+        the cluster whose kept jobs they are nearest to. Clusters are
+        retrained at the next full build.
+        """
+        previous_rows = np.asarray(previous_rows)
+        kept = (previous_rows >= 0) & ~np.asarray(changed, dtype=bool)
+        assignments = np.full(catalog.size, -1, dtype=np.int64)
+        assignments[kept] = self.assignments[previous_rows[kept]]
+
+        moved = np.flatnonzero(~kept)
+        if len(moved):
+            kept_rows = np.flatnonzero(kept)
+            if not len(kept_rows):
+                return ClusterIndex(np.zeros(catalog.size, dtype=np.int32), self.weights, catalog.version)
+            centroids = _cluster_means(
+                _job_embeddings(catalog, self.weights, kept_rows), assignments[kept_rows], self.n_clusters
+            )
+            live = np.flatnonzero(np.bincount(assignments[kept_rows], minlength=self.n_clusters))  # clusters that lost every job take no new ones
+            nearest, _ = nearest_centroids(_job_embeddings(catalog, self.weights, moved), centroids[live])
+            assignments[moved] = live[nearest]
+        _, assignments = np.unique(assignments, return_inverse=True)
+        return ClusterIndex(assignments, self.weights, catalog.version)
+
+    def save(self, path=CLUSTER_INDEX_PATH):
+        np.savez(path, assignments=self.assignments, weights=self.weights,
+                 catalog_version=np.array(self.catalog_version, dtype=str))
+
+    @classmethod
+    def load(cls, path=CLUSTER_INDEX_PATH):
+        with np.load(path) as saved:
+            return cls(saved["assignments"], saved["weights"], str(saved["catalog_version"]))
+
+
+# --- Process-wide index ---
+_cluster_index = None
+_rejected = None  # (path, catalog version) of a saved index built for another catalog
+_cluster_index_lock = threading.Lock()
+
+
+def get_cluster_index(catalog=None, path=None, block=True):
+    """
+    The saved cluster index for ``catalog`` (default: the current catalog),
+    loaded and attached on first use; None if no index was built for this
+    catalog version (``python cluster_index.py``). ``path`` defaults to the
+    catalog snapshot's copy, else CLUSTER_INDEX_PATH.
+
+    With ``block=False``, None is also returned while another thread is
+    loading the index, so callers can scan exactly instead of waiting.
+    """
+    global _cluster_index, _rejected
+    if catalog is None:
+        catalog = get_catalog()
+    index = _cluster_index
+    if index is not None and index.catalog is catalog:
+        return index
+    if path is None:
+        path = catalog.data_path(CLUSTER_INDEX_PATH)
+    if not _cluster_index_lock.acquire(blocking=block):
+        return None
+    try:
+        if _cluster_index is not None and _cluster_index.catalog is catalog:
+            return _cluster_index
+        if _rejected == (path, catalog.version):
+            return None
+        try:
+            index = ClusterIndex.load(path)
+        except FileNotFoundError:
+            return None
+        if index.catalog_version != catalog.version:
+            _rejected = (path, catalog.version)
+            return None
+        _rejected = None
+        _cluster_index = index.attach(catalog)
+        return _cluster_index
+    finally:
+        _cluster_index_lock.release()
+
+
+def recommend_approximate(user_profile, top_n=10, nprobe=None, catalog=None):
+    """
+    recommend() through the cluster index: probe ``nprobe`` clusters,
+    re-rank exactly. Catalogs under MIN_APPROXIMATE_JOBS jobs, or without a
+    saved index, are scanned exactly.
+    """
+    if catalog is None:
+        catalog = get_catalog()
+    index = get_cluster_index(catalog, block=False) if catalog.size >= MIN_APPROXIMATE_JOBS else None
+    if index is None:
+        return recommend(user_profile, top_n, catalog)
+    return index.recommend(user_profile, top_n, nprobe)
+
+
+# --- Recall measurement ---
+def measure_recall(index, profiles, top_n=10, nprobe=None):
+    """
+    Recall@top_n of the index against the exact path, with mean per-query
+    latency of both and the mean fraction of the catalog re-ranked.
+    """
+    catalog = index.catalog
+    started = time.perf_counter()
+    exact = [recommend(profile, top_n, catalog, use_cache=False) for profile in profiles]
+    exact_s = time.perf_counter() - started
+
+    started = time.perf_counter()
+    approximate = [index.recommend(profile, top_n, nprobe) for profile in profiles]
+    approximate_s = time.perf_counter() - started
+
+    recalls = [
+        len({rec.job for rec in exact_recs} & {rec.job for rec in recs}) / len(exact_recs)
+        for exact_recs, recs in zip(exact, approximate) if exact_recs
+    ]
+    user_riasec, user_education, user_skills = _user_matrices(catalog, profiles)
+    scanned = [
+        len(index.probe(user_riasec[n], user_education[n], user_skills[n], top_n, nprobe)) / catalog.size
+        for n in range(len(profiles))
+    ]
+
+    return {
+        "nprobe": index.default_nprobe if nprobe is None else nprobe,
+        "recall": float(np.mean(recalls)) if recalls else 1.0,
+        "scanned_fraction": float(np.mean(scanned)),
+        "approximate_ms": approximate_s / len(profiles) * 1000,
+        "exact_ms": exact_s / len(profiles) * 1000,
+    }
+
+
+def main(argv=None):
+    from synthetic_catalog import random_profiles
+
+    parser = argparse.ArgumentParser(description="Build the cluster index for the current catalog, or measure its recall/latency.")
+    parser.add_argument("--clusters", type=int, default=None, help="k-means clusters (default: ~sqrt(catalog size))")
+    parser.add_argument("--output", default=CLUSTER_INDEX_PATH, help="index file to write (default: %(default)s)")
+    parser.add_argument("--measure", action="store_true", help="report recall and latency per nprobe instead of building")
+    parser.add_argument("--nprobe", type=int, nargs="+", default=None,
+                        help="probe counts to measure (default: a quarter, half, one and two times the default)")
+    parser.add_argument("--profiles", type=int, default=500, help="synthetic profiles to query (default: %(default)s)")
+    parser.add_argument("--top-n", type=int, default=10, help="recommendations per profile (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    catalog = get_catalog()
+    if not args.measure:
+        started = time.perf_counter()
+        ClusterIndex.build(catalog, args.clusters).save(args.output)
+        print(f"Wrote {args.output} in {time.perf_counter() - started:.2f}s")
+        return
+
+    index = get_cluster_index(catalog)
+    if index is None:
+        print("No saved index matches the catalog; building one in memory")
+        index = ClusterIndex.build(catalog, args.clusters)
+    profiles = random_profiles(catalog, args.profiles)
+    print(f"{catalog.size} jobs in {index.n_clusters} clusters")
+    print(f"{'nprobe':>6} {'recall':>8} {'scanned':>8} {'approx ms':>10} {'exact ms':>9}")
+    default = index.default_nprobe
+    for nprobe in args.nprobe or sorted({max(1, default // 4), max(1, default // 2), default, 2 * default}):
+        report = measure_recall(index, profiles, args.top_n, nprobe)
+        print(f"{nprobe:>6} {report['recall']:>8.3f} {report['scanned_fraction']:>8.1%} "
+              f"{report['approximate_ms']:>10.3f} {report['exact_ms']:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
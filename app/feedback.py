@@ -1,50 +1,528 @@
-import pandas as pd
-from datetime import datetime
+# feedback.py
+#
+# Append-only feedback store behind every feedback call site in the app.
+#
+# save_feedback() only puts the record on an in-memory buffer and returns. A
+# daemon thread flushes the buffer to data/feedback.csv every FLUSH_INTERVAL
+# seconds, or as soon as FLUSH_SIZE records are waiting. Each flush appends
+# while holding an exclusive lock on a sidecar lock file, so several server
+# processes can share one feedback file. Records are kept to one line each
+# (line breaks in comments become spaces), so a row torn by a crashed writer
+# is cut off before the next append. Every COMPACT_INTERVAL seconds the
+# flusher rewrites the file under the same lock: rows go into timestamp order,
+# malformed rows are dropped, and the header is normalized.
+#
+# Rating aggregates (count, sum and histogram, overall and per day) are kept
+# in data/feedback_aggregates.json and updated by each flush. The file records
+# the byte offset of the log it covers. A log that grew past that offset is
+# replayed from it, and one that shrank is replayed in full. Reading the
+# average rating therefore never scans the log.
+#
+# Before this store, app.py kept feedback in ./feedback.csv. The first time a
+# store touches its log, a file left there is appended to the log (line
+# breaks flattened, timestamps in the log's format) and renamed to
+# feedback.csv.migrated, so it is imported exactly once.
+
+import atexit
+import csv
+import io
+import json
 import os
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locking
+    fcntl = None
 
 FEEDBACK_FILE = "data/feedback.csv"
+LEGACY_FEEDBACK_FILE = "feedback.csv"  # where app.py wrote feedback before this store
+AGGREGATES_FILE = "data/feedback_aggregates.json"
+FEEDBACK_COLUMNS = ["timestamp", "session_id", "rating", "comment", "user_name"]
+RATING_POSITION = FEEDBACK_COLUMNS.index("rating")
+FLUSH_INTERVAL = 1.0  # seconds
+FLUSH_SIZE = 256  # pending records that trigger an early flush
+COMPACT_INTERVAL = 3600.0  # seconds; 0 disables compaction
+DOWNLOAD_CHUNK_SIZE = 1 << 20  # bytes
+
+
+class RatingSummary:
+    """Count, sum and histogram of a set of ratings."""
+
+    __slots__ = ("count", "total", "histogram")
+
+    def __init__(self, count=0, total=0, histogram=None):
+        self.count = count
+        self.total = total
+        self.histogram = dict(histogram or {})
+
+    def add(self, rating):
+        self.count += 1
+        self.total += rating
+        self.histogram[rating] = self.histogram.get(rating, 0) + 1
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else None
+
+    def to_dict(self):
+        return {"count": self.count, "sum": self.total,
+                "histogram": {str(rating): n for rating, n in sorted(self.histogram.items())}}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["count"], data["sum"], {int(rating): n for rating, n in data["histogram"].items()})
+
+
+class FeedbackAggregates:
+    """Rating summaries overall and per day, covering the first ``log_offset`` bytes of the log."""
+
+    def __init__(self, overall=None, days=None, log_offset=0):
+        self.overall = overall or RatingSummary()
+        self.days = days or {}
+        self.log_offset = log_offset
+
+    def add_row(self, row):
+        """Count one row in FEEDBACK_COLUMNS order."""
+        rating = int(float(row[RATING_POSITION]))
+        day = str(row[0])[:10]
+        self.overall.add(rating)
+        summary = self.days.get(day)
+        if summary is None:
+            summary = self.days[day] = RatingSummary()
+        summary.add(rating)
+
+    def copy(self):
+        return FeedbackAggregates.from_dict(self.to_dict())
+
+    def daily_frame(self):
+        """One row per day: date, number of ratings and average rating."""
+        days = sorted(self.days.items())
+        return pd.DataFrame({
+            "date": [day for day, _ in days],
+            "ratings": [summary.count for _, summary in days],
+            "average_rating": [summary.mean for _, summary in days],
+        })
+
+    def to_dict(self):
+        return {
+            "log_offset": self.log_offset,
+            "overall": self.overall.to_dict(),
+            "days": {day: summary.to_dict() for day, summary in sorted(self.days.items())},
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            RatingSummary.from_dict(data["overall"]),
+            {day: RatingSummary.from_dict(summary) for day, summary in data["days"].items()},
+            data["log_offset"],
+        )
+
+    def save(self, path):
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """The saved aggregates, or None if the file is missing or unreadable."""
+        try:
+            with open(path, encoding="utf-8") as f:
+                return cls.from_dict(json.load(f))
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+
+class FeedbackStore:
+    """Buffered, append-only CSV of feedback records shared across processes."""
+
+    def __init__(self, path=FEEDBACK_FILE, aggregates_path=AGGREGATES_FILE, flush_interval=FLUSH_INTERVAL,
+                 flush_size=FLUSH_SIZE, compact_interval=COMPACT_INTERVAL, legacy_path=LEGACY_FEEDBACK_FILE):
+        self.path = path
+        self.aggregates_path = aggregates_path
+        self.legacy_path = legacy_path
+        self.lock_path = f"{path}.lock"
+        self.flush_interval = flush_interval
+        self.flush_size = flush_size
+        self.compact_interval = compact_interval
+        self._pending = deque()
+        self._wake = threading.Condition()
+        self._flush_lock = threading.Lock()  # one flush or read of the file at a time per process
+        self._flusher = None
+        self._aggregates = None  # (file state it was read at, FeedbackAggregates)
+        self._legacy_checked = False
+
+    # --- Writing ---
+    def append(self, record):
+        """Queue one record (a dict keyed by FEEDBACK_COLUMNS); never touches the disk."""
+        row = [_single_line(record.get(col)) for col in FEEDBACK_COLUMNS]
+        with self._wake:
+            self._pending.append(row)
+            if len(self._pending) >= self.flush_size:
+                self._wake.notify()
+            if self._flusher is None:
+                self._start_flusher()
+
+    def flush(self):
+        """Append every pending record to the file; returns how many were written."""
+        with self._flush_lock:
+            with self._wake:
+                rows = list(self._pending)
+                self._pending.clear()
+            if not rows:
+                return 0
+            try:
+                with self._file_lock(exclusive=True):
+                    self._truncate_torn_row()
+                    aggregates = self._read_aggregates().copy()
+                    self._append_rows(rows)
+                    for row in rows:
+                        aggregates.add_row(row)
+                    aggregates.log_offset = os.path.getsize(self.path)
+                    self._save_aggregates(aggregates)
+            except OSError:
+                with self._wake:
+                    self._pending.extendleft(reversed(rows))
+                raise
+            return len(rows)
+
+    def compact(self):
+        """Rewrite the file in timestamp order without malformed rows; returns rows kept."""
+        with self._flush_lock, self._file_lock(exclusive=True):
+            if not os.path.exists(self.path):
+                return 0
+            rows = sorted(self._read_rows(), key=lambda row: row[0])
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(FEEDBACK_COLUMNS)
+                writer.writerows(rows)
+            os.replace(tmp_path, self.path)
+
+            aggregates = FeedbackAggregates(log_offset=os.path.getsize(self.path))
+            for row in rows:
+                aggregates.add_row(row)
+            self._save_aggregates(aggregates)
+            return len(rows)
+
+    def close(self):
+        """Flush whatever is still buffered (registered to run at interpreter exit)."""
+        try:
+            self.flush()
+        except OSError as err:
+            print(f"feedback: could not flush {len(self._pending)} record(s): {err}", file=sys.stderr)
+
+    def _append_rows(self, rows):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
+            writer.writerow(FEEDBACK_COLUMNS)
+        writer.writerows(rows)
+        with open(self.path, "a", encoding="utf-8", newline="") as f:
+            f.write(buffer.getvalue())
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _truncate_torn_row(self):
+        """Cut a partial last line (left by a writer that died mid-append) off the file."""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r+b") as f:
+            end = f.seek(0, os.SEEK_END)
+            position = end
+            while position > 0:
+                start = max(position - 65536, 0)
+                f.seek(start)
+                newline = f.read(position - start).rfind(b"\n")
+                if newline >= 0:
+                    position = start + newline + 1
+                    break
+                position = start
+            if position < end:
+                f.truncate(position)
+
+    def _start_flusher(self):
+        self._flusher = threading.Thread(target=self._run, name="feedback-flusher", daemon=True)
+        self._flusher.start()
+        atexit.register(self.close)
+
+    def _run(self):
+        next_compaction = time.monotonic() + self.compact_interval
+        while True:
+            with self._wake:
+                if len(self._pending) < self.flush_size:
+                    self._wake.wait(self.flush_interval)
+            try:
+                self.flush()
+                if self.compact_interval and time.monotonic() >= next_compaction:
+                    self.compact()
+                    next_compaction = time.monotonic() + self.compact_interval
+            except OSError as err:
+                # Records stay buffered and are retried on the next pass
+                print(f"feedback: flush to {self.path} failed: {err}", file=sys.stderr)
+
+    # --- Reading ---
+    def load(self):
+        """All records, flushed and still buffered, as a DataFrame."""
+        with self._flush_lock:
+            rows = []
+            if os.path.exists(self.path):
+                with self._file_lock(exclusive=False):
+                    rows = list(self._read_rows())
+            with self._wake:
+                rows.extend(self._pending)
+        return _frame(rows)
+
+    def aggregates(self):
+        """Rating aggregates over every record, flushed and still buffered."""
+        with self._flush_lock:
+            with self._file_lock(exclusive=False):
+                aggregates = self._read_aggregates()
+            with self._wake:
+                pending = list(self._pending)
+        if pending:
+            aggregates = aggregates.copy()
+            for row in pending:
+                aggregates.add_row(row)
+        return aggregates
+
+    def recent(self, n=100):
+        """The last ``n`` records as a DataFrame, read from the end of the log."""
+        with self._flush_lock:
+            rows = []
+            if os.path.exists(self.path):
+                with self._file_lock(exclusive=False):
+                    rows = self._read_tail(n)
+            with self._wake:
+                rows.extend(self._pending)
+        return _frame(rows[-n:] if n else [])
+
+    def iter_log(self, chunk_size=DOWNLOAD_CHUNK_SIZE):
+        """
+        Yield the log as raw CSV bytes, ``chunk_size`` at a time.
+
+        The file is streamed as it was when opened, so appends and
+        compactions running meanwhile do not affect the download. Records
+        still buffered at that moment follow it; they are left for the
+        flusher rather than written (and synced) on the reader's thread.
+        """
+        f, size = None, 0
+        with self._flush_lock:
+            with self._file_lock(exclusive=False):
+                if os.path.exists(self.path):
+                    f = open(self.path, "rb")
+                    size = os.fstat(f.fileno()).st_size
+            with self._wake:
+                pending = list(self._pending)
+        if f is not None:
+            with f:
+                remaining = size
+                while remaining > 0:
+                    chunk = f.read(min(chunk_size, remaining))
+                    if not chunk:
+                        break
+                    remaining -= len(chunk)
+                    yield chunk
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if size == 0:
+            writer.writerow(FEEDBACK_COLUMNS)
+        writer.writerows(pending)
+        yield buffer.getvalue().encode("utf-8")
+
+    def _read_aggregates(self):
+        """Aggregates covering the whole log; call with the file lock held."""
+        log_size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        try:
+            saved = os.stat(self.aggregates_path)
+            state = (saved.st_mtime_ns, saved.st_size, log_size)
+        except FileNotFoundError:
+            state = (None, None, log_size)
+        if self._aggregates is not None and self._aggregates[0] == state:
+            return self._aggregates[1]
+
+        aggregates = FeedbackAggregates.load(self.aggregates_path)
+        if aggregates is None or aggregates.log_offset > log_size:
+            aggregates = FeedbackAggregates()  # missing, or the log was rewritten: replay all of it
+        if aggregates.log_offset < log_size:
+            for row in self._read_rows(aggregates.log_offset):
+                aggregates.add_row(row)
+            aggregates.log_offset = log_size
+        self._aggregates = (state, aggregates)
+        return aggregates
+
+    def _save_aggregates(self, aggregates):
+        aggregates.save(self.aggregates_path)
+        saved = os.stat(self.aggregates_path)
+        self._aggregates = ((saved.st_mtime_ns, saved.st_size, aggregates.log_offset), aggregates)
+
+    def _read_rows(self, offset=0, path=None):
+        """
+        Yield valid rows of the log (or of the file at ``path``) in
+        FEEDBACK_COLUMNS order, whatever the file's column order, starting
+        at byte ``offset`` (a row boundary) if given.
+        """
+        with open(path or self.path, "rb") as raw:
+            columns = _column_positions(raw.readline())
+            if columns is None:
+                return
+            if offset > raw.tell():
+                raw.seek(offset)
+            for row in csv.reader(io.TextIOWrapper(raw, encoding="utf-8", newline="")):
+                row = columns(row)
+                if row is not None:
+                    yield row
+
+    def _read_tail(self, n):
+        """Valid rows among the last ``n`` lines of the log."""
+        with open(self.path, "rb") as f:
+            columns = _column_positions(f.readline())
+            if columns is None:
+                return []
+            header_end = f.tell()
+            position = f.seek(0, os.SEEK_END)
+            tail = b""
+            while position > header_end and tail.count(b"\n") <= n:
+                start = max(position - 65536, header_end)
+                f.seek(start)
+                tail = f.read(position - start) + tail
+                position = start
+        lines = tail.decode("utf-8", errors="replace").splitlines()[-n:] if n else []
+        return [row for row in map(columns, csv.reader(lines)) if row is not None]
+
+    def _import_legacy(self):
+        """Append the rows of a pre-store feedback file to the log; call with the exclusive file lock held."""
+        if not self.legacy_path or not os.path.exists(self.legacy_path) or (
+            os.path.exists(self.path) and os.path.samefile(self.legacy_path, self.path)
+        ):
+            return
+        rows = [
+            [_single_line(_log_timestamp(row[0]))] + [_single_line(value) for value in row[1:]]
+            for row in self._read_rows(path=self.legacy_path)
+        ]
+        if rows:
+            self._truncate_torn_row()
+            self._append_rows(rows)  # the aggregates replay them from their recorded offset
+        os.replace(self.legacy_path, f"{self.legacy_path}.migrated")
+
+    @contextmanager
+    def _file_lock(self, exclusive):
+        if not self._legacy_checked:
+            with self._lock_file(exclusive=True):
+                self._import_legacy()
+            self._legacy_checked = True
+        with self._lock_file(exclusive):
+            yield
+
+    @contextmanager
+    def _lock_file(self, exclusive):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.lock_path, "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+def _column_positions(header_line):
+    """
+    Given the log's raw header line, return a function mapping a parsed row
+    to FEEDBACK_COLUMNS order, or to None if it is malformed.
+    """
+    header = next(csv.reader([header_line.decode("utf-8")]), None)
+    if not header:
+        return None
+    positions = [header.index(col) if col in header else None for col in FEEDBACK_COLUMNS]
+    if positions[RATING_POSITION] is None:
+        return None
+
+    def columns(row):
+        if len(row) != len(header):
+            return None
+        try:
+            int(float(row[positions[RATING_POSITION]]))
+        except ValueError:
+            return None
+        return ["" if position is None else row[position] for position in positions]
+
+    return columns
+
+
+def _frame(rows):
+    df = pd.DataFrame(rows, columns=FEEDBACK_COLUMNS)
+    df["rating"] = pd.to_numeric(df["rating"]).astype(int)
+    return df
+
+
+def _log_timestamp(value):
+    """A timestamp in the log's format; app.py used to write ISO 8601 with microseconds."""
+    try:
+        return datetime.fromisoformat(value).strftime("%Y-%m-%d %H:%M:%S")
+    except ValueError:
+        return value
+
+
+def _single_line(value):
+    if value is None:
+        return ""
+    if isinstance(value, str):
+        return " ".join(value.splitlines())
+    return value
+
+
+feedback_store = FeedbackStore()
 
-# Ensure the data folder exists
-os.makedirs("data", exist_ok=True)
 
 # Make Feedback Anonymous or User-Linked
 def save_feedback(rating, comment, session_id, user_name=None):
     """Save feedback entry with optional user_name."""
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    data = {
-        "timestamp": timestamp,
+    feedback_store.append({
+        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
         "session_id": session_id,
-        "rating": rating,
+        "rating": int(rating),
         "comment": comment,
         "user_name": user_name if user_name else "Anonymous"
-    }
-
-    # Append to file
-    df = pd.DataFrame([data])
-    if os.path.exists(FEEDBACK_FILE):
-        df.to_csv(FEEDBACK_FILE, mode='a', header=False, index=False)
-    else:
-        df.to_csv(FEEDBACK_FILE, mode='w', header=True, index=False)
+    })
 
 def load_feedback():
-    if os.path.exists(FEEDBACK_FILE):
-        return pd.read_csv(FEEDBACK_FILE)
-    return pd.DataFrame(columns=["timestamp", "session_id", "rating", "comment", "user_name"])
+    return feedback_store.load()
 
 def get_average_rating():
-    df = load_feedback()
-    if not df.empty:
-        return round(df["rating"].mean(), 2)
+    mean = feedback_store.aggregates().overall.mean
+    if mean is not None:
+        return round(mean, 2)
     return None
 
+def load_feedback_aggregates():
+    """Rating count, sum and histogram, overall (``.overall``) and per day (``.days``)."""
+    return feedback_store.aggregates()
+
+def load_recent_feedback(n=100):
+    return feedback_store.recent(n)
+
+def iter_feedback_csv(chunk_size=DOWNLOAD_CHUNK_SIZE):
+    """The raw feedback log, in chunks of bytes (for downloads)."""
+    return feedback_store.iter_log(chunk_size)
+
 # Show Feedback Results in a Chart (Optional Admin View)
 def load_all_feedback():
     """
-    Load all feedback from the CSV file as a DataFrame.
+    Load all feedback entries as a DataFrame.
     Returns:
         df: pandas DataFrame of all feedback entries
     """
-    if os.path.exists(FEEDBACK_FILE):
-        df = pd.read_csv(FEEDBACK_FILE)
-        return df
-    return pd.DataFrame(columns=["timestamp", "session_id", "rating", "comment"])
+    return load_feedback()
@@ -0,0 +1,260 @@
+# load_test.py
+#
+# Session replay load generator for the recommendation path, run locally
+# against the in-process engine and the file-backed stores.
+#
+# Each virtual user runs visits one after another, and each visit replays
+# the reruns app.py makes for one visitor:
+#   submit     ScoringSession.update() + frame(), then log_usage() (first submit or changed inputs)
+#   re-sort    frame(sort_by=...) for another metric; served from the session's top-k, no re-scoring
+#   adjust     the next profile of the visit submitted again (only changed components are re-scored)
+#   feedback   save_feedback() for an emoji click, then get_average_rating() as the feedback form shows it
+# Think time between steps is exponential with mean --think seconds. Users
+# are threads, as Streamlit runs each browser session's script on its own
+# thread.
+#
+# Visits come from a usage log (--replay usage_data.csv; one visit per
+# session_id, its rows the successive submits) or are synthetic: a random
+# profile followed by slider and skill tweaks. Usage and feedback are
+# written to a scratch directory unless --in-place is given.
+#
+#   python load_test.py --users 32 --duration 60 --think 0.5 [--replay usage_data.csv] [--output report.json]
+
+import argparse
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+import uuid
+from collections import defaultdict
+
+import numpy as np
+
+import analytics
+import feedback
+from analytics import EDUCATION_LEVELS
+from recommender_engine import RIASEC_TRAITS, SKILL_PREFIX, SORT_FIELDS, ScoringSession, get_catalog
+
+OPERATIONS = ["scoring", "resort", "usage_log", "feedback_write", "feedback_read"]
+FEEDBACK_RATE = 0.3  # share of visits that end with a feedback click
+
+
+def _profile(riasec, education, skills):
+    return {
+        **dict(zip(RIASEC_TRAITS, riasec)),
+        "education": education,
+        "education_level": (EDUCATION_LEVELS.index(education) + 1) / len(EDUCATION_LEVELS),
+        "skills": [SKILL_PREFIX + skill for skill in skills],
+        "skill_names": list(skills),
+    }
+
+
+def visits_from_log(path=analytics.USAGE_LOG):
+    """One visit per session_id of a usage log: its logged profiles, in order."""
+    import pandas as pd
+
+    log = pd.read_csv(path, dtype={"skills": str}, keep_default_na=False)
+    log = log[log["education"].isin(EDUCATION_LEVELS)]
+    visits = []
+    for _, rows in log.groupby("session_id", sort=False):
+        visits.append([
+            _profile(
+                [float(row[trait]) for trait in RIASEC_TRAITS], row["education"],
+                [skill for skill in row["skills"].split(analytics.SKILL_SEPARATOR) if skill],
+            )
+            for _, row in rows.iterrows()
+        ])
+    return visits
+
+
+def synthetic_visits(catalog, n, seed=0, max_adjustments=3):
+    """Random visits: a first profile, then up to ``max_adjustments`` slider moves or skill toggles."""
+    rng = random.Random(seed)
+    skill_options = catalog.skill_options
+    visits = []
+    for _ in range(n):
+        riasec = [rng.choice(np.arange(0, 7.5, 0.5).tolist()) for _ in RIASEC_TRAITS]
+        education = rng.choice(EDUCATION_LEVELS)
+        skills = rng.sample(skill_options, rng.randint(0, min(5, len(skill_options))))
+        visit = [_profile(riasec, education, skills)]
+        for _ in range(rng.randint(0, max_adjustments)):
+            riasec, skills = list(riasec), list(skills)
+            if skills and rng.random() < 0.3:
+                skills.remove(rng.choice(skills))
+            else:
+                riasec[rng.randrange(len(riasec))] = rng.choice(np.arange(0, 7.5, 0.5).tolist())
+            visit.append(_profile(riasec, education, skills))
+        visits.append(visit)
+    return visits
+
+
+class LoadTest:
+    """Concurrent replay of visits; latencies per operation are collected in ``samples``."""
+
+    def __init__(self, visits, users=8, duration=30.0, think=0.5, catalog=None, seed=0):
+        self.visits = visits
+        self.users = users
+        self.duration = duration
+        self.think = think
+        self.catalog = get_catalog() if catalog is None else catalog
+        self.seed = seed
+        self.samples = defaultdict(list)
+        self.visits_done = 0
+        self.errors = 0
+        self.first_error = None
+        self._lock = threading.Lock()
+
+    def _timed(self, operation, func, *args, **kwargs):
+        started = time.perf_counter()
+        result = func(*args, **kwargs)
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self.samples[operation].append(elapsed)
+        return result
+
+    def _pause(self, rng, deadline):
+        if self.think > 0:
+            time.sleep(min(rng.expovariate(1 / self.think), max(0.0, deadline - time.monotonic())))
+
+    def _submit(self, session, profile):
+        session.update(profile, catalog=self.catalog)
+        return session.frame()
+
+    def _visit(self, visit, rng, deadline):
+        session = ScoringSession()
+        session_id = str(uuid.uuid4())
+        sort_options = [metric for metric in SORT_FIELDS if metric != 'Normalized Education Score']
+        for step, profile in enumerate(visit):
+            if step and time.monotonic() >= deadline:
+                return
+            # --- Submit (first profile) or adjust (the rest) ---
+            results = self._timed("scoring", self._submit, session, profile)
+            if session.last_update and not results.empty:
+                top_match = results.iloc[0]
+                self._timed(
+                    "usage_log", analytics.log_usage, session_id, "Load Test",
+                    {trait: profile[trait] for trait in RIASEC_TRAITS}, profile["education"],
+                    profile["skill_names"], top_match['Title'], top_match['Hybrid Recommendation Score']
+                )
+            self._pause(rng, deadline)
+
+            # --- Re-sort by another metric ---
+            self._timed("resort", session.frame, sort_by=rng.choice(sort_options))
+            self._pause(rng, deadline)
+
+        if rng.random() < FEEDBACK_RATE:
+            self._timed("feedback_write", feedback.save_feedback, rng.choice([1, 3, 5]), "Load test reaction", session_id)
+            self._timed("feedback_read", feedback.get_average_rating)
+
+    def _user(self, user_id, deadline):
+        rng = random.Random(self.seed * 100_003 + user_id)
+        while time.monotonic() < deadline:
+            try:
+                self._visit(rng.choice(self.visits), rng, deadline)
+            except Exception as exc:
+                with self._lock:
+                    self.errors += 1
+                    self.first_error = self.first_error or repr(exc)
+                continue
+            with self._lock:
+                self.visits_done += 1
+
+    def run(self):
+        deadline = time.monotonic() + self.duration
+        started = time.perf_counter()
+        threads = [
+            threading.Thread(target=self._user, args=(user_id, deadline), name=f"load-user-{user_id}", daemon=True)
+            for user_id in range(self.users)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.elapsed = time.perf_counter() - started
+        return self.report()
+
+    def report(self):
+        """Throughput and latency percentiles per operation."""
+        operations = {}
+        for operation in OPERATIONS:
+            samples = np.array(self.samples.get(operation, [])) * 1000
+            if not samples.size:
+                continue
+            operations[operation] = {
+                "count": int(samples.size),
+                "per_s": samples.size / self.elapsed,
+                "p50_ms": float(np.percentile(samples, 50)),
+                "p95_ms": float(np.percentile(samples, 95)),
+                "p99_ms": float(np.percentile(samples, 99)),
+                "max_ms": float(samples.max()),
+            }
+        return {
+            "users": self.users,
+            "think_s": self.think,
+            "elapsed_s": self.elapsed,
+            "catalog_jobs": self.catalog.size,
+            "visits": self.visits_done,
+            "errors": self.errors,
+            "first_error": self.first_error,
+            "operations": operations,
+        }
+
+
+def _use_scratch_stores(directory):
+    """Point the usage log and the feedback store at files in ``directory``."""
+    analytics.USAGE_LOG = os.path.join(directory, "usage_data.csv")
+    feedback.feedback_store = feedback.FeedbackStore(
+        os.path.join(directory, "feedback.csv"), os.path.join(directory, "feedback_aggregates.json")
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay concurrent user sessions against the engine and the file-backed stores.")
+    parser.add_argument("--users", type=int, default=8, help="concurrent sessions (default: %(default)s)")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds to run (default: %(default)s)")
+    parser.add_argument("--think", type=float, default=0.5, help="mean think time between steps, seconds (default: %(default)s)")
+    parser.add_argument("--replay", default=None, help="usage log to replay visits from (default: synthetic visits)")
+    parser.add_argument("--visits", type=int, default=1000, help="synthetic visits to draw from (default: %(default)s)")
+    parser.add_argument("--jobs", default=None, help="score against a synthetic catalog of this size (1k, 10k, ...) instead of the real one")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--in-place", action="store_true", help="write to the real usage log and feedback store")
+    parser.add_argument("--output", default=None, help="JSON file to write the report to")
+    args = parser.parse_args(argv)
+
+    if args.jobs:
+        from recommender_engine import JobCatalog
+        from synthetic_catalog import parse_size, synthetic_job_profiles
+        catalog = JobCatalog(synthetic_job_profiles(parse_size(args.jobs), args.seed), version=f"synthetic-{args.jobs}")
+    else:
+        catalog = get_catalog()
+    visits = visits_from_log(args.replay) if args.replay else synthetic_visits(catalog, args.visits, args.seed)
+    if not visits:
+        parser.error("no visits to replay")
+
+    scratch = None
+    if not args.in_place:
+        scratch = tempfile.TemporaryDirectory(prefix="smartpath-load-")
+        _use_scratch_stores(scratch.name)
+    try:
+        report = LoadTest(visits, args.users, args.duration, args.think, catalog, args.seed).run()
+        feedback.feedback_store.close()
+    finally:
+        if scratch is not None:
+            scratch.cleanup()
+
+    print(f"{report['users']} users, {report['visits']} visits in {report['elapsed_s']:.1f}s "
+          f"against {report['catalog_jobs']} jobs, {report['errors']} errors")
+    print(f"{'operation':<15} {'count':>7} {'per s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for operation, stats in report["operations"].items():
+        print(f"{operation:<15} {stats['count']:>7} {stats['per_s']:>8.1f} {stats['p50_ms']:>8.3f} "
+              f"{stats['p95_ms']:>8.3f} {stats['p99_ms']:>8.3f} {stats['max_ms']:>8.3f}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
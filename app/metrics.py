@@ -0,0 +1,163 @@
+# metrics.py
+#
+# Low-overhead stage timers for the recommendation path and the app.
+#
+#   with metrics.stage("riasec"):
+#       ...
+#
+# Timings are kept in rolling windows per stage and summarized as p50/p95/p99
+# on demand. When metrics are disabled (the default; set SMARTPATH_METRICS=1
+# to enable) ``stage`` returns a shared no-op context manager, so timers can
+# stay in the hot path.
+
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import nullcontext
+
+import numpy as np
+
+WINDOW = int(os.environ.get("SMARTPATH_METRICS_WINDOW", 2048))  # samples kept per stage
+METRICS_PATH = os.environ.get("SMARTPATH_METRICS_FILE", "metrics.prom")
+QUANTILES = (0.5, 0.95, 0.99)
+
+_enabled = os.environ.get("SMARTPATH_METRICS", "0").lower() in ("1", "true", "yes")
+_NULL_TIMER = nullcontext()
+
+
+class _Histogram:
+    __slots__ = ("samples", "count", "total")
+
+    def __init__(self):
+        self.samples = deque(maxlen=WINDOW)
+        self.count = 0
+        self.total = 0.0
+
+
+_histograms = {}
+_lock = threading.Lock()
+
+
+class _Timer:
+    __slots__ = ("name", "started")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        record(self.name, time.perf_counter() - self.started)
+        return False
+
+
+def stage(name):
+    """Context manager timing one stage; a shared no-op when metrics are off."""
+    if not _enabled:
+        return _NULL_TIMER
+    return _Timer(name)
+
+
+def record(name, seconds):
+    """Add one duration (in seconds) to a stage's rolling window."""
+    with _lock:
+        histogram = _histograms.get(name)
+        if histogram is None:
+            histogram = _histograms[name] = _Histogram()
+        histogram.samples.append(seconds)
+        histogram.count += 1
+        histogram.total += seconds
+
+
+def enable(on=True):
+    global _enabled
+    _enabled = on
+
+
+def is_enabled():
+    return _enabled
+
+
+def reset():
+    with _lock:
+        _histograms.clear()
+
+
+def snapshot():
+    """
+    Per-stage summary: ``{stage: {"count", "total_s", "p50_ms", "p95_ms",
+    "p99_ms", "max_ms"}}``. Percentiles cover the rolling window; count and
+    total cover the process lifetime.
+    """
+    with _lock:
+        windows = {name: (np.array(h.samples), h.count, h.total) for name, h in _histograms.items()}
+    summary = {}
+    for name, (samples, count, total) in sorted(windows.items()):
+        quantiles = np.quantile(samples, QUANTILES) * 1000 if samples.size else [0.0] * len(QUANTILES)
+        summary[name] = {
+            "count": count,
+            "total_s": total,
+            "p50_ms": float(quantiles[0]),
+            "p95_ms": float(quantiles[1]),
+            "p99_ms": float(quantiles[2]),
+            "max_ms": float(samples.max() * 1000) if samples.size else 0.0,
+        }
+    return summary
+
+
+def to_prometheus(summary=None):
+    """Render a snapshot in the Prometheus text exposition format (as a summary metric)."""
+    summary = snapshot() if summary is None else summary
+    lines = [
+        "# HELP smartpath_stage_seconds Latency of SmartPath recommendation and render stages.",
+        "# TYPE smartpath_stage_seconds summary",
+    ]
+    for name, stats in summary.items():
+        for quantile, key in zip(QUANTILES, ("p50_ms", "p95_ms", "p99_ms")):
+            lines.append(f'smartpath_stage_seconds{{stage="{name}",quantile="{quantile}"}} {stats[key] / 1000:.9f}')
+        lines.append(f'smartpath_stage_seconds_sum{{stage="{name}"}} {stats["total_s"]:.9f}')
+        lines.append(f'smartpath_stage_seconds_count{{stage="{name}"}} {stats["count"]}')
+    return "\n".join(lines) + "\n"
+
+
+def export(path=METRICS_PATH):
+    """
+    Write the current snapshot to ``path``: JSON lines (appended, one line
+    per stage) if it ends in .jsonl, otherwise Prometheus text (replaced
+    atomically, for a node-exporter textfile collector).
+    """
+    summary = snapshot()
+    if path.endswith(".jsonl"):
+        timestamp = time.time()
+        with open(path, "a", encoding="utf-8") as f:
+            for name, stats in summary.items():
+                f.write(json.dumps({"timestamp": timestamp, "stage": name, **stats}) + "\n")
+    else:
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(to_prometheus(summary))
+        os.replace(tmp_path, path)
+
+
+_exporter = None
+
+
+def start_exporter(path=METRICS_PATH, interval=60.0):
+    """Export every ``interval`` seconds from a daemon thread (once per process)."""
+    global _exporter
+    with _lock:
+        if _exporter is not None:
+            return _exporter
+
+        def run():
+            while True:
+                time.sleep(interval)
+                export(path)
+
+        _exporter = threading.Thread(target=run, name="smartpath-metrics-exporter", daemon=True)
+        _exporter.start()
+        return _exporter
@@ -0,0 +1,226 @@
+# occupation_graph.py
+#
+# Related-occupation graph over the job catalog, from Related Occupations.xlsx.
+#
+# Nodes are catalog rows, so expansion results index straight into the
+# catalog. Edges are stored as CSR arrays:
+#   indptr   (n_jobs + 1,) int64  edges of row r are indptr[r]:indptr[r + 1]
+#   indices  (n_edges,)    int32  related row
+#   tiers    (n_edges,)    int8   0 Primary-Short, 1 Primary-Long, 2 Supplemental
+#   weights  (n_edges,)    float32 relatedness of the tier (TIER_WEIGHTS)
+#
+# expand() runs a bounded breadth-first propagation from a set of seed jobs.
+# Each hop gathers the frontier's edge ranges with one vectorized index
+# computation and accumulates seed score * edge weight * decay^hop with
+# np.bincount. The gathers scale with the edges touched, a few thousand for
+# two hops, but each call also allocates a handful of catalog-sized arrays;
+# at O*NET size (about 900 jobs) that is cheaper than de-duplicating the
+# touched rows, and the whole expansion stays around 0.2 ms.
+#
+#   python occupation_graph.py    # build data/related_occupations.npz for the current catalog
+
+import argparse
+import threading
+from collections import namedtuple
+
+import numpy as np
+
+from build_catalog import DATA_DIR, load_workbooks
+
+GRAPH_PATH = "data/related_occupations.npz"
+TIERS = ["Primary-Short", "Primary-Long", "Supplemental"]
+TIER_WEIGHTS = np.array([1.0, 0.6, 0.3], dtype=np.float32)
+DEPTH = 2
+DECAY = 0.5
+
+AdjacentCareer = namedtuple("AdjacentCareer", ["job", "title", "relatedness", "hops"])
+
+
+class OccupationGraph:
+    """CSR adjacency of related occupations over catalog rows."""
+
+    def __init__(self, indptr, indices, tiers, catalog_version):
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int32)
+        self.tiers = np.asarray(tiers, dtype=np.int8)
+        self.weights = TIER_WEIGHTS[self.tiers]
+        self.catalog_version = catalog_version
+
+    @property
+    def size(self):
+        return len(self.indptr) - 1
+
+    @classmethod
+    def from_edges(cls, size, sources, targets, tiers, catalog_version):
+        """Build from parallel edge arrays; edges keep their order within each source."""
+        sources = np.asarray(sources, dtype=np.int64)
+        order = np.argsort(sources, kind="stable")
+        indptr = np.zeros(size + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=size), out=indptr[1:])
+        return cls(indptr, np.asarray(targets)[order], np.asarray(tiers)[order], catalog_version)
+
+    def neighbors(self, row):
+        """Related rows of one job and the tier of each edge."""
+        start, end = self.indptr[row], self.indptr[row + 1]
+        return self.indices[start:end], self.tiers[start:end]
+
+    def _edges_of(self, nodes):
+        """Edge positions of every node in ``nodes`` and, per edge, the index of its node."""
+        starts = self.indptr[nodes]
+        lengths = self.indptr[nodes + 1] - starts
+        owners = np.repeat(np.arange(len(nodes)), lengths)
+        first_positions = np.cumsum(lengths) - lengths
+        positions = starts[owners] + np.arange(int(lengths.sum())) - first_positions[owners]
+        return positions, owners
+
+    def expand(self, seeds, seed_scores=None, top_n=10, depth=DEPTH, decay=DECAY, num_eligible=None):
+        """
+        Rank jobs adjacent to ``seeds`` (catalog rows) within ``depth`` hops.
+
+        A job's raw relatedness is the sum over paths of seed score x edge
+        weight, decayed by ``decay`` per extra hop; it is returned scaled by
+        the best result's, so the most related job scores 1 and every score
+        is in (0, 1]. Seeds themselves and rows at or past ``num_eligible``
+        are excluded. Returns (rows, relatedness, hops), best first, ties
+        broken by row.
+        """
+        if top_n <= 0:
+            return np.empty(0, dtype=np.intp), np.empty(0), np.empty(0, dtype=np.int8)
+        seeds = np.asarray(seeds, dtype=np.intp)
+        seed_scores = np.ones(len(seeds)) if seed_scores is None else np.asarray(seed_scores, dtype=float)
+        relatedness = np.zeros(self.size)
+        hops = np.zeros(self.size, dtype=np.int8)
+        expanded = np.zeros(self.size, dtype=bool)
+        expanded[seeds] = True
+
+        frontier, frontier_scores = seeds, seed_scores
+        for hop in range(depth):
+            if not len(frontier):
+                break
+            positions, owners = self._edges_of(frontier)
+            targets = self.indices[positions]
+            reached = np.bincount(
+                targets, weights=frontier_scores[owners] * self.weights[positions] * decay ** hop,
+                minlength=self.size
+            )
+            new = (reached > 0) & (hops == 0) & ~expanded
+            hops[new] = hop + 1
+            relatedness += reached
+
+            frontier = np.flatnonzero((reached > 0) & ~expanded)
+            expanded[frontier] = True
+            frontier_scores = reached[frontier]
+
+        relatedness[seeds] = 0
+        if num_eligible is not None:
+            relatedness[num_eligible:] = 0
+        candidates = np.flatnonzero(relatedness > 0)
+        if len(candidates) > top_n:
+            keep = np.argpartition(-relatedness[candidates], top_n - 1)[:top_n]
+            threshold = relatedness[candidates[keep]].min()
+            candidates = candidates[relatedness[candidates] >= threshold]  # keep ties for the row tie-break
+        order = np.lexsort((candidates, -relatedness[candidates]))[:top_n]
+        rows = candidates[order]
+        scores = relatedness[rows]
+        if len(rows):
+            scores /= scores[0]
+        return rows, scores, hops[rows]
+
+    def remap(self, previous_rows, catalog_version):
+        """
+        The graph over a catalog derived by a delta (catalog_snapshots.apply_delta),
+        where row r was old row ``previous_rows[r]`` (-1 for an added job).
+        Edges between surviving jobs are kept; added jobs have none until the
+        graph is next built from the workbook.
+        """
+        previous_rows = np.asarray(previous_rows)
+        new_rows = np.full(self.size, -1, dtype=np.int64)
+        kept = np.flatnonzero(previous_rows >= 0)
+        new_rows[previous_rows[kept]] = kept
+
+        sources = new_rows[np.repeat(np.arange(self.size), np.diff(self.indptr))]
+        targets = new_rows[self.indices]
+        keep = (sources >= 0) & (targets >= 0)
+        return OccupationGraph.from_edges(
+            len(previous_rows), sources[keep], targets[keep].astype(np.int32), self.tiers[keep], catalog_version
+        )
+
+    def save(self, path=GRAPH_PATH):
+        np.savez(path, indptr=self.indptr, indices=self.indices, tiers=self.tiers,
+                 catalog_version=np.array(self.catalog_version, dtype=str))
+
+    @classmethod
+    def load(cls, path=GRAPH_PATH):
+        with np.load(path) as saved:
+            return cls(saved["indptr"], saved["indices"], saved["tiers"], str(saved["catalog_version"]))
+
+
+def build_occupation_graph(catalog, data_dir=DATA_DIR, workers=None, log=print):
+    """Build the graph for ``catalog`` from Related Occupations.xlsx; edges to jobs outside it are dropped."""
+    if catalog.onet_codes is None:
+        raise KeyError("Missing 'ONET_Code' in dataset; the occupation graph is keyed by O*NET-SOC code")
+    related = load_workbooks(["related_occupations"], data_dir, workers, log)["related_occupations"]
+    related = related.sort_values(['ONET_Code', 'Index'], kind="stable")
+
+    sources = related['ONET_Code'].map(catalog.row_for_code)
+    targets = related['Related O*NET-SOC Code'].map(catalog.row_for_code)
+    tiers = related['Relatedness Tier'].map({tier: i for i, tier in enumerate(TIERS)})
+    keep = sources.notna() & targets.notna() & tiers.notna()
+
+    graph = OccupationGraph.from_edges(
+        catalog.size, sources[keep].astype(np.int64), targets[keep].astype(np.int32),
+        tiers[keep].astype(np.int8), catalog.version
+    )
+    log(f"Occupation graph: {catalog.size} jobs, {len(graph.indices)} edges")
+    return graph
+
+
+# --- Process-wide graph ---
+_graph = None
+_rejected = None  # (path, catalog version) of a saved graph built for another catalog
+_graph_lock = threading.Lock()
+
+
+def get_occupation_graph(catalog, path=None):
+    """
+    The saved graph for ``catalog``, loaded on first use; None if no graph
+    was built for this catalog version. ``path`` defaults to the catalog
+    snapshot's copy, else GRAPH_PATH.
+
+    A file built for another catalog is not re-read until the path or the
+    catalog version changes.
+    """
+    global _graph, _rejected
+    if path is None:
+        path = catalog.data_path(GRAPH_PATH)
+    with _graph_lock:
+        if _graph is None or _graph.catalog_version != catalog.version:
+            if _rejected == (path, catalog.version):
+                return None
+            try:
+                graph = OccupationGraph.load(path)
+            except FileNotFoundError:
+                return None
+            if graph.catalog_version != catalog.version:
+                _rejected = (path, catalog.version)
+                return None
+            _rejected = None
+            _graph = graph
+        return _graph
+
+
+def main(argv=None):
+    from recommender_engine import get_catalog
+
+    parser = argparse.ArgumentParser(description="Build the related-occupation graph for the current catalog.")
+    parser.add_argument("--data-dir", default=DATA_DIR, help="directory holding the O*NET .xlsx files (default: %(default)s)")
+    parser.add_argument("--output", default=GRAPH_PATH, help="graph file to write (default: %(default)s)")
+    parser.add_argument("--workers", type=int, default=None, help="parser processes")
+    args = parser.parse_args(argv)
+
+    build_occupation_graph(get_catalog(), args.data_dir, args.workers).save(args.output)
+    print(f"Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,80 +1,966 @@
 # recommender_engine.py
 
-import pandas as pd
+import hashlib
+import os
+import sys
+import threading
+import time
+from collections import namedtuple
+
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
 
-def generate_recommendations(user_profile, top_n=10):
+import metrics
+from catalog_columns import CategoryColumn, StringTable, column_nbytes, is_mapped
+from result_cache import ResultCache
+from similarity import cosine_similarities, inverse_norm, inverse_row_norms, normalize_rows, scale_to_cosine
+
+# pandas is imported where DataFrames are built: it dominates a cold import
+# of the engine, and the record-based paths (recommend, ScoringSession,
+# the service) never need it.
+
+CATALOG_PATH = "data/job_profiles_clean.csv"
+CATALOG_ARTIFACT_PATH = "data/job_catalog.bin"  # built by catalog_artifact.py
+SNAPSHOT_DIR = os.environ.get("SMARTPATH_SNAPSHOT_DIR", "data/snapshots")  # managed by catalog_snapshots.py
+# How often the snapshot pointer is checked for a newly published catalog; 0 disables hot reload
+CATALOG_POLL_SECONDS = float(os.environ.get("SMARTPATH_CATALOG_POLL_S", 5))
+RESULT_CACHE_SIZE = int(os.environ.get("SMARTPATH_RESULT_CACHE_SIZE", 1024))
+# Scores carry about 7 significant digits in float32, well within what the ranking needs;
+# SMARTPATH_CATALOG_DTYPE=float64 keeps full precision at twice the memory
+CATALOG_DTYPE = np.dtype(os.environ.get("SMARTPATH_CATALOG_DTYPE", "float32"))
+
+RIASEC_TRAITS = ['R', 'I', 'A', 'S', 'E', 'C']
+SKILL_PREFIX = "Skill List_"
+METADATA_COLUMNS = [
+    'Title', 'Description', 'Education Level', 'Preparation Level',
+    'Education Category Label'
+]
+OPTIONAL_METADATA_COLUMNS = ['ONET_Code']  # kept when the dataset has them
+# Metadata is kept compact: labels with a few distinct values as category codes,
+# the other (free text) columns as UTF-8 blobs decoded only for the rows read
+CATEGORY_COLUMNS = ['Education Level', 'Preparation Level', 'Education Category Label']
+RESULT_COLUMNS = [
+    'Title', 'Description', 'Education Level', 'Preparation Level',
+    'Education Category Label', 'Normalized Education Score',
+    'Hybrid Recommendation Score', 'User RIASEC Similarity',
+    'Education Similarity', 'User Skill Similarity',
+    'R', 'I', 'A', 'S', 'E', 'C'  # Include individual RIASEC scores
+]
+# RIASEC, education and skill weights of the hybrid score, e.g. SMARTPATH_HYBRID_WEIGHTS=0.5,0.2,0.3;
+# change them at runtime with set_hybrid_weights (tune them with weight_tuning.py)
+HYBRID_WEIGHTS = np.array(os.environ.get("SMARTPATH_HYBRID_WEIGHTS", "0.4,0.3,0.3").split(","), dtype=float)
+EDUCATION_TOLERANCE = 0.01  # jobs up to this far above the user's level still qualify
+# Scores per chunk of generate_recommendations_batch (profiles x eligible jobs): small
+# enough that the chunk's score buffers stay in cache
+BATCH_CHUNK_CELLS = 1 << 17
+
+# Lightweight result row; only built for the returned top-k jobs
+Recommendation = namedtuple("Recommendation", [
+    "job", "title", "description", "education_level", "preparation_level",
+    "education_category_label", "education_score", "hybrid_score",
+    "riasec_similarity", "education_similarity", "skill_similarity",
+    "riasec_scores"
+])
+
+# Result columns a top-k list can be re-sorted by, and the record field behind each
+SORT_FIELDS = {
+    'Hybrid Recommendation Score': 'hybrid_score',
+    'User RIASEC Similarity': 'riasec_similarity',
+    'Education Similarity': 'education_similarity',
+    'User Skill Similarity': 'skill_similarity',
+    'Normalized Education Score': 'education_score',
+}
+
+
+class JobCatalog:
     """
-    Generate top N job recommendations based on user's RIASEC scores,
-    normalized education level (0–1), and selected skill indicators.
+    Precomputed in-memory index over the job profiles.
+
+    Built once per process; every array is ready to score against, so a
+    recommendation request never reads or copies the CSV.
+
+    Rows are sorted by education score, so the jobs a user qualifies for
+    are always a prefix of every matrix (see ``eligible_count``). Feature
+    matrices are stored in ``dtype`` (CATALOG_DTYPE by default).
     """
 
-    # --- Load job dataset ---
-    job_profiles_clean = pd.read_csv("data/job_profiles_clean.csv").copy()
+    def __init__(self, job_profiles, version=None, dtype=CATALOG_DTYPE):
+        if "Normalized Education Score" not in job_profiles.columns:
+            raise KeyError("Missing 'Normalized Education Score' in dataset")
 
-    # --- Extract user RIASEC and normalize ---
-    riasec_traits = ['R', 'I', 'A', 'S', 'E', 'C']
-    user_riasec = np.array([
-        user_profile['R'], user_profile['I'], user_profile['A'],
-        user_profile['S'], user_profile['E'], user_profile['C']
-    ])
-    if user_riasec.sum() > 0:
-        user_riasec = user_riasec / user_riasec.sum()
+        # Identifies the catalog contents; result caches are keyed on it
+        import pandas as pd
 
-    # --- Compute RIASEC Similarity ---
-    job_vectors = job_profiles_clean[riasec_traits].values
-    riasec_similarities = cosine_similarity([user_riasec], job_vectors)[0]
-    job_profiles_clean['User RIASEC Similarity'] = riasec_similarities
+        if version is None:
+            version = "%016x" % int(pd.util.hash_pandas_object(job_profiles).sum())
+        self.version = version
 
-    # --- Education Similarity ---
-    user_edu_score = user_profile.get("education_level", 0)
-    if "Normalized Education Score" not in job_profiles_clean.columns:
-        raise KeyError("Missing 'Normalized Education Score' in dataset")
-    
-    job_profiles_clean['Education Similarity'] = 1 - abs(
-        job_profiles_clean['Normalized Education Score'] - user_edu_score
+        # --- Partition by education: row i of every array is source row job_ids[i] ---
+        job_ids = np.argsort(
+            job_profiles["Normalized Education Score"].to_numpy(dtype=float), kind="stable"
+        )
+        job_profiles = job_profiles.iloc[job_ids].reset_index(drop=True)
+        skill_cols = [col for col in job_profiles.columns if col.startswith(SKILL_PREFIX)]
+
+        metadata = {}
+        for col in METADATA_COLUMNS + OPTIONAL_METADATA_COLUMNS:
+            if col not in job_profiles.columns:
+                continue
+            if col in CATEGORY_COLUMNS:
+                codes, categories = pd.factorize(job_profiles[col])
+                metadata[col] = CategoryColumn.from_codes(codes, categories.tolist())
+            else:
+                metadata[col] = StringTable(*StringTable.encode(job_profiles[col].to_numpy(dtype=object)))
+
+        self._set_arrays(
+            version=version,
+            job_ids=job_ids,
+            riasec_scores=job_profiles[RIASEC_TRAITS].to_numpy(dtype=dtype),
+            skill_cols=skill_cols,
+            skill_matrix=job_profiles[skill_cols].fillna(0).to_numpy(dtype=dtype),
+            education_scores=job_profiles["Normalized Education Score"].to_numpy(dtype=dtype),
+            metadata=metadata,
+        )
+
+    @classmethod
+    def from_arrays(cls, version, job_ids, riasec_scores, skill_cols, skill_matrix,
+                    education_scores, metadata, riasec_matrix=None, inv_skill_norms=None):
+        """
+        Build a catalog directly from precomputed arrays (rows already sorted
+        by education score), e.g. views into a memory-mapped artifact.
+
+        The derived ``riasec_matrix`` and ``inv_skill_norms`` are computed
+        when not given. Scoring runs in the dtype of ``riasec_matrix``.
+        """
+        catalog = cls.__new__(cls)
+        catalog._set_arrays(
+            version, job_ids, riasec_scores, skill_cols, skill_matrix,
+            education_scores, metadata, riasec_matrix, inv_skill_norms
+        )
+        return catalog
+
+    def _set_arrays(self, version, job_ids, riasec_scores, skill_cols, skill_matrix,
+                    education_scores, metadata, riasec_matrix=None, inv_skill_norms=None):
+        self.version = version
+        self.job_ids = job_ids
+        self.size = len(job_ids)
+
+        # --- RIASEC: raw scores for display, L2-normalized rows for cosine ---
+        self.riasec_scores = riasec_scores
+        self.riasec_matrix = normalize_rows(riasec_scores) if riasec_matrix is None else riasec_matrix
+        self.dtype = self.riasec_matrix.dtype
+
+        # --- Skills: dense 0/1 matrix and its inverse row norms ---
+        self.skill_cols = list(skill_cols)
+        self.skill_matrix = skill_matrix
+        self.inv_skill_norms = inverse_row_norms(skill_matrix) if inv_skill_norms is None else inv_skill_norms
+        self._skill_positions = {col: i for i, col in enumerate(self.skill_cols)}
+
+        # --- Education ---
+        self.education_scores = education_scores
+
+        # --- Metadata ---
+        self.metadata = metadata
+
+        self.snapshot_dir = None  # set when opened from a published snapshot
+        self._workspaces = threading.local()
+
+    @classmethod
+    def from_csv(cls, path=CATALOG_PATH):
+        """Build the catalog from a job profiles CSV, versioned by the file's hash."""
+        import pandas as pd
+
+        with open(path, "rb") as f:
+            version = hashlib.sha256(f.read()).hexdigest()[:16]
+        return cls(pd.read_csv(path), version=version)
+
+    def data_path(self, default):
+        """
+        Path of a derived file (skill index, occupation graph): the copy kept
+        with this catalog's snapshot when there is one, else ``default``.
+        """
+        if self.snapshot_dir is not None:
+            path = os.path.join(self.snapshot_dir, os.path.basename(default))
+            if os.path.exists(path):
+                return path
+        return default
+
+    @property
+    def onet_codes(self):
+        """O*NET-SOC code of every row, or None if the dataset has no ONET_Code column."""
+        return self.metadata.get('ONET_Code')
+
+    @property
+    def skill_options(self):
+        """Skill names as shown to the user (without the column prefix)."""
+        return [col[len(SKILL_PREFIX):] for col in self.skill_cols]
+
+    def row_for_code(self, onet_code):
+        """Catalog row of an O*NET-SOC code, or None if no job has it."""
+        rows = getattr(self, "_code_rows", None)
+        if rows is None:
+            codes = self.onet_codes
+            rows = self._code_rows = {} if codes is None else {code: row for row, code in enumerate(codes)}
+        return rows.get(onet_code)
+
+    def user_skill_vector(self, skills):
+        """0/1 vector over the catalog's skill columns for the given skill names."""
+        vector = np.zeros(len(self.skill_cols), dtype=self.dtype)
+        for skill in skills:
+            position = self._skill_positions.get(skill)
+            if position is not None:
+                vector[position] = 1
+        return vector
+
+    def eligible_count(self, user_education):
+        """
+        Number of jobs a user with this education score qualifies for; those
+        jobs are rows ``[0, eligible_count)`` of the catalog.
+        """
+        limit = user_education + EDUCATION_TOLERANCE
+        # Search with a needle of the scores' own dtype (the largest value not above the
+        # limit): a float64 needle makes searchsorted copy a float32 column to float64
+        needle = self.education_scores.dtype.type(limit)
+        if float(needle) > limit:  # compared as float32, the limit would round to the needle
+            needle = np.nextafter(needle, -np.inf)
+        return int(np.searchsorted(self.education_scores, needle, side="right"))
+
+    def eligible_counts(self, user_educations):
+        """``eligible_count`` for each of an array of education scores."""
+        limits = np.asarray(user_educations, dtype=float) + EDUCATION_TOLERANCE
+        needles = limits.astype(self.education_scores.dtype)
+        rounded_up = needles > limits
+        needles[rounded_up] = np.nextafter(needles[rounded_up], -np.inf)
+        return np.searchsorted(self.education_scores, needles, side="right")
+
+    def memory_report(self):
+        """
+        Bytes held by each part of the catalog, with ``total`` and, of that,
+        ``mapped``: views into a memory-mapped artifact, whose pages are
+        file-backed and shared by every process mapping the file.
+        """
+        components = {
+            name: getattr(self, name)
+            for name in ["job_ids", "riasec_scores", "riasec_matrix", "skill_matrix", "inv_skill_norms", "education_scores"]
+        }
+        components.update({f"metadata/{col}": values for col, values in self.metadata.items()})
+        report = {name: column_nbytes(values) for name, values in components.items()}
+        report["total"] = sum(report.values())
+        report["mapped"] = sum(report[name] for name, values in components.items() if is_mapped(values))
+        return report
+
+    def workspace(self):
+        """
+        Per-thread scratch buffers sized to the catalog, reused across
+        requests so single-profile scoring allocates nothing catalog-sized.
+        """
+        workspace = getattr(self._workspaces, "buffers", None)
+        if workspace is None:
+            workspace = _Workspace(self.size, self.dtype)
+            self._workspaces.buffers = workspace
+        return workspace
+
+
+class _Workspace:
+    def __init__(self, size, dtype=float):
+        self.components = np.empty((len(HYBRID_WEIGHTS), size), dtype=dtype)  # RIASEC, education, skills
+        self.hybrid = np.empty(size, dtype=dtype)
+        self.scratch = np.empty(size, dtype=dtype)
+        self.mask = np.empty(size, dtype=bool)
+
+
+# --- Process-wide catalog ---
+_catalog = None
+_catalog_checked = 0.0  # time.monotonic() of the last snapshot pointer check
+_catalog_lock = threading.Lock()
+
+
+def get_catalog():
+    """
+    Return the process-wide JobCatalog, loading it on first use.
+
+    Serves the current snapshot when one is published (catalog_snapshots.py);
+    otherwise memory-maps the compiled artifact when it exists and is not
+    older than the CSV, else builds the catalog from the CSV.
+
+    Every CATALOG_POLL_SECONDS one caller checks the snapshot pointer and
+    swaps in a newly activated snapshot. Callers keep whichever catalog they
+    were handed until they finish, so a request never mixes two versions;
+    the next call gets the new one.
+    """
+    global _catalog
+    catalog = _catalog
+    if catalog is None:
+        with _catalog_lock:
+            if _catalog is None:
+                with metrics.stage("catalog_load"):
+                    _catalog = _load_catalog()
+                _mark_checked()
+            return _catalog
+    if CATALOG_POLL_SECONDS <= 0 or time.monotonic() - _catalog_checked < CATALOG_POLL_SECONDS:
+        return catalog
+    if not _catalog_lock.acquire(blocking=False):
+        return catalog  # another thread is checking
+    try:
+        _refresh_catalog()
+        return _catalog
+    finally:
+        _catalog_lock.release()
+
+
+def reload_catalog():
+    """Check the snapshot pointer now and return the (possibly new) process-wide catalog."""
+    get_catalog()
+    with _catalog_lock:
+        _refresh_catalog()
+        return _catalog
+
+
+def _mark_checked():
+    global _catalog_checked
+    _catalog_checked = time.monotonic()
+
+
+def _refresh_catalog():
+    global _catalog
+    _mark_checked()
+    version = current_snapshot_version()
+    if version is None or version == _catalog.version:
+        return
+    from catalog_snapshots import open_snapshot
+
+    try:
+        with metrics.stage("catalog_reload"):
+            catalog = open_snapshot(version)
+    except (OSError, ValueError) as err:
+        # Keep serving the current catalog; the pointer is checked again next period
+        print(f"catalog: could not open snapshot {version}: {err}", file=sys.stderr)
+        return
+    # Cached results are keyed on the catalog version: requests still holding the old
+    # catalog keep their entries, and once those stop the entries age out of the LRU
+    _catalog = catalog
+
+
+def current_snapshot_version(snapshot_dir=None):
+    """Catalog version the snapshot pointer names, or None when no snapshot is published."""
+    try:
+        with open(os.path.join(snapshot_dir or SNAPSHOT_DIR, "CURRENT"), encoding="utf-8") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def _load_catalog():
+    version = current_snapshot_version()
+    if version is not None:
+        from catalog_snapshots import open_snapshot
+        return open_snapshot(version)
+    if os.path.exists(CATALOG_ARTIFACT_PATH) and (
+        not os.path.exists(CATALOG_PATH)
+        or os.path.getmtime(CATALOG_ARTIFACT_PATH) >= os.path.getmtime(CATALOG_PATH)
+    ):
+        from catalog_artifact import open_catalog
+        return open_catalog(CATALOG_ARTIFACT_PATH)
+    return JobCatalog.from_csv(CATALOG_PATH)
+
+
+# --- Result cache ---
+result_cache = ResultCache(RESULT_CACHE_SIZE)
+
+
+def set_hybrid_weights(weights):
+    """
+    Set the (RIASEC, education, skills) weights of the hybrid score for the
+    whole process. HYBRID_WEIGHTS is updated in place, so every module that
+    imported it sees the change; cached results are dropped.
+    """
+    weights = np.asarray(weights, dtype=float)
+    if weights.shape != HYBRID_WEIGHTS.shape or (weights < 0).any() or not weights.sum() > 0:
+        raise ValueError(f"Expected {len(HYBRID_WEIGHTS)} non-negative weights, not all zero; got {weights.tolist()}")
+    HYBRID_WEIGHTS[:] = weights
+    result_cache.clear()
+
+
+def _profile_key(user_profile, top_n):
+    """
+    Canonical result-cache key for a user profile.
+
+    Cosine similarity ignores the scale of the RIASEC vector, so it is
+    L2-normalized (and rounded) first: sliders at (2, 2, ...) and
+    (4, 4, ...) share an entry. Skills are de-duplicated and sorted.
+    """
+    riasec = np.array([user_profile[trait] for trait in RIASEC_TRAITS], dtype=float)
+    riasec *= inverse_norm(riasec)
+    skill_features = user_profile.get("skill_features")
+    if skill_features is not None:
+        skill_features = tuple(sorted(_feature_weights(skill_features).items()))
+    return (
+        tuple(np.round(riasec, 9).tolist()),
+        round(float(user_profile.get("education_level", 0)), 9),
+        tuple(sorted(set(user_profile.get("skills", [])))),
+        skill_features,
+        top_n,
+        tuple(HYBRID_WEIGHTS.tolist()),
     )
 
-    # Filter out over-qualified jobs
-    job_profiles_clean = job_profiles_clean[
-        job_profiles_clean["Normalized Education Score"] <= user_edu_score + 0.01
-    ]
-    if job_profiles_clean.empty:
-        return pd.DataFrame(), {"num_recommendations": 0}
+
+# --- Sparse skill / technology features ---
+def _feature_weights(features):
+    """``{feature: weight}`` from a dict, or from an iterable of names (weight 1)."""
+    if isinstance(features, dict):
+        return {name: float(weight) for name, weight in features.items()}
+    return {name: 1.0 for name in features}
+
+
+def _sparse_features(user_profile):
+    """
+    The profile's features for the sparse skill index, or None when the
+    profile does not opt in with a 'skill_features' entry. The selected
+    'Skill List_' skills are features of the index too.
+    """
+    if user_profile.get("skill_features") is None:
+        return None
+    features = _feature_weights(user_profile.get("skills", []))
+    features.update(_feature_weights(user_profile["skill_features"]))
+    return features
+
+
+def _skill_index(catalog):
+    from sparse_skills import get_skill_index
+    skill_index = get_skill_index(catalog)
+    if skill_index is None:
+        raise FileNotFoundError(
+            "Profile has 'skill_features' but no skill index matches the catalog; "
+            "build one with `python sparse_skills.py`"
+        )
+    return skill_index
+
+
+def _user_matrices(catalog, user_profiles):
+    """
+    Stack user profiles into an L2-normalized RIASEC matrix, an education
+    score vector and a 0/1 skill matrix aligned with the catalog.
+    """
+    riasec = np.array(
+        [[profile[trait] for trait in RIASEC_TRAITS] for profile in user_profiles],
+        dtype=float
+    ).reshape(-1, len(RIASEC_TRAITS))
+    education = np.array([profile.get("education_level", 0) for profile in user_profiles], dtype=float)
+    skills = np.zeros((len(user_profiles), len(catalog.skill_cols)), dtype=catalog.dtype)
+    for row, profile in enumerate(user_profiles):
+        skills[row] = catalog.user_skill_vector(profile.get('skills', []))
+    return normalize_rows(riasec).astype(catalog.dtype, copy=False), education, skills
+
+
+def _score_components(catalog, user_riasec, user_education, user_skills, size, out=None):
+    """
+    Score every user against the first ``size`` jobs in one pass.
+
+    Returns the RIASEC, education and skill similarity matrices, each of
+    shape (n_users, size), written into the three matrices of ``out`` if
+    given.
+    """
+    dtype = catalog.riasec_matrix.dtype
+    if out is None:
+        out = np.empty((len(HYBRID_WEIGHTS), len(user_riasec), size), dtype=dtype)
+    riasec_similarities, education_similarities, skill_similarities = out
+
+    # --- RIASEC Similarity ---
+    np.matmul(user_riasec, catalog.riasec_matrix[:size].T, out=riasec_similarities)
+
+    # --- Education Similarity ---
+    np.subtract(catalog.education_scores[None, :size], user_education.astype(dtype)[:, None],
+                out=education_similarities)
+    np.abs(education_similarities, out=education_similarities)
+    np.subtract(1, education_similarities, out=education_similarities)
 
     # --- Skill Similarity ---
-    skill_cols = [col for col in job_profiles_clean.columns if col.startswith("Skill List_")]
-    user_skills = user_profile.get('skills', [])
-    
-    user_skill_vector = np.zeros((1, len(skill_cols)))
-    for i, skill_col in enumerate(skill_cols):
-        if skill_col in user_skills:
-            user_skill_vector[0, i] = 1
-
-    job_skill_matrix = job_profiles_clean[skill_cols].fillna(0).values
-    if np.count_nonzero(user_skill_vector) > 0:
-        skill_similarities = cosine_similarity(user_skill_vector, job_skill_matrix)[0]
-    else:
-        skill_similarities = np.zeros(len(job_profiles_clean))
+    np.matmul(user_skills, catalog.skill_matrix[:size].T, out=skill_similarities)
+    scale_to_cosine(skill_similarities, catalog.inv_skill_norms[:size], inverse_row_norms(user_skills))
+
+    return riasec_similarities, education_similarities, skill_similarities
+
+
+def _hybrid_scores(riasec_similarities, education_similarities, skill_similarities, weights=HYBRID_WEIGHTS):
+    return (
+        weights[0] * riasec_similarities +
+        weights[1] * education_similarities +
+        weights[2] * skill_similarities
+    )
+
+
+def _score_into(catalog, user_riasec, user_education, user_skills, workspace, size, sparse_features=None):
+    """
+    Score one user against the first ``size`` jobs of the catalog, writing
+    the component scores into ``workspace.components[:, :size]`` and the
+    hybrid score into ``workspace.hybrid[:size]``.
+
+    With ``sparse_features`` the skill component comes from the sparse
+    skill index instead of the dense 'Skill List_' matrix.
+    """
+    components = workspace.components[:, :size]
+    riasec, education, skill = components
+
+    # --- RIASEC Similarity ---
+    with metrics.stage("riasec"):
+        np.matmul(catalog.riasec_matrix[:size], user_riasec, out=riasec)
+
+    # --- Education Similarity ---
+    with metrics.stage("education"):
+        np.subtract(catalog.education_scores[:size], user_education, out=education)
+        np.abs(education, out=education)
+        np.subtract(1, education, out=education)
 
-    job_profiles_clean['User Skill Similarity'] = skill_similarities
+    # --- Skill Similarity ---
+    with metrics.stage("skills"):
+        if sparse_features is not None:
+            _skill_index(catalog).similarities(sparse_features, size, out=skill)
+        else:
+            cosine_similarities(catalog.skill_matrix[:size], catalog.inv_skill_norms[:size], user_skills, out=skill)
 
     # --- Final Hybrid Score ---
-    job_profiles_clean["Hybrid Recommendation Score"] = (
-        0.4 * job_profiles_clean["User RIASEC Similarity"] +
-        0.3 * job_profiles_clean["Education Similarity"] +
-        0.3 * job_profiles_clean["User Skill Similarity"]
+    with metrics.stage("hybrid"):
+        np.matmul(HYBRID_WEIGHTS.astype(components.dtype), components, out=workspace.hybrid[:size])
+
+
+def _top_k(scores, k, scratch, mask, tie_keys=None):
+    """
+    Indices of the k highest scores, best first, ties broken by lower index
+    (or by lower ``tie_keys`` value, e.g. the catalog rows of a subset).
+
+    A partial selection in ``scratch`` finds the k-th best score; only the
+    jobs at or above it are then sorted, so the work is O(n + k log k).
+    """
+    k = min(k, scores.shape[0])
+    if k <= 0:
+        return np.empty(0, dtype=np.intp)
+    np.negative(scores, out=scratch)
+    scratch.partition(k - 1)
+    np.greater_equal(scores, -scratch[k - 1], out=mask)
+    candidates = np.flatnonzero(mask)
+    order = np.lexsort((candidates if tie_keys is None else tie_keys[candidates], -scores[candidates]))[:k]
+    return candidates[order]
+
+
+def _result_frame(catalog, jobs, hybrid, riasec, education, skill):
+    """Build the recommendation DataFrame for the given job rows and scores."""
+    import pandas as pd
+
+    frame = pd.DataFrame({col: values[jobs] for col, values in catalog.metadata.items()})
+    frame['Normalized Education Score'] = catalog.education_scores[jobs]
+    frame['Hybrid Recommendation Score'] = hybrid
+    frame['User RIASEC Similarity'] = riasec
+    frame['Education Similarity'] = education
+    frame['User Skill Similarity'] = skill
+    for position, trait in enumerate(RIASEC_TRAITS):
+        frame[trait] = catalog.riasec_scores[jobs, position]
+    return frame[RESULT_COLUMNS]
+
+
+def profile_from_job(onet_code, catalog=None, education_level=None):
+    """
+    A user profile seeded from one occupation: its RIASEC scores, its
+    'Skill List_' skills and (unless ``education_level`` is given) its
+    education score. Recommending for it gives the careers most similar to
+    that occupation. Raises KeyError for codes not in the catalog.
+    """
+    if catalog is None:
+        catalog = get_catalog()
+    row = catalog.row_for_code(onet_code)
+    if row is None:
+        raise KeyError(f"No job with O*NET-SOC code {onet_code!r} in the catalog")
+    profile = dict(zip(RIASEC_TRAITS, catalog.riasec_scores[row].tolist()))
+    profile['education_level'] = float(catalog.education_scores[row] if education_level is None else education_level)
+    profile['skills'] = [catalog.skill_cols[col] for col in np.flatnonzero(catalog.skill_matrix[row])]
+    return profile
+
+
+def recommend(user_profile, top_n=10, catalog=None, use_cache=True):
+    """
+    Return the top N jobs for a user profile as a list of Recommendation
+    records, best first.
+
+    Scores live in flat per-thread buffers and only the returned jobs are
+    materialized; ties are broken by catalog position. Results are served
+    from ``result_cache`` when the same canonical profile was scored
+    against the same catalog version.
+    """
+    if catalog is None:
+        catalog = get_catalog()
+
+    if use_cache:
+        with metrics.stage("cache_lookup"):
+            key = _profile_key(user_profile, top_n)
+            cached = result_cache.get(catalog.version, key)
+        if cached is None:
+            cached = tuple(_recommend_uncached(user_profile, top_n, catalog))
+            result_cache.put(catalog.version, key, cached)
+        return list(cached)
+    return _recommend_uncached(user_profile, top_n, catalog)
+
+
+def _recommend_uncached(user_profile, top_n, catalog):
+    with metrics.stage("user_vectors"):
+        user_riasec, user_education, user_skills = _user_matrices(catalog, [user_profile])
+
+    # Filter out over-qualified jobs: only the eligible prefix is scored
+    with metrics.stage("education_filter"):
+        num_eligible = catalog.eligible_count(user_education[0])
+    if num_eligible == 0:
+        return []
+
+    workspace = catalog.workspace()
+    _score_into(
+        catalog, user_riasec[0], user_education[0], user_skills[0], workspace, num_eligible,
+        _sparse_features(user_profile)
+    )
+
+    # --- Select top N jobs ---
+    with metrics.stage("top_k"):
+        top = _top_k(
+            workspace.hybrid[:num_eligible], top_n,
+            workspace.scratch[:num_eligible], workspace.mask[:num_eligible]
+        )
+    with metrics.stage("records"):
+        return [_recommendation(catalog, job, workspace) for job in top]
+
+
+def _recommendation(catalog, job, workspace):
+    riasec, education, skill = workspace.components[:, job]
+    metadata = catalog.metadata
+    return Recommendation(
+        job=int(job),
+        title=metadata['Title'][job],
+        description=metadata['Description'][job],
+        education_level=metadata['Education Level'][job],
+        preparation_level=metadata['Preparation Level'][job],
+        education_category_label=metadata['Education Category Label'][job],
+        education_score=float(catalog.education_scores[job]),
+        hybrid_score=float(workspace.hybrid[job]),
+        riasec_similarity=float(riasec),
+        education_similarity=float(education),
+        skill_similarity=float(skill),
+        riasec_scores=tuple(catalog.riasec_scores[job].tolist())
+    )
+
+
+def adjacent_careers(recommendations, top_n=10, catalog=None, education_level=None):
+    """
+    Expand a user's recommendations into related careers from the O*NET
+    Related Occupations graph, best first, as AdjacentCareer records.
+
+    Each recommendation seeds the expansion with its hybrid score; the
+    recommendations themselves and, given ``education_level``, jobs the
+    user is not eligible for are left out. Empty if no graph was built for
+    the catalog (``python occupation_graph.py``).
+    """
+    from occupation_graph import AdjacentCareer, get_occupation_graph
+
+    if catalog is None:
+        catalog = get_catalog()
+    graph = get_occupation_graph(catalog)
+    if graph is None or not recommendations:
+        return []
+    num_eligible = None if education_level is None else catalog.eligible_count(education_level)
+    rows, relatedness, hops = graph.expand(
+        [rec.job for rec in recommendations], [rec.hybrid_score for rec in recommendations],
+        top_n, num_eligible=num_eligible
     )
+    titles = catalog.metadata['Title']
+    return [
+        AdjacentCareer(int(row), titles[row], float(score), int(hop))
+        for row, score, hop in zip(rows, relatedness, hops)
+    ]
+
+
+def recommendations_to_frame(recommendations):
+    """Convert Recommendation records into the recommendation DataFrame layout."""
+    import pandas as pd
+
+    if not recommendations:
+        return pd.DataFrame()
+    frame = pd.DataFrame({
+        'Title': [rec.title for rec in recommendations],
+        'Description': [rec.description for rec in recommendations],
+        'Education Level': [rec.education_level for rec in recommendations],
+        'Preparation Level': [rec.preparation_level for rec in recommendations],
+        'Education Category Label': [rec.education_category_label for rec in recommendations],
+        'Normalized Education Score': [rec.education_score for rec in recommendations],
+        'Hybrid Recommendation Score': [rec.hybrid_score for rec in recommendations],
+        'User RIASEC Similarity': [rec.riasec_similarity for rec in recommendations],
+        'Education Similarity': [rec.education_similarity for rec in recommendations],
+        'User Skill Similarity': [rec.skill_similarity for rec in recommendations],
+    })
+    riasec_scores = np.array([rec.riasec_scores for rec in recommendations])
+    for position, trait in enumerate(RIASEC_TRAITS):
+        frame[trait] = riasec_scores[:, position]
+    return frame
+
+
+def generate_recommendations(user_profile, top_n=10, catalog=None, use_cache=True):
+    """
+    Generate top N job recommendations based on user's RIASEC scores,
+    normalized education level (0–1), and selected skill indicators.
+
+    DataFrame adapter over ``recommend``.
+    """
+    recommendations = recommend(user_profile, top_n, catalog, use_cache)
+    with metrics.stage("frame"):
+        top_matches = recommendations_to_frame(recommendations)
+    return top_matches, {"num_recommendations": len(top_matches)}
+
+
+class ScoringSession:
+    """
+    Per-user scoring state kept between Streamlit reruns.
+
+    Holds the full-catalog RIASEC, education and skill score vectors for the
+    user's current inputs. ``update`` recomputes only the components whose
+    inputs changed (a skill added or removed is a single column update) and
+    then refreshes the hybrid score and top-k; re-sorting the top-k by
+    another metric never re-scores.
+    """
+
+    def __init__(self):
+        self.catalog = None
+        self.last_update = ()  # components recomputed by the last update
+
+    def update(self, user_profile, top_n=10, catalog=None):
+        """Bring the session up to date with ``user_profile``; return its top-k records."""
+        if catalog is None:
+            catalog = get_catalog()
+        if catalog is not self.catalog:
+            self._reset(catalog)
+
+        riasec = tuple(float(user_profile[trait]) for trait in RIASEC_TRAITS)
+        education = float(user_profile.get("education_level", 0))
+        skills = {
+            catalog._skill_positions[skill] for skill in user_profile.get('skills', [])
+            if skill in catalog._skill_positions
+        }
+        sparse_features = _sparse_features(user_profile)
+        sparse_key = None if sparse_features is None else tuple(sorted(sparse_features.items()))
+
+        changed = []
+        riasec_scores, education_scores, skill_scores = self._workspace.components
+
+        if riasec != self._riasec:
+            user_riasec = normalize_rows(np.array([riasec]))[0].astype(catalog.dtype)
+            np.matmul(catalog.riasec_matrix, user_riasec, out=riasec_scores)
+            self._riasec = riasec
+            changed.append("riasec")
+
+        if education != self._education:
+            np.subtract(catalog.education_scores, education, out=education_scores)
+            np.abs(education_scores, out=education_scores)
+            np.subtract(1, education_scores, out=education_scores)
+            self._education = education
+            self._num_eligible = catalog.eligible_count(education)
+            changed.append("education")
+
+        dense_skills_changed = skills != self._skills
+        if dense_skills_changed:
+            for position in skills - self._skills:
+                self._skill_overlap += catalog.skill_matrix[:, position]
+            for position in self._skills - skills:
+                self._skill_overlap -= catalog.skill_matrix[:, position]
+            self._skills = skills
+
+        if sparse_key != self._sparse_key or (sparse_key is None and dense_skills_changed):
+            if sparse_features is not None:
+                _skill_index(catalog).similarities(sparse_features, out=skill_scores)
+            else:
+                # Overlap counts are dot products with the user's 0/1 skill vector, of norm sqrt(#skills)
+                np.copyto(skill_scores, self._skill_overlap)
+                scale_to_cosine(skill_scores, catalog.inv_skill_norms, 1 / np.sqrt(len(skills)) if skills else 0.0)
+            self._sparse_key = sparse_key
+            changed.append("skills")
+
+        weights = tuple(HYBRID_WEIGHTS.tolist())
+        if changed or top_n != self._top_n or weights != self._weights:
+            size = self._num_eligible
+            with metrics.stage("hybrid"):
+                components = self._workspace.components[:, :size]
+                np.matmul(HYBRID_WEIGHTS.astype(catalog.dtype), components, out=self._workspace.hybrid[:size])
+            with metrics.stage("top_k"):
+                top = _top_k(
+                    self._workspace.hybrid[:size], top_n,
+                    self._workspace.scratch[:size], self._workspace.mask[:size]
+                )
+            with metrics.stage("records"):
+                self._recommendations = [_recommendation(catalog, job, self._workspace) for job in top]
+            self._top_n = top_n
+            self._weights = weights
+
+        self.last_update = tuple(changed)
+        return self.recommendations()
+
+    def recommendations(self, sort_by='Hybrid Recommendation Score'):
+        """The current top-k records, re-sorted (stably) by a result column."""
+        field = SORT_FIELDS[sort_by]
+        return sorted(self._recommendations, key=lambda rec: getattr(rec, field), reverse=True)
+
+    def frame(self, sort_by='Hybrid Recommendation Score'):
+        """The current top-k in the recommendation DataFrame layout."""
+        return recommendations_to_frame(self.recommendations(sort_by))
+
+    def _reset(self, catalog):
+        self.catalog = catalog
+        self._workspace = _Workspace(catalog.size, catalog.dtype)
+        self._skill_overlap = np.zeros(catalog.size, dtype=catalog.dtype)
+        self._riasec = None
+        self._education = None
+        self._num_eligible = 0
+        self._skills = set()
+        self._sparse_key = None
+        self._top_n = None
+        self._weights = None
+        self._recommendations = []
+        self._workspace.components[:] = 0
+
+
+def generate_recommendations_batch(user_profiles, top_n=10, catalog=None, chunk_size=None):
+    """
+    Generate top N job recommendations for many user profiles at once.
+
+    Profiles are grouped by education level and scored in chunks, each
+    against the eligible prefix of its most educated member, with one
+    matrix product per component. Every chunk reuses the same score
+    buffers; by default a chunk holds as many profiles as keep them to
+    about BATCH_CHUNK_CELLS scores each, so they stay in cache.
+
+    Returns a single long-format DataFrame with a 'Profile' column
+    (position in ``user_profiles``) and a 1-based 'Rank' column, plus the
+    usual recommendation columns.
+    """
+    if catalog is None:
+        catalog = get_catalog()
+
+    education = np.array([profile.get("education_level", 0) for profile in user_profiles], dtype=float)
+    education_order = np.argsort(education, kind="stable")
+    # Filter out over-qualified jobs per user; each chunk only scores the
+    # prefix its most educated member qualifies for
+    eligible = catalog.eligible_counts(education[education_order])
+    max_eligible = int(eligible[-1]) if len(eligible) else 0
+    if chunk_size is None:
+        chunk_size = int(np.clip(BATCH_CHUNK_CELLS // max(max_eligible, 1), 1, 1024))
+    workspace = _BatchWorkspace(min(chunk_size, len(user_profiles)) * max_eligible, catalog.dtype)
+
+    parts = []
+    for start in range(0, len(user_profiles), chunk_size):
+        profile_ids = education_order[start:start + chunk_size]
+        chunk = [user_profiles[i] for i in profile_ids]
+        user_riasec, user_education, user_skills = _user_matrices(catalog, chunk)
+        num_eligible = eligible[start:start + chunk_size]
+        size = int(num_eligible[-1])
+        cells = len(chunk) * size
+        components = workspace.components[:, :cells]
+        hybrid = workspace.hybrid[:cells].reshape(len(chunk), size)
+        with metrics.stage("batch.score"):
+            riasec, education, skill = _score_components(
+                catalog, user_riasec, user_education, user_skills, size,
+                out=[component.reshape(len(chunk), size) for component in components]
+            )
+            sparse_rows = [row for row, profile in enumerate(chunk) if profile.get("skill_features") is not None]
+            if sparse_rows:
+                skill[sparse_rows] = _skill_index(catalog).similarity_matrix(
+                    [_sparse_features(chunk[row]) for row in sparse_rows], size
+                )
+            np.matmul(HYBRID_WEIGHTS.astype(catalog.dtype), components, out=workspace.hybrid[:cells])
+            for row in np.flatnonzero(num_eligible < size):
+                hybrid[row, num_eligible[row]:] = -np.inf
+
+        with metrics.stage("batch.top_k"):
+            users, jobs, ranks = _top_k_flat(
+                hybrid, top_n, workspace.scratch[:cells], workspace.mask[:cells].reshape(len(chunk), size)
+            )
+        parts.append((
+            profile_ids[users], ranks + 1, jobs, hybrid[users, jobs], riasec[users, jobs],
+            education[users, jobs], skill[users, jobs]
+        ))
+
+    # One frame for the whole batch, already in (Profile, Rank) order
+    if parts:
+        profiles, ranks, jobs, hybrid, riasec, education, skill = map(np.concatenate, zip(*parts))
+    else:
+        profiles = ranks = jobs = np.empty(0, dtype=np.intp)
+        hybrid = riasec = education = skill = np.empty(0, dtype=catalog.dtype)
+    order = np.lexsort((ranks, profiles))
+    frame = _result_frame(
+        catalog, jobs[order], hybrid[order], riasec[order], education[order], skill[order]
+    )
+    frame.insert(0, 'Rank', ranks[order])
+    frame.insert(0, 'Profile', profiles[order])
+    return frame
+
+
+class _BatchWorkspace:
+    """Flat score buffers of ``cells`` entries, reused by every chunk of a batch."""
+
+    def __init__(self, cells, dtype=float):
+        self.components = np.empty((len(HYBRID_WEIGHTS), cells), dtype=dtype)  # RIASEC, education, skills
+        self.hybrid = np.empty(cells, dtype=dtype)
+        self.scratch = np.empty(cells, dtype=dtype)
+        self.mask = np.empty(cells, dtype=bool)
+
+
+def _top_k_flat(scores, k, scratch, mask):
+    """
+    Row-wise top k of a (n_users, n_jobs) score matrix, best first, ties
+    broken by lower index; -inf scores are never selected. Returns flat
+    (users, jobs, ranks) arrays, ordered by user and then rank.
+
+    The k-th best score of an evenly strided sample of a row is a lower
+    bound for the row's k-th best, so only the jobs at or above it are
+    sorted. The partial selection runs on the sample alone. A sample of
+    about 2 * sqrt(k * n_jobs) scores lets about sqrt(k * n_jobs) / 2
+    candidates through, balancing the two.
+    """
+    n_users, n_jobs = scores.shape
+    if k <= 0 or n_jobs == 0:
+        empty = np.empty(0, dtype=np.intp)
+        return empty, empty, empty
+
+    sample = scores[:, ::max(1, int(np.sqrt(n_jobs / k)) // 2)]
+    k_sample = min(k, sample.shape[1])
+    negated = scratch[:sample.size].reshape(sample.shape)
+    np.negative(sample, out=negated)
+    negated.partition(k_sample - 1, axis=1)
+    bound = np.maximum(-negated[:, k_sample - 1], np.finfo(scores.dtype).min)
+    np.greater_equal(scores, bound[:, None], out=mask)
+
+    # Candidates come out by user, then job; stable sorts keep that order among ties
+    users, jobs = np.divmod(np.flatnonzero(mask), n_jobs)
+    order = np.argsort(-scores[users, jobs], kind="stable")
+    order = order[np.argsort(users[order], kind="stable")]
+    users, jobs = users[order], jobs[order]
+    ranks = np.arange(len(users)) - np.searchsorted(users, users)
+    keep = ranks < k
+    return users[keep], jobs[keep], ranks[keep]
+
+
+def _top_k_rows(scores, k):
+    """
+    Row-wise ``_top_k`` over a (n_users, n_jobs) score matrix.
+
+    Uses one argpartition for all rows; the few rows whose k-th score is
+    tied with jobs left outside the selection are redone with ``_top_k`` so
+    ties are still broken by catalog position.
+    """
+    n_users, n_jobs = scores.shape
+    k = min(k, n_jobs)
+    if k <= 0:
+        return np.empty((n_users, 0), dtype=np.intp)
+
+    selected = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    selected_scores = np.take_along_axis(scores, selected, axis=1)
+    order = np.lexsort((selected, -selected_scores), axis=1)
+    top = np.take_along_axis(selected, order, axis=1)
 
-    # --- Return top N jobs ---
-    top_matches = job_profiles_clean.sort_values("Hybrid Recommendation Score", ascending=False).head(top_n).copy()
-    top_matches.reset_index(drop=True, inplace=True)
-
-    return top_matches[[
-        'Title', 'Description', 'Education Level', 'Preparation Level',
-        'Education Category Label', 'Normalized Education Score',
-        'Hybrid Recommendation Score', 'User RIASEC Similarity',
-        'Education Similarity', 'User Skill Similarity',
-        'R', 'I', 'A', 'S', 'E', 'C'  # Include individual RIASEC scores
-    ]], {"num_recommendations": len(top_matches)}
+    threshold = selected_scores.min(axis=1)
+    tied = (np.count_nonzero(scores >= threshold[:, None], axis=1) > k) & np.isfinite(threshold)
+    if tied.any():
+        scratch = np.empty(n_jobs, dtype=scores.dtype)
+        mask = np.empty(n_jobs, dtype=bool)
+        for row in np.flatnonzero(tied):
+            top[row] = _top_k(scores[row], k, scratch, mask)
+    return top
@@ -0,0 +1,76 @@
+# result_cache.py
+
+import threading
+from collections import OrderedDict
+
+
+class ResultCache:
+    """
+    Bounded, thread-safe LRU cache of recommendation results.
+
+    Entries are keyed on the catalog version as well as the profile, so
+    requests still pinned to an older catalog during a hot reload neither
+    see nor wipe the new version's entries; stale versions age out of the
+    LRU order. Hit and miss counts cover the cache's whole lifetime.
+    """
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.version = None  # most recently used catalog version
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, version, key):
+        """Return the cached value for ``key`` or None, counting the hit or miss."""
+        with self._lock:
+            self.version = version
+            value = self._entries.get((version, key))
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end((version, key))
+            self.hits += 1
+            return value
+
+    def put(self, version, key, value):
+        with self._lock:
+            self.version = version
+            if self.maxsize <= 0:
+                return
+            self._entries[version, key] = value
+            self._entries.move_to_end((version, key))
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def resize(self, maxsize):
+        """Change the capacity, evicting least recently used entries if needed."""
+        with self._lock:
+            self.maxsize = maxsize
+            while len(self._entries) > max(maxsize, 0):
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Drop every entry; the hit and miss counts are kept."""
+        with self._lock:
+            self._entries.clear()
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "version": self.version,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hit_rate,
+            }
+
+    def __len__(self):
+        return len(self._entries)
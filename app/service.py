@@ -0,0 +1,332 @@
+# service.py
+#
+# Standalone HTTP/JSON recommendation service (asyncio, standard library only):
+#
+#   python service.py [--host 127.0.0.1] [--port 8080] [--max-batch 64] [--max-wait-ms 2]
+#
+#   POST /recommend   {"profile": {"R": 5, ..., "education_level": 0.6, "skills": [...]}, "top_n": 10}
+#                     -> {"recommendations": [{"Title": ..., "Hybrid Recommendation Score": ...}, ...]}
+#   GET  /health      -> {"status": "ok", "catalog_version": ..., "queue_depth": ..., ...}
+#
+# Requests arriving within max_wait_ms of each other (up to max_batch) are
+# coalesced into one generate_recommendations_batch call, run on a worker
+# thread so the event loop keeps accepting connections; each caller gets
+# its own slice of the batch result. When max_queue requests are already
+# waiting, new ones are rejected with 503 and a Retry-After header instead
+# of queueing without bound.
+#
+# Without a fixed catalog the batcher follows get_catalog(): a newly
+# activated snapshot (catalog_snapshots.py) is picked up between batches,
+# and every batch is scored against a single catalog version.
+
+import argparse
+import asyncio
+import json
+import math
+import time
+from http import HTTPStatus
+
+import numpy as np
+
+from recommender_engine import RIASEC_TRAITS, generate_recommendations_batch, get_catalog
+
+HOST = "127.0.0.1"
+PORT = 8080
+MAX_BATCH = 64
+MAX_WAIT_MS = 2.0
+MAX_QUEUE = 1024
+MAX_TOP_N = 100
+MAX_BODY_BYTES = 64 * 1024
+REQUEST_TIMEOUT = 30.0  # seconds to receive a request on an open connection
+
+
+class Overloaded(Exception):
+    """The batching queue is full."""
+
+
+class MicroBatcher:
+    """Coalesces concurrent recommendation requests into batched scoring calls."""
+
+    def __init__(self, catalog=None, max_batch=MAX_BATCH, max_wait_ms=MAX_WAIT_MS, max_queue=MAX_QUEUE):
+        self._catalog = catalog
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.queue = asyncio.Queue(maxsize=max_queue)
+        self.requests = 0
+        self.batches = 0
+        self.rejected = 0
+        self._worker = None
+
+    @property
+    def catalog(self):
+        """The catalog the next batch is scored against: the fixed one, else the process-wide one."""
+        return get_catalog() if self._catalog is None else self._catalog
+
+    def start(self):
+        self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+
+    async def submit(self, profile, top_n):
+        """Queue one profile and wait for its top_n records; raises Overloaded when the queue is full."""
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self.queue.put_nowait((profile, top_n, future))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise Overloaded() from None
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self.queue.get_nowait())
+                    continue
+                except asyncio.QueueEmpty:
+                    pass
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            batch = [item for item in batch if not item[2].cancelled()]  # callers that went away
+            if not batch:
+                continue
+            try:
+                results = await loop.run_in_executor(None, self._score, batch)
+            except Exception as err:
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(err)
+            else:
+                for (_, _, future), records in zip(batch, results):
+                    if not future.done():
+                        future.set_result(records)
+
+    def _score(self, batch):
+        """Score a batch with one call at its largest top_n, then cut each caller's slice."""
+        profiles = [profile for profile, _, _ in batch]
+        top_n = max(top_n for _, top_n, _ in batch)
+        frame = generate_recommendations_batch(profiles, top_n, catalog=self.catalog)  # pinned for the whole batch
+        self.requests += len(batch)
+        self.batches += 1
+
+        records = [[] for _ in batch]
+        for row in frame.to_dict("records"):
+            profile_id = row.pop("Profile")
+            if row["Rank"] <= batch[profile_id][1]:
+                # Missing metadata (NaN) goes out as null: JSON has no NaN
+                records[profile_id].append({key: None if _is_nan(value) else value for key, value in row.items()})
+        return records
+
+    def stats(self):
+        return {
+            "queue_depth": self.queue.qsize(),
+            "max_queue": self.queue.maxsize,
+            "requests": self.requests,
+            "batches": self.batches,
+            "mean_batch_size": self.requests / self.batches if self.batches else 0.0,
+            "rejected": self.rejected,
+        }
+
+
+# --- Request validation ---
+def _number(value, name):
+    """``value`` as a float if it is a finite JSON number (not a boolean); raises ValueError otherwise."""
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+        raise ValueError(f"{name} must be a finite number")
+    return float(value)
+
+
+def parse_recommend_request(body):
+    """Return (profile, top_n) from a /recommend JSON body; raises ValueError if invalid."""
+    try:
+        payload = json.loads(body)
+    except (UnicodeDecodeError, json.JSONDecodeError) as err:
+        raise ValueError(f"Invalid JSON: {err}") from None
+    if not isinstance(payload, dict) or not isinstance(payload.get("profile"), dict):
+        raise ValueError("Expected a JSON object with a 'profile' object")
+
+    raw = payload["profile"]
+    profile = {}
+    for trait in RIASEC_TRAITS:
+        profile[trait] = _number(raw.get(trait), f"profile.{trait}")
+    profile["education_level"] = _number(raw.get("education_level", 0), "profile.education_level")
+    skills = raw.get("skills", [])
+    if not isinstance(skills, list) or not all(isinstance(skill, str) for skill in skills):
+        raise ValueError("profile.skills must be a list of strings")
+    profile["skills"] = skills
+
+    top_n = payload.get("top_n", 10)
+    if isinstance(top_n, bool) or not isinstance(top_n, int) or not 1 <= top_n <= MAX_TOP_N:
+        raise ValueError(f"top_n must be an integer between 1 and {MAX_TOP_N}")
+    return profile, top_n
+
+
+# --- HTTP ---
+class RecommendationServer:
+    def __init__(self, batcher, host=HOST, port=PORT):
+        self.batcher = batcher
+        self.host = host
+        self.port = port
+        self.started = time.time()
+
+    async def serve_forever(self):
+        self.batcher.start()
+        server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        print(f"Serving recommendations on http://{self.host}:{self.port} "
+              f"({self.batcher.catalog.size} jobs, batches of up to {self.batcher.max_batch})")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            await self.batcher.stop()
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await asyncio.wait_for(_read_request(reader), REQUEST_TIMEOUT)
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+                    break
+                except ValueError as err:
+                    await _write_response(writer, HTTPStatus.BAD_REQUEST, {"error": str(err)}, keep_alive=False)
+                    break
+                if request is None:
+                    break
+                method, path, headers, body = request
+                status, payload, extra_headers = await self._dispatch(method, path, body)
+                keep_alive = headers.get("connection", "").lower() != "close"
+                await _write_response(writer, status, payload, keep_alive, extra_headers)
+                if not keep_alive:
+                    break
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def _dispatch(self, method, path, body):
+        path = path.split("?", 1)[0]
+        if path == "/health":
+            if method != "GET":
+                return HTTPStatus.METHOD_NOT_ALLOWED, {"error": "Use GET"}, {"Allow": "GET"}
+            return HTTPStatus.OK, await self.health(), {}
+        if path == "/recommend":
+            if method != "POST":
+                return HTTPStatus.METHOD_NOT_ALLOWED, {"error": "Use POST"}, {"Allow": "POST"}
+            try:
+                profile, top_n = parse_recommend_request(body)
+            except ValueError as err:
+                return HTTPStatus.BAD_REQUEST, {"error": str(err)}, {}
+            try:
+                records = await self.batcher.submit(profile, top_n)
+            except Overloaded:
+                return HTTPStatus.SERVICE_UNAVAILABLE, {"error": "Too many queued requests"}, {"Retry-After": "1"}
+            except Exception as err:
+                return HTTPStatus.INTERNAL_SERVER_ERROR, {"error": str(err)}, {}
+            return HTTPStatus.OK, {"recommendations": records}, {}
+        return HTTPStatus.NOT_FOUND, {"error": f"No route for {path}"}, {}
+
+    async def health(self):
+        # get_catalog() may check the snapshot pointer or open a new snapshot; keep that off the event loop
+        catalog = await asyncio.get_running_loop().run_in_executor(None, lambda: self.batcher.catalog)
+        return {
+            "status": "ok",
+            "catalog_version": catalog.version,
+            "catalog_size": catalog.size,
+            "uptime_s": time.time() - self.started,
+            **self.batcher.stats(),
+        }
+
+
+async def _read_request(reader):
+    """Read one HTTP/1.1 request; None on a cleanly closed connection."""
+    request_line = await reader.readline()
+    if not request_line:
+        return None
+    try:
+        method, path, _ = request_line.decode("latin-1").split()
+    except ValueError:
+        raise ValueError("Malformed request line") from None
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    try:
+        length = int(headers.get("content-length", 0))
+    except ValueError:
+        raise ValueError("Invalid Content-Length") from None
+    if length > MAX_BODY_BYTES:
+        raise ValueError(f"Request body over {MAX_BODY_BYTES} bytes")
+    body = await reader.readexactly(length) if length else b""
+    return method, path, headers, body
+
+
+def _is_nan(value):
+    return isinstance(value, (float, np.floating)) and math.isnan(value)
+
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+async def _write_response(writer, status, payload, keep_alive, extra_headers=None):
+    body = json.dumps(payload, default=_json_default, allow_nan=False).encode("utf-8")
+    headers = {
+        "Content-Type": "application/json",
+        "Content-Length": str(len(body)),
+        "Connection": "keep-alive" if keep_alive else "close",
+        **(extra_headers or {}),
+    }
+    head = f"HTTP/1.1 {status.value} {status.phrase}\r\n" + "".join(
+        f"{name}: {value}\r\n" for name, value in headers.items()
+    ) + "\r\n"
+    writer.write(head.encode("latin-1") + body)
+    await writer.drain()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve SmartPath recommendations over HTTP with micro-batching.")
+    parser.add_argument("--host", default=HOST, help="interface to bind (default: %(default)s)")
+    parser.add_argument("--port", type=int, default=PORT, help="port to listen on (default: %(default)s)")
+    parser.add_argument("--max-batch", type=int, default=MAX_BATCH, help="requests per scoring call (default: %(default)s)")
+    parser.add_argument("--max-wait-ms", type=float, default=MAX_WAIT_MS,
+                        help="how long the first request of a batch waits for others (default: %(default)s)")
+    parser.add_argument("--max-queue", type=int, default=MAX_QUEUE,
+                        help="queued requests before new ones get 503 (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    async def run():
+        batcher = MicroBatcher(None, args.max_batch, args.max_wait_ms, args.max_queue)
+        await RecommendationServer(batcher, args.host, args.port).serve_forever()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+# sharded_scoring.py
+#
+# Multi-core batch scoring over a catalog split into shards.
+#
+# The catalog's rows (sorted by education score) are cut into contiguous
+# shards. Each shard's scoring arrays are copied once into its own
+# multiprocessing.shared_memory segment, and every worker of a process pool
+# maps all segments when it starts. Scoring a chunk of users fans out one task
+# per shard. Each task returns its shard's top-k per user, with global row
+# numbers and scores, and the parent merges the per-shard lists into the
+# global top-k. Ties are broken by catalog position, so results match
+# generate_recommendations_batch exactly. Shards that lie entirely above a
+# chunk's highest eligible education score are skipped.
+#
+#   with ShardedScorer(num_shards=8) as scorer:
+#       results = scorer.recommend_batch(profiles, top_n=10)
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from recommender_engine import (
+    HYBRID_WEIGHTS, RESULT_COLUMNS, _hybrid_scores, _result_frame, _score_components, _top_k_rows,
+    _user_matrices, get_catalog,
+)
+
+SHARD_ARRAYS = ["riasec_matrix", "education_scores", "skill_matrix", "inv_skill_norms"]
+
+
+class _Shard:
+    """Rows [start, start + size) of the catalog, as views into one shared memory segment."""
+
+    def __init__(self, start, size, buffer, layout):
+        self.start = start
+        self.size = size
+        for name, (dtype, shape, offset) in layout.items():
+            array = np.ndarray(shape, dtype=np.dtype(dtype), buffer=buffer, offset=offset)
+            array.flags.writeable = False
+            setattr(self, name, array)
+
+
+def _attach(name):
+    """Map an existing segment without making this process responsible for unlinking it."""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:  # Python < 3.13; pool workers share the parent's resource tracker, so this is harmless
+        return shared_memory.SharedMemory(name=name)
+
+
+# --- Worker side ---
+_worker_segments = []
+_worker_shards = []
+
+
+def _init_worker(shard_specs):
+    for name, start, size, layout in shard_specs:
+        segment = _attach(name)
+        _worker_segments.append(segment)
+        _worker_shards.append(_Shard(start, size, segment.buf, layout))
+
+
+def _score_shard(shard_id, user_riasec, user_education, user_skills, num_eligible, top_n, weights):
+    """
+    Top ``top_n`` of one shard for each user: global row numbers and the
+    hybrid, RIASEC, education and skill scores, each (n_users, k). Rows a
+    user is not eligible for score -inf. ``weights`` are the parent's
+    hybrid weights, which workers may not share.
+    """
+    shard = _worker_shards[shard_id]
+    size = int(np.clip(num_eligible.max() - shard.start, 0, shard.size))
+    riasec, education, skill = _score_components(shard, user_riasec, user_education, user_skills, size)
+    hybrid = _hybrid_scores(riasec, education, skill, weights)
+    hybrid[shard.start + np.arange(size)[None, :] >= num_eligible[:, None]] = -np.inf
+
+    top = _top_k_rows(hybrid, top_n)
+    scores = [np.take_along_axis(values, top, axis=1) for values in (hybrid, riasec, education, skill)]
+    return (top + shard.start, *scores)
+
+
+# --- Parent side ---
+class ShardedScorer:
+    """
+    Process pool scoring batches of users against a catalog held in shared
+    memory shards. Use as a context manager, or call close(), to stop the
+    workers and free the segments.
+    """
+
+    def __init__(self, catalog=None, num_shards=None, workers=None):
+        self.catalog = get_catalog() if catalog is None else catalog
+        self.workers = workers or os.cpu_count() or 1
+        num_shards = max(1, min(num_shards or self.workers, self.catalog.size))
+        bounds = np.linspace(0, self.catalog.size, num_shards + 1).astype(int)
+
+        self.segments = []
+        self.shard_starts = bounds[:-1]
+        shard_specs = []
+        try:
+            for start, end in zip(bounds[:-1], bounds[1:]):
+                shard_specs.append(self._share(int(start), int(end)))
+        except BaseException:
+            self._free_segments()
+            raise
+        self.pool = ProcessPoolExecutor(self.workers, initializer=_init_worker, initargs=(shard_specs,))
+
+    def _share(self, start, end):
+        arrays = {name: np.ascontiguousarray(getattr(self.catalog, name)[start:end]) for name in SHARD_ARRAYS}
+        layout = {}
+        position = 0
+        for name, array in arrays.items():
+            position = -(-position // 64) * 64
+            layout[name] = (array.dtype.str, array.shape, position)
+            position += array.nbytes
+
+        segment = shared_memory.SharedMemory(create=True, size=max(position, 1))
+        self.segments.append(segment)
+        for name, array in arrays.items():
+            _, shape, offset = layout[name]
+            np.ndarray(shape, dtype=array.dtype, buffer=segment.buf, offset=offset)[...] = array
+        return segment.name, start, end - start, layout
+
+    def recommend_batch(self, user_profiles, top_n=10, chunk_size=1024):
+        """Same result as generate_recommendations_batch, scored across the shards in parallel."""
+        if any(profile.get("skill_features") is not None for profile in user_profiles):
+            raise ValueError("Sharded scoring does not support 'skill_features'; use generate_recommendations_batch")
+
+        catalog = self.catalog
+        education_order = np.argsort(
+            [profile.get("education_level", 0) for profile in user_profiles], kind="stable"
+        )
+
+        # Submit every (chunk, shard) task up front so the pool stays busy
+        chunks = []
+        for start in range(0, len(user_profiles), chunk_size):
+            profile_ids = education_order[start:start + chunk_size]
+            user_riasec, user_education, user_skills = _user_matrices(
+                catalog, [user_profiles[i] for i in profile_ids]
+            )
+            num_eligible = catalog.eligible_counts(user_education)
+            futures = [
+                self.pool.submit(_score_shard, shard_id, user_riasec, user_education, user_skills,
+                                 num_eligible, top_n, HYBRID_WEIGHTS.copy())
+                for shard_id, shard_start in enumerate(self.shard_starts)
+                if shard_start < num_eligible.max()
+            ]
+            chunks.append((profile_ids, futures))
+
+        frames = []
+        for profile_ids, futures in chunks:
+            if not futures:
+                continue
+            jobs, hybrid, riasec, education, skill = (
+                np.concatenate(parts, axis=1) for parts in zip(*(future.result() for future in futures))
+            )
+            order = np.lexsort((jobs, -hybrid), axis=1)[:, :top_n]
+            jobs, hybrid, riasec, education, skill = (
+                np.take_along_axis(values, order, axis=1) for values in (jobs, hybrid, riasec, education, skill)
+            )
+
+            users, positions = np.nonzero(np.isfinite(hybrid))
+            frame = _result_frame(
+                catalog, jobs[users, positions], hybrid[users, positions], riasec[users, positions],
+                education[users, positions], skill[users, positions]
+            )
+            frame.insert(0, 'Rank', positions + 1)
+            frame.insert(0, 'Profile', profile_ids[users])
+            frames.append(frame)
+
+        if not frames:
+            return pd.DataFrame(columns=['Profile', 'Rank'] + RESULT_COLUMNS)
+        results = pd.concat(frames, ignore_index=True)
+        return results.sort_values(['Profile', 'Rank'], kind="stable", ignore_index=True)
+
+    def close(self):
+        self.pool.shutdown()
+        self._free_segments()
+
+    def _free_segments(self):
+        for segment in self.segments:
+            segment.close()
+            segment.unlink()
+        self.segments = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        return False
+
+
+def generate_recommendations_sharded(user_profiles, top_n=10, catalog=None, num_shards=None, workers=None,
+                                     chunk_size=1024):
+    """One-off sharded batch scoring; keep a ShardedScorer around to reuse its pool across calls."""
+    with ShardedScorer(catalog, num_shards, workers) as scorer:
+        return scorer.recommend_batch(user_profiles, top_n, chunk_size)
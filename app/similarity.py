@@ -0,0 +1,171 @@
+# similarity.py
+#
+# Cosine similarity kernels shared by the single-profile, batch, incremental
+# (ScoringSession) and sparse skill scoring paths.
+#
+# Job vectors are prepared once per catalog, in the catalog's dtype (float32
+# for the compiled artifact):
+#   riasec_matrix     rows L2-normalized, so cosine is a plain dot product
+#   skill_matrix      raw 0/1 rows plus inv_skill_norms, the inverse row norms,
+#                     so single skill columns can still be added and removed
+# A zero-norm row (a job with no skills, an all-zero slider profile) has
+# inverse norm 0: its similarity to everything is exactly 0, never NaN.
+#
+#   python similarity.py [--catalog data/job_profiles_clean.csv]    # check the engine against a float64 reference
+#
+# tests/test_similarity.py checks rankings and scores against the original
+# scikit-learn cosine_similarity formulation.
+
+import argparse
+import sys
+
+import numpy as np
+
+PARITY_TOLERANCE = 1e-5  # float32 catalogs carry about 7 significant digits
+
+
+def inverse_norms(norms):
+    """Elementwise 1 / norm, with 0 where the norm is 0."""
+    norms = np.asarray(norms)
+    return np.divide(1.0, norms, out=np.zeros_like(norms), where=norms > 0)
+
+
+def inverse_row_norms(matrix):
+    """Inverse L2 norm of each row of a dense matrix; 0 for all-zero rows."""
+    return inverse_norms(np.linalg.norm(matrix, axis=1))
+
+
+def inverse_norm(vector):
+    """Inverse L2 norm of one vector as a Python float; 0 for the zero vector."""
+    norm = float(np.sqrt(np.dot(vector, vector)))
+    return 1 / norm if norm > 0 else 0.0
+
+
+def normalize_rows(matrix):
+    """L2-normalize each row; all-zero rows stay zero."""
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms > 0)
+
+
+def scale_to_cosine(dots, inv_row_norms, inv_user_norms):
+    """
+    Turn dot products into cosine similarities in place. ``dots`` is either
+    one user against the jobs (n_jobs,) with a scalar ``inv_user_norms``, or
+    (n_users, n_jobs) with one inverse norm per user.
+    """
+    if dots.ndim == 2:
+        dots *= np.asarray(inv_user_norms, dtype=dots.dtype)[:, None]
+    else:
+        dots *= inv_user_norms
+    dots *= inv_row_norms
+    return dots
+
+
+def cosine_similarities(matrix, inv_row_norms, user, out=None):
+    """Cosine similarity of one user vector against every row of ``matrix``."""
+    out = np.matmul(matrix, user, out=out)
+    return scale_to_cosine(out, inv_row_norms, inverse_norm(user))
+
+
+def cosine_similarity_matrix(users, matrix, inv_row_norms):
+    """(n_users, n_jobs) cosine similarities of every user row against every row of ``matrix``."""
+    dots = users @ matrix.T
+    return scale_to_cosine(dots, inv_row_norms, inverse_row_norms(users))
+
+
+# --- Parity check ---
+def _reference_cosine(users, jobs):
+    """Textbook float64 cosine, 0 where either side is the zero vector."""
+    users = np.asarray(users, dtype=np.float64)
+    jobs = np.asarray(jobs, dtype=np.float64)
+    norms = np.linalg.norm(users, axis=1)[:, None] * np.linalg.norm(jobs, axis=1)[None, :]
+    return np.divide(users @ jobs.T, norms, out=np.zeros(norms.shape), where=norms > 0)
+
+
+def check_parity(catalog=None, num_profiles=200, seed=0):
+    """
+    Score random profiles (including all-zero sliders and no skills) through
+    the single, incremental (ScoringSession) and batch kernels, and the
+    sparse skill index when one is built, against every job, and compare
+    the RIASEC and skill similarities with a float64 reference.
+    Returns ``{path: max absolute error}``.
+    """
+    from recommender_engine import (
+        RIASEC_TRAITS, ScoringSession, _score_components, _score_into, _user_matrices, get_catalog,
+    )
+    from sparse_skills import get_skill_index
+
+    if catalog is None:
+        catalog = get_catalog()
+    rng = np.random.default_rng(seed)
+    profiles = []
+    for n in range(num_profiles):
+        riasec = np.zeros(len(RIASEC_TRAITS)) if n % 10 == 0 else rng.uniform(0, 7, len(RIASEC_TRAITS))
+        skills = [] if n % 7 == 0 else list(rng.choice(catalog.skill_cols, size=rng.integers(1, 6), replace=False))
+        profiles.append(dict(zip(RIASEC_TRAITS, riasec.tolist()), education_level=1.0, skills=skills))
+
+    user_riasec, user_education, user_skills = _user_matrices(catalog, profiles)
+    riasec_reference = _reference_cosine([[p[t] for t in RIASEC_TRAITS] for p in profiles], catalog.riasec_scores)
+    skill_reference = _reference_cosine(user_skills, catalog.skill_matrix)
+
+    def error(riasec, skill, rows=slice(None)):
+        return max(float(np.abs(riasec - riasec_reference[rows]).max()),
+                   float(np.abs(skill - skill_reference[rows]).max()))
+
+    errors = {"single": 0.0, "session": 0.0}
+    workspace = catalog.workspace()
+    session = ScoringSession()
+    for n, profile in enumerate(profiles):
+        _score_into(catalog, user_riasec[n], user_education[n], user_skills[n], workspace, catalog.size)
+        errors["single"] = max(errors["single"], error(workspace.components[0], workspace.components[2], n))
+        session.update(profile, catalog=catalog)
+        components = session._workspace.components
+        errors["session"] = max(errors["session"], error(components[0], components[2], n))
+
+    riasec, _, skill = _score_components(catalog, user_riasec, user_education, user_skills, catalog.size)
+    errors["batch"] = error(riasec, skill)
+
+    skill_index = get_skill_index(catalog)
+    if skill_index is not None:
+        feature_sets = [
+            {name: float(weight) for name, weight in zip(
+                rng.choice(skill_index.feature_names, size=5, replace=False), rng.uniform(0.1, 1, 5))}
+            for _ in range(50)
+        ] + [{}]
+        users = np.zeros((len(feature_sets), len(skill_index.feature_names)))
+        for row, features in enumerate(feature_sets):
+            positions, weights = skill_index.user_vector(features)
+            users[row, positions] = weights
+        reference = _reference_cosine(users, skill_index.job_features.toarray())
+        single = np.array([skill_index.similarities(features) for features in feature_sets])
+        errors["sparse"] = max(float(np.abs(single - reference).max()),
+                               float(np.abs(skill_index.similarity_matrix(feature_sets) - reference).max()))
+    return errors
+
+
+def load_catalog(path):
+    """A JobCatalog from a compiled artifact (.bin) or a job profiles CSV."""
+    if path.endswith(".bin"):
+        from catalog_artifact import open_catalog
+        return open_catalog(path)
+    from recommender_engine import JobCatalog
+    return JobCatalog.from_csv(path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check the engine's similarity kernels against a float64 reference.")
+    parser.add_argument("--catalog", default=None,
+                        help="job profiles CSV or compiled artifact (.bin) to check (default: the current catalog)")
+    parser.add_argument("--profiles", type=int, default=200, help="random profiles to score (default: %(default)s)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    catalog = None if args.catalog is None else load_catalog(args.catalog)
+    errors = check_parity(catalog, num_profiles=args.profiles, seed=args.seed)
+    for path, err in errors.items():
+        print(f"{path:8s} max abs error {err:.2e}")
+    return 0 if max(errors.values()) <= PARITY_TOLERANCE else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,254 @@
+# sparse_skills.py
+#
+# Sparse skill / technology index over the job catalog.
+#
+# Features per job:
+#   'Skill List_<name>'   the catalog's one-hot skill columns (weight 1)
+#   'skill:<name>'        O*NET skills from Skills.xlsx, weighted by
+#                         importance (IM, 1-5) x level (LV, 0-7), scaled to 0-1
+#   'technology:<name>'   Technology Skills.xlsx examples (weight 1)
+#   'tool:<name>'         Tools Used.xlsx examples (weight 1)
+#
+# The job x feature matrix is stored as CSR with precomputed inverse row
+# norms, plus its transpose (feature x job CSR) as an inverted index. A user
+# selects a handful of features, so scoring one user only touches those
+# features' posting lists: latency and memory stay flat as the feature space
+# grows from a few dozen skill columns to thousands of technologies.
+#
+#   python sparse_skills.py    # build data/skill_index.npz for the current catalog
+
+import argparse
+import threading
+
+import numpy as np
+import scipy.sparse as sp
+
+from build_catalog import DATA_DIR, load_workbooks
+from similarity import inverse_norm, inverse_norms, scale_to_cosine
+
+SKILL_INDEX_PATH = "data/skill_index.npz"
+SKILL_WORKBOOKS = ["skills", "technology_skills", "tools_used"]
+
+
+class SparseSkillIndex:
+    """Cosine similarity between sparse user feature vectors and every job."""
+
+    def __init__(self, job_features, feature_names, catalog_version):
+        self.job_features = sp.csr_matrix(job_features, dtype=np.float32)
+        self.job_features.sum_duplicates()
+        self.feature_jobs = self.job_features.T.tocsr()
+        self.feature_jobs.sort_indices()
+        self.feature_names = list(feature_names)
+        self.feature_positions = {name: i for i, name in enumerate(self.feature_names)}
+        self.catalog_version = catalog_version
+
+        row_norms = np.sqrt(np.asarray(self.job_features.multiply(self.job_features).sum(axis=1)).ravel())
+        self.inv_row_norms = inverse_norms(row_norms).astype(np.float32)
+
+    @property
+    def size(self):
+        return self.job_features.shape[0]
+
+    def user_vector(self, features):
+        """
+        Feature positions and weights for ``{feature: weight}``; names the
+        index does not know are ignored.
+        """
+        known = [(self.feature_positions[name], weight) for name, weight in features.items()
+                 if name in self.feature_positions and weight]
+        positions = np.array([position for position, _ in known], dtype=np.intp)
+        weights = np.array([weight for _, weight in known], dtype=np.float32)
+        return positions, weights
+
+    def similarities(self, features, size=None, out=None):
+        """
+        Cosine similarity of one user's ``{feature: weight}`` against the
+        first ``size`` jobs, written into ``out`` (allocated if not given).
+        Cost is proportional to the selected features' posting lists.
+        """
+        size = self.size if size is None else size
+        if out is None:
+            out = np.zeros(size, dtype=np.float32)
+        out[:size] = 0
+
+        positions, weights = self.user_vector(features)
+        inv_user_norm = inverse_norm(weights)
+        if inv_user_norm == 0:
+            return out
+
+        indptr, indices, data = self.feature_jobs.indptr, self.feature_jobs.indices, self.feature_jobs.data
+        for position, weight in zip(positions, weights):
+            start, end = indptr[position], indptr[position + 1]
+            jobs = indices[start:end]
+            end = start + np.searchsorted(jobs, size)  # posting lists are sorted by job
+            out[indices[start:end]] += weight * data[start:end]
+        scale_to_cosine(out[:size], self.inv_row_norms[:size], inv_user_norm)
+        return out
+
+    def similarity_matrix(self, feature_sets, size=None):
+        """Dense (n_users, size) cosine similarities for many users in one sparse product."""
+        size = self.size if size is None else size
+        rows, cols, values = [], [], []
+        for row, features in enumerate(feature_sets):
+            positions, weights = self.user_vector(features)
+            rows.extend([row] * len(positions))
+            cols.extend(positions)
+            values.extend(weights * inverse_norm(weights))
+        users = sp.csr_matrix(
+            (values, (rows, cols)), shape=(len(feature_sets), len(self.feature_names)), dtype=np.float32
+        )
+        scores = (users @ self.job_features[:size].T).toarray()
+        scores *= self.inv_row_norms[None, :size]  # user rows are already unit length
+        return scores
+
+    def remap(self, catalog, previous_rows, changed):
+        """
+        The index for ``catalog``, derived from this one after a delta
+        (catalog_snapshots.apply_delta): row r takes the O*NET features of
+        old row ``previous_rows[r]`` (none for -1), and rows in ``changed``
+        take their 'Skill List_' features from the new catalog.
+        """
+        previous_rows = np.asarray(previous_rows)
+        kept = np.flatnonzero(previous_rows >= 0)
+        features = self.job_features[previous_rows[kept]].tocoo()
+        rows, cols, values = kept[features.row], features.col, features.data
+
+        feature_names = list(self.feature_names)
+        positions = dict(self.feature_positions)
+        skill_cols = set(catalog.skill_cols)
+        catalog_features = np.array([name in skill_cols for name in feature_names], dtype=bool)
+        replaced = np.asarray(changed)[rows] & catalog_features[cols]
+        rows, cols, values = rows[~replaced], cols[~replaced], values[~replaced]
+
+        changed_rows = np.flatnonzero(changed)
+        dense_rows, dense_cols = np.nonzero(catalog.skill_matrix[changed_rows])
+        for name in catalog.skill_cols:
+            if name not in positions:
+                positions[name] = len(feature_names)
+                feature_names.append(name)
+        skill_positions = np.array([positions[name] for name in catalog.skill_cols], dtype=np.int64)
+        job_features = sp.csr_matrix(
+            (
+                np.concatenate([values, np.asarray(catalog.skill_matrix[changed_rows])[dense_rows, dense_cols]]),
+                (np.concatenate([rows, changed_rows[dense_rows]]), np.concatenate([cols, skill_positions[dense_cols]])),
+            ),
+            shape=(catalog.size, len(feature_names)), dtype=np.float32,
+        )
+        return SparseSkillIndex(job_features, feature_names, catalog.version)
+
+    def save(self, path=SKILL_INDEX_PATH):
+        np.savez(
+            path,
+            data=self.job_features.data,
+            indices=self.job_features.indices,
+            indptr=self.job_features.indptr,
+            shape=np.array(self.job_features.shape),
+            feature_names=np.array(self.feature_names, dtype=str),
+            catalog_version=np.array(self.catalog_version, dtype=str),
+        )
+
+    @classmethod
+    def load(cls, path=SKILL_INDEX_PATH):
+        with np.load(path) as saved:
+            job_features = sp.csr_matrix(
+                (saved["data"], saved["indices"], saved["indptr"]), shape=tuple(saved["shape"])
+            )
+            return cls(job_features, saved["feature_names"].tolist(), str(saved["catalog_version"]))
+
+
+def build_skill_index(catalog, data_dir=DATA_DIR, workers=None, log=print):
+    """Build the index for ``catalog`` from the Skills, Technology Skills and Tools Used workbooks."""
+    if catalog.onet_codes is None:
+        raise KeyError("Missing 'ONET_Code' in dataset; the skill index is keyed by O*NET-SOC code")
+    sheets = load_workbooks(SKILL_WORKBOOKS, data_dir, workers, log)
+    rows_by_code = {code: row for row, code in enumerate(catalog.onet_codes)}
+
+    entries = []  # (job codes, feature names, weights)
+
+    # --- Catalog skill columns ---
+    dense_rows, dense_cols = np.nonzero(catalog.skill_matrix)
+    entries.append((
+        [catalog.onet_codes[row] for row in dense_rows],
+        [catalog.skill_cols[col] for col in dense_cols],
+        np.asarray(catalog.skill_matrix)[dense_rows, dense_cols],
+    ))
+
+    # --- O*NET skills: importance x level ---
+    ratings = sheets["skills"].pivot_table(
+        index=['ONET_Code', 'Element Name'], columns='Scale ID', values='Data Value'
+    ).reset_index()
+    weights = (ratings['IM'] / 5) * (ratings['LV'] / 7)
+    entries.append((ratings['ONET_Code'], "skill:" + ratings['Element Name'], weights))
+
+    # --- Technologies and tools ---
+    for sheet, prefix in (("technology_skills", "technology:"), ("tools_used", "tool:")):
+        examples = sheets[sheet][['ONET_Code', 'Example']].drop_duplicates()
+        entries.append((examples['ONET_Code'], prefix + examples['Example'], np.ones(len(examples))))
+
+    feature_positions = {}
+    rows, cols, values = [], [], []
+    for codes, names, weights in entries:
+        for code, name, weight in zip(codes, names, weights):
+            row = rows_by_code.get(code)
+            if row is None or not weight > 0:
+                continue
+            rows.append(row)
+            cols.append(feature_positions.setdefault(name, len(feature_positions)))
+            values.append(weight)
+
+    job_features = sp.csr_matrix(
+        (values, (rows, cols)), shape=(catalog.size, len(feature_positions)), dtype=np.float32
+    )
+    log(f"Skill index: {catalog.size} jobs x {len(feature_positions)} features, {job_features.nnz} entries")
+    return SparseSkillIndex(job_features, list(feature_positions), catalog.version)
+
+
+# --- Process-wide index ---
+_skill_index = None
+_rejected = None  # (path, catalog version) of a saved index built for another catalog
+_skill_index_lock = threading.Lock()
+
+
+def get_skill_index(catalog, path=None):
+    """
+    The saved skill index for ``catalog``, loaded on first use; None if no
+    index was built for this catalog version. ``path`` defaults to the
+    catalog snapshot's copy, else SKILL_INDEX_PATH.
+
+    A file built for another catalog is not re-read until the path or the
+    catalog version changes.
+    """
+    global _skill_index, _rejected
+    if path is None:
+        path = catalog.data_path(SKILL_INDEX_PATH)
+    with _skill_index_lock:
+        if _skill_index is None or _skill_index.catalog_version != catalog.version:
+            if _rejected == (path, catalog.version):
+                return None
+            try:
+                skill_index = SparseSkillIndex.load(path)
+            except FileNotFoundError:
+                return None
+            if skill_index.catalog_version != catalog.version:
+                _rejected = (path, catalog.version)
+                return None
+            _rejected = None
+            _skill_index = skill_index
+        return _skill_index
+
+
+def main(argv=None):
+    from recommender_engine import get_catalog
+
+    parser = argparse.ArgumentParser(description="Build the sparse skill / technology index for the current catalog.")
+    parser.add_argument("--data-dir", default=DATA_DIR, help="directory holding the O*NET .xlsx files (default: %(default)s)")
+    parser.add_argument("--output", default=SKILL_INDEX_PATH, help="index file to write (default: %(default)s)")
+    parser.add_argument("--workers", type=int, default=None, help="parser processes")
+    args = parser.parse_args(argv)
+
+    build_skill_index(get_catalog(), args.data_dir, args.workers).save(args.output)
+    print(f"Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
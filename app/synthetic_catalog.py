@@ -0,0 +1,153 @@
+# synthetic_catalog.py
+#
+# Deterministic synthetic job catalogs with the schema build_catalog.py
+# writes, for benchmarks and load tests at sizes the O*NET data cannot reach
+# (about 900 occupations).
+#
+# Distributions follow the real table: min-max scaled RIASEC scores with a
+# dominant trait or two per job, Education Category 1-12 weighted like O*NET
+# (mostly high school to bachelor's), Job Zone tracking education, and
+# usually five or six of the six 'Skill List_' education/training components
+# per job (NaN where absent, as the left merge leaves them). Extra synthetic
+# skill columns can be added to model wider skill matrices. The same size and
+# seed always give the same table.
+#
+#   python synthetic_catalog.py --jobs 100k --output data/job_profiles_clean.csv [--artifact]
+
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from build_catalog import EDUCATION_LEVEL_MAP, INTEREST_HIGH_POINTS
+from recommender_engine import RIASEC_TRAITS, SKILL_PREFIX
+
+SIZES = {"1k": 1_000, "10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+
+# The six Education, Training, and Experience components that become 'Skill List_' columns
+SKILL_COMPONENTS = [
+    "Apprenticeship", "Job-Related Professional Certification", "On-Site or In-Plant Training",
+    "On-the-Job Training", "Related Work Experience", "Required Level of Education",
+]
+# Share of O*NET occupations per Education Category (1-12) of their dominant component
+CATEGORY_WEIGHTS = np.array([4, 22, 10, 6, 8, 26, 2, 10, 1, 4, 6, 1], dtype=float)
+PREPARATION_LEVELS = [
+    "None", "Up to and including 1 month", "Over 1 month, up to and including 3 months",
+    "Over 3 months, up to and including 6 months", "Over 6 months, up to and including 1 year",
+    "Over 1 year, up to and including 2 years", "Over 2 years, up to and including 4 years",
+    "Over 4 years, up to and including 10 years", "Over 10 years",
+]
+WORDS = (
+    "plan direct coordinate operate install maintain repair inspect analyze design develop test "
+    "prepare record review manage supervise assist advise teach treat monitor evaluate research "
+    "equipment systems records programs materials patients students customers products services "
+    "procedures policies reports budgets data structures vehicles machinery software facilities"
+).split()
+
+
+def parse_size(size):
+    """Job count for '1k', '10k', '100k', '1m' or a plain number."""
+    return SIZES[size.lower()] if size.lower() in SIZES else int(size)
+
+
+def _onet_codes(num_jobs):
+    # Unique for up to 89 * 10000 * 100 jobs: major group, detailed code, then suffix
+    jobs = np.arange(num_jobs)
+    groups = jobs // 10_000
+    return [f"{11 + group % 89:02d}-{job % 10_000:04d}.{group // 89:02d}" for job, group in zip(jobs, groups)]
+
+
+def _descriptions(rng, num_jobs, words_per_job=24, vocabulary=4096):
+    # A fixed pool of sentences keeps generation fast while giving every job realistic-length text
+    pool = [
+        " ".join(rng.choice(WORDS, words_per_job)).capitalize() + "."
+        for _ in range(min(num_jobs, vocabulary))
+    ]
+    return [pool[i] for i in rng.integers(0, len(pool), num_jobs)]
+
+
+def synthetic_job_profiles(num_jobs, seed=0, extra_skills=0):
+    """
+    A job profiles table of ``num_jobs`` rows in the job_profiles_clean.csv
+    schema, with ``extra_skills`` more 'Skill List_' columns beyond the six
+    O*NET components.
+    """
+    rng = np.random.default_rng(seed)
+
+    # --- RIASEC: one or two dominant traits per job, min-max scaled per trait ---
+    riasec = rng.gamma(1.5, 1.0, (num_jobs, len(RIASEC_TRAITS)))
+    dominant = rng.integers(0, len(RIASEC_TRAITS), (num_jobs, 2))
+    riasec[np.arange(num_jobs)[:, None], dominant] += rng.uniform(2, 5, (num_jobs, 2))
+    riasec = (riasec - riasec.min(axis=0)) / (riasec.max(axis=0) - riasec.min(axis=0))
+    high_points = np.argsort(-riasec, axis=1)[:, :len(INTEREST_HIGH_POINTS)] + 1.0
+
+    # --- Education ---
+    category = rng.choice(np.arange(1, 13), num_jobs, p=CATEGORY_WEIGHTS / CATEGORY_WEIGHTS.sum()).astype(float)
+    job_zone = np.clip(np.round(1 + (category - 1) / 11 * 4 + rng.normal(0, 0.5, num_jobs)), 1, 5)
+    components = rng.integers(0, len(SKILL_COMPONENTS), num_jobs)
+
+    profiles = pd.DataFrame({
+        'ONET_Code': _onet_codes(num_jobs),
+        'Title': [f"Synthetic Occupation {job}" for job in range(num_jobs)],
+        'Description': _descriptions(rng, num_jobs),
+    })
+    for position, trait in enumerate(RIASEC_TRAITS):
+        profiles[trait] = riasec[:, position]
+    for position, column in enumerate(INTEREST_HIGH_POINTS):
+        profiles[column] = high_points[:, position]
+    profiles['Education Level'] = np.array(SKILL_COMPONENTS)[components]
+    profiles['Data Value'] = rng.uniform(20, 100, num_jobs).round(2)
+    profiles['Education Category'] = category
+    profiles['Preparation Level'] = np.array(PREPARATION_LEVELS)[rng.integers(0, len(PREPARATION_LEVELS), num_jobs)]
+    profiles['Job Zone'] = job_zone
+    profiles['Normalized Education Score'] = (category - 1) / 11
+    profiles['Education Category Label'] = profiles['Education Category'].map(EDUCATION_LEVEL_MAP)
+
+    # --- 'Skill List_' columns: 1.0 where the job rates the component, NaN elsewhere ---
+    skills = SKILL_COMPONENTS + [f"Synthetic Skill {n + 1}" for n in range(extra_skills)]
+    present = rng.random((num_jobs, len(skills))) < np.r_[np.full(len(SKILL_COMPONENTS), 0.85), np.full(extra_skills, 0.1)]
+    present[np.arange(num_jobs), components] = True  # the dominant component is always rated
+    for position, skill in enumerate(skills):
+        profiles[SKILL_PREFIX + skill] = np.where(present[:, position], 1.0, np.nan)
+    return profiles
+
+
+def random_profiles(catalog, n, seed=0, max_skills=3):
+    """Synthetic user profiles spread over RIASEC, education and skill choices."""
+    rng = np.random.default_rng(seed)
+    profiles = []
+    for _ in range(n):
+        profile = dict(zip(RIASEC_TRAITS, rng.uniform(0, 7, len(RIASEC_TRAITS)).tolist()))
+        profile["education_level"] = float(rng.uniform(0, 1))
+        count = int(rng.integers(0, max_skills + 1))
+        profile["skills"] = list(rng.choice(catalog.skill_cols, min(count, len(catalog.skill_cols)), replace=False))
+        profiles.append(profile)
+    return profiles
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write a synthetic job profiles table.")
+    parser.add_argument("--jobs", default="10k", help="1k, 10k, 100k, 1m or a job count (default: %(default)s)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--extra-skills", type=int, default=0, help="synthetic skill columns beyond the six O*NET components")
+    parser.add_argument("--output", required=True, help="job profiles CSV to write")
+    parser.add_argument("--artifact", action="store_true", help="also compile the catalog artifact next to it")
+    args = parser.parse_args(argv)
+
+    profiles = synthetic_job_profiles(parse_size(args.jobs), args.seed, args.extra_skills)
+    tmp_path = f"{args.output}.tmp"
+    profiles.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, args.output)
+    print(f"Wrote {args.output}: {len(profiles)} jobs")
+
+    if args.artifact:
+        from catalog_artifact import compile_catalog
+        from recommender_engine import JobCatalog
+        artifact_path = os.path.join(os.path.dirname(args.output), "job_catalog.bin")
+        compile_catalog(JobCatalog.from_csv(args.output), artifact_path)
+        print(f"Wrote {artifact_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+# OccupationGraph.expand on a small hand-built graph.
+
+import numpy as np
+import pytest
+
+from occupation_graph import OccupationGraph
+
+
+@pytest.fixture
+def graph():
+    # 0 -> 1 (Primary-Short), 0 -> 2 (Supplemental), 1 -> 3 (Primary-Long), 4 is isolated
+    return OccupationGraph.from_edges(5, [0, 0, 1], [1, 2, 3], [0, 2, 1], catalog_version="test")
+
+
+def test_expand_ranks_by_relatedness(graph):
+    rows, scores, hops = graph.expand([0], top_n=10)
+    assert rows.tolist() == [1, 2, 3]
+    assert hops.tolist() == [1, 1, 2]
+    assert scores[0] == 1.0
+    assert (np.diff(scores) <= 0).all() and (scores > 0).all()
+
+
+def test_expand_excludes_seeds_and_ineligible_rows(graph):
+    rows, _, _ = graph.expand([0, 1], top_n=10, num_eligible=3)
+    assert rows.tolist() == [2]
+
+
+@pytest.mark.parametrize("top_n", [0, -1])
+def test_expand_with_no_results_requested(graph, top_n):
+    rows, scores, hops = graph.expand([0], top_n=top_n)
+    assert len(rows) == len(scores) == len(hops) == 0
@@ -0,0 +1,170 @@
+# Numerical parity of the engine's similarity kernels with the original
+# scikit-learn formulation of generate_recommendations (one
+# cosine_similarity call per component, float64, read straight from the
+# job profiles table).
+#
+# Scores must match within PARITY_TOLERANCE. Rankings must match too, with
+# one explicit rule for ties: jobs with equal hybrid scores are ordered by
+# catalog position, i.e. by education score, then by row in the table. The
+# original sorted with an unstable quicksort and left that order undefined.
+# Float32 scores that differ only in the last bits can also swap; a job may
+# appear at a rank when its baseline score is within the tolerance of that
+# rank's baseline score.
+
+import numpy as np
+import pytest
+
+from recommender_engine import (
+    EDUCATION_TOLERANCE, RIASEC_TRAITS, SKILL_PREFIX, JobCatalog, generate_recommendations_batch, recommend,
+)
+from similarity import PARITY_TOLERANCE, check_parity
+from synthetic_catalog import synthetic_job_profiles
+
+cosine_similarity = pytest.importorskip("sklearn.metrics.pairwise").cosine_similarity
+
+TOP_N = 10
+WEIGHTS = (0.4, 0.3, 0.3)
+
+
+@pytest.fixture(scope="module")
+def job_profiles():
+    profiles = synthetic_job_profiles(2000, seed=3, extra_skills=4)
+    skill_cols = [col for col in profiles.columns if col.startswith(SKILL_PREFIX)]
+    # Zero-norm rows on both sides of the cosine: jobs with no skills, jobs with all-zero RIASEC
+    profiles.loc[profiles.index[::97], skill_cols] = np.nan
+    profiles.loc[profiles.index[5::131], RIASEC_TRAITS] = 0.0
+    return profiles
+
+
+@pytest.fixture(scope="module")
+def catalog(job_profiles):
+    return JobCatalog(job_profiles, version="parity")
+
+
+def baseline_scores(job_profiles, user_profile):
+    """Hybrid score and components of every job the user qualifies for, as the original engine computed them."""
+    user_riasec = np.array([user_profile[trait] for trait in RIASEC_TRAITS], dtype=float)
+    if user_riasec.sum() > 0:
+        user_riasec = user_riasec / user_riasec.sum()
+    riasec = cosine_similarity([user_riasec], job_profiles[RIASEC_TRAITS].values)[0]
+
+    job_education = job_profiles["Normalized Education Score"].to_numpy(dtype=float)
+    user_education = user_profile.get("education_level", 0)
+    education = 1 - np.abs(job_education - user_education)
+
+    skill_cols = [col for col in job_profiles.columns if col.startswith(SKILL_PREFIX)]
+    user_skills = np.array([[1.0 if col in user_profile.get("skills", []) else 0.0 for col in skill_cols]])
+    if np.count_nonzero(user_skills) > 0:
+        skill = cosine_similarity(user_skills, job_profiles[skill_cols].fillna(0).values)[0]
+    else:
+        skill = np.zeros(len(job_profiles))
+
+    hybrid = WEIGHTS[0] * riasec + WEIGHTS[1] * education + WEIGHTS[2] * skill
+    eligible = job_education <= user_education + 0.01
+    return hybrid, riasec, education, skill, eligible
+
+
+def baseline_ranking(job_profiles, user_profile, top_n=TOP_N):
+    """Table rows of the baseline top-n under the tie rule: score, then education score, then row."""
+    hybrid, _, _, _, eligible = baseline_scores(job_profiles, user_profile)
+    rows = np.flatnonzero(eligible)
+    education = job_profiles["Normalized Education Score"].to_numpy(dtype=float)
+    order = np.lexsort((rows, education[rows], -hybrid[rows]))
+    return rows[order][:top_n]
+
+
+def user_profiles(catalog, n=60, seed=11):
+    rng = np.random.default_rng(seed)
+    profiles = [
+        # All-zero sliders and no skills: every score but education is 0, so the ranking is all ties
+        dict(zip(RIASEC_TRAITS, [0.0] * 6), education_level=0.5, skills=[]),
+        dict(zip(RIASEC_TRAITS, [0.0] * 6), education_level=1.0, skills=[catalog.skill_cols[0]]),
+        # Qualifies for nothing
+        dict(zip(RIASEC_TRAITS, [3.0] * 6), education_level=-0.5, skills=[]),
+    ]
+    for _ in range(n):
+        riasec = rng.choice(np.arange(0, 7.5, 0.5), len(RIASEC_TRAITS))  # the app's 0.5-step sliders
+        skills = list(rng.choice(catalog.skill_cols, rng.integers(0, 6), replace=False))
+        profiles.append(dict(zip(RIASEC_TRAITS, riasec.tolist()),
+                             education_level=float(rng.choice(np.linspace(0, 1, 8))), skills=skills))
+    return profiles
+
+
+def assert_matches_baseline(job_profiles, catalog, user_profile, rows, hybrid, riasec, education, skill):
+    """``rows`` (table rows, best first) and their scores against the baseline for ``user_profile``."""
+    base_hybrid, base_riasec, base_education, base_skill, _ = baseline_scores(job_profiles, user_profile)
+    expected = baseline_ranking(job_profiles, user_profile)
+    assert len(rows) == len(expected)
+
+    np.testing.assert_allclose(hybrid, base_hybrid[rows], atol=PARITY_TOLERANCE, rtol=0)
+    np.testing.assert_allclose(riasec, base_riasec[rows], atol=PARITY_TOLERANCE, rtol=0)
+    np.testing.assert_allclose(education, base_education[rows], atol=PARITY_TOLERANCE, rtol=0)
+    np.testing.assert_allclose(skill, base_skill[rows], atol=PARITY_TOLERANCE, rtol=0)
+    for rank, (row, expected_row) in enumerate(zip(rows, expected)):
+        if row != expected_row:
+            assert abs(base_hybrid[row] - base_hybrid[expected_row]) <= PARITY_TOLERANCE, (
+                f"rank {rank + 1}: job {row} instead of {expected_row}"
+            )
+
+
+def test_recommend_matches_baseline(job_profiles, catalog):
+    for user_profile in user_profiles(catalog):
+        recs = recommend(user_profile, TOP_N, catalog, use_cache=False)
+        assert_matches_baseline(
+            job_profiles, catalog, user_profile, catalog.job_ids[[rec.job for rec in recs]].astype(int),
+            [rec.hybrid_score for rec in recs], [rec.riasec_similarity for rec in recs],
+            [rec.education_similarity for rec in recs], [rec.skill_similarity for rec in recs],
+        )
+
+
+def test_batch_matches_baseline(job_profiles, catalog):
+    profiles = user_profiles(catalog)
+    results = generate_recommendations_batch(profiles, TOP_N, catalog, chunk_size=16)
+    titles = job_profiles["Title"].to_numpy()
+    rows_by_title = {title: row for row, title in enumerate(titles)}
+    for profile_id, user_profile in enumerate(profiles):
+        frame = results[results["Profile"] == profile_id]
+        assert list(frame["Rank"]) == list(range(1, len(frame) + 1))
+        assert_matches_baseline(
+            job_profiles, catalog, user_profile, np.array([rows_by_title[title] for title in frame["Title"]], dtype=int),
+            frame["Hybrid Recommendation Score"].to_numpy(), frame["User RIASEC Similarity"].to_numpy(),
+            frame["Education Similarity"].to_numpy(), frame["User Skill Similarity"].to_numpy(),
+        )
+
+
+def test_ties_follow_catalog_order(job_profiles, catalog):
+    # Every eligible job at the user's own education level scores exactly 0.3, the best possible
+    user_profile = dict(zip(RIASEC_TRAITS, [0.0] * 6), education_level=6 / 11, skills=[])
+    expected = baseline_ranking(job_profiles, user_profile)
+    single = catalog.job_ids[[rec.job for rec in recommend(user_profile, TOP_N, catalog, use_cache=False)]]
+    batch = generate_recommendations_batch([user_profile], TOP_N, catalog)
+    assert list(single) == list(expected)
+    assert list(batch["Title"]) == list(job_profiles["Title"].to_numpy()[expected])
+    assert len(set(batch["Hybrid Recommendation Score"])) == 1
+
+
+@pytest.mark.parametrize("education_level", [0.5, 0.3])  # the limit's float32 rounds down, and up
+def test_batch_eligibility_matches_single_at_the_boundary(education_level):
+    profiles = synthetic_job_profiles(200, seed=5)
+    # Jobs at the user's limit as float32 stores it, and one float32 step either side
+    limit = np.float32(education_level + EDUCATION_TOLERANCE)
+    profiles.loc[profiles.index[:3], "Normalized Education Score"] = [
+        np.nextafter(limit, np.float32(-1)), limit, np.nextafter(limit, np.float32(2)),
+    ]
+    catalog = JobCatalog(profiles, version="boundary")
+    user_profile = dict(zip(RIASEC_TRAITS, [1.0] * 6), education_level=education_level, skills=[])
+
+    num_eligible = catalog.eligible_count(education_level)
+    assert catalog.eligible_counts([education_level]).tolist() == [num_eligible]
+    assert (catalog.education_scores[:num_eligible] <= education_level + EDUCATION_TOLERANCE).all()
+    single = recommend(user_profile, catalog.size, catalog, use_cache=False)
+    batch = generate_recommendations_batch([user_profile], catalog.size, catalog)
+    assert len(single) == len(batch) == num_eligible
+    assert sorted(catalog.job_ids[[rec.job for rec in single]]) == sorted(
+        profiles.index[profiles["Title"].isin(batch["Title"])]
+    )
+
+
+def test_kernels_match_float64_reference(catalog):
+    errors = check_parity(catalog, num_profiles=100)
+    assert max(errors.values()) <= PARITY_TOLERANCE, errors
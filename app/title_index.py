@@ -0,0 +1,223 @@
+# title_index.py
+#
+# Job title autocomplete over the O*NET occupation titles, Alternate Titles
+# and Sample of Reported Titles (about 60,000 titles).
+#
+# Titles are normalized (case-folded, punctuation dropped) and stored as
+# UTF-8 string tables:
+#   keys      every normalized title, sorted, for whole-title prefix search
+#   tokens    every distinct word, sorted, with a posting list of title ids
+# Title ids are assigned best-first: occupation titles, then alternate and
+# reported titles, shorter titles first within each group. The best matches
+# are then simply the smallest ids. A query first binary-searches ``keys``
+# for titles starting with the typed text. If that yields fewer than
+# ``limit`` matches, it intersects the postings of every typed word (each
+# word a prefix, so "soft dev" finds "Software Developers") as boolean masks.
+#
+#   python title_index.py    # build data/title_index.npz
+#
+# get_title_index() loads the saved index on first use.
+
+import argparse
+import re
+import threading
+from bisect import bisect_left
+from collections import namedtuple
+
+import numpy as np
+
+from build_catalog import DATA_DIR, load_workbooks
+from catalog_columns import StringTable
+
+TITLE_INDEX_PATH = "data/title_index.npz"
+TITLE_WORKBOOKS = ["occupations", "alternate_titles", "reported_titles"]
+SOURCES = ["occupation", "alternate", "reported"]
+SUGGESTION_LIMIT = 10
+
+TitleMatch = namedtuple("TitleMatch", ["title", "onet_code", "source"])
+
+_NON_WORD = re.compile(r"[^\w]+")
+
+
+def normalize_title(text):
+    """Case-folded words separated by single spaces."""
+    return " ".join(_NON_WORD.sub(" ", text.casefold()).split())
+
+
+class TitleIndex:
+    """Prefix and token index from job titles to O*NET-SOC codes."""
+
+    def __init__(self, titles, code_ids, codes, sources, keys, key_ids, tokens, token_offsets, postings):
+        self.titles = titles
+        self.code_ids = code_ids
+        self.codes = codes
+        self.sources = sources
+        self.keys = keys
+        self.key_ids = key_ids
+        self.tokens = tokens
+        self.token_offsets = token_offsets
+        self.postings = postings
+
+    def __len__(self):
+        return len(self.titles)
+
+    @classmethod
+    def from_titles(cls, entries):
+        """Build from ``(title, onet_code, source)`` triples; duplicates per code are merged."""
+        best = {}
+        for title, code, source in entries:
+            title = " ".join(str(title).split())
+            key = normalize_title(title)
+            if not key:
+                continue
+            rank = (SOURCES.index(source), len(key), key)
+            if best.get((key, code), (rank,))[0] >= rank:
+                best[(key, code)] = (rank, title, code, source)
+        ranked = sorted(best.values())
+        titles = [title for _, title, _, _ in ranked]
+        normalized = [rank[2] for rank, _, _, _ in ranked]
+        codes = sorted({code for _, _, code, _ in ranked})
+        code_positions = {code: i for i, code in enumerate(codes)}
+
+        key_ids = np.array(sorted(range(len(normalized)), key=normalized.__getitem__), dtype=np.int32)
+
+        token_titles = {}
+        for title_id, key in enumerate(normalized):
+            for token in set(key.split()):
+                token_titles.setdefault(token, []).append(title_id)
+        tokens = sorted(token_titles)
+        token_offsets = np.zeros(len(tokens) + 1, dtype=np.int64)
+        np.cumsum([len(token_titles[token]) for token in tokens], out=token_offsets[1:])
+        postings = np.concatenate([np.array(token_titles[token], dtype=np.int32) for token in tokens]) \
+            if tokens else np.empty(0, dtype=np.int32)
+
+        return cls(
+            titles=StringTable(*StringTable.encode(titles)),
+            code_ids=np.array([code_positions[code] for _, _, code, _ in ranked], dtype=np.int32),
+            codes=StringTable(*StringTable.encode(codes)),
+            sources=np.array([SOURCES.index(source) for _, _, _, source in ranked], dtype=np.int8),
+            keys=StringTable(*StringTable.encode([normalized[i] for i in key_ids])),
+            key_ids=key_ids,
+            tokens=StringTable(*StringTable.encode(tokens)),
+            token_offsets=token_offsets,
+            postings=postings,
+        )
+
+    # --- Queries ---
+    def _prefix_range(self, table, prefix):
+        start = bisect_left(table, prefix)
+        end = bisect_left(table, prefix + "\U0010ffff", lo=start)
+        return start, end
+
+    def _word_mask(self, word):
+        """Boolean mask over title ids: titles with a word starting with ``word``."""
+        start, end = self._prefix_range(self.tokens, word)
+        mask = np.zeros(len(self.titles), dtype=bool)
+        mask[self.postings[self.token_offsets[start]:self.token_offsets[end]]] = True
+        return mask
+
+    def search(self, text, limit=SUGGESTION_LIMIT):
+        """
+        Up to ``limit`` TitleMatch records for what the user typed so far:
+        titles starting with it first, then titles containing every typed
+        word as a word prefix, best-ranked first.
+        """
+        query = normalize_title(text)
+        if not query or limit <= 0:
+            return []
+
+        start, end = self._prefix_range(self.keys, query)
+        ids = self.key_ids[start:end]
+        if len(ids) > limit:
+            ids = np.partition(ids, limit - 1)[:limit]
+        ids = np.sort(ids)
+
+        if len(ids) < limit:
+            # Scattering postings into masks avoids sorting the large unions of short word prefixes
+            matches = None
+            for word in set(query.split()):
+                mask = self._word_mask(word)
+                matches = mask if matches is None else np.logical_and(matches, mask, out=matches)
+            matches[ids] = False
+            extra = np.flatnonzero(matches)[:limit - len(ids)]
+            ids = np.concatenate([ids, extra])
+
+        return [
+            TitleMatch(self.titles[i], self.codes[int(self.code_ids[i])], SOURCES[self.sources[i]])
+            for i in ids.tolist()
+        ]
+
+    # --- Persistence ---
+    def save(self, path=TITLE_INDEX_PATH):
+        arrays = {"code_ids": self.code_ids, "sources": self.sources, "key_ids": self.key_ids,
+                  "token_offsets": self.token_offsets, "postings": self.postings}
+        for name in ("titles", "codes", "keys", "tokens"):
+            table = getattr(self, name)
+            arrays[f"{name}_offsets"] = table.offsets
+            arrays[f"{name}_data"] = table.data
+        np.savez(path, **arrays)
+
+    @classmethod
+    def load(cls, path=TITLE_INDEX_PATH):
+        with np.load(path) as saved:
+            arrays = {name: saved[name] for name in saved.files}
+        tables = {
+            name: StringTable(arrays.pop(f"{name}_offsets"), arrays.pop(f"{name}_data"))
+            for name in ("titles", "codes", "keys", "tokens")
+        }
+        return cls(**tables, **arrays)
+
+
+def build_title_index(data_dir=DATA_DIR, workers=None, log=print):
+    """Build the index from the Occupation Data, Alternate Titles and Sample of Reported Titles workbooks."""
+    sheets = load_workbooks(TITLE_WORKBOOKS, data_dir, workers, log)
+    entries = []
+    occupations = sheets["occupations"]
+    entries += zip(occupations['Title'], occupations['ONET_Code'], ["occupation"] * len(occupations))
+    for column in ('Alternate Title', 'Short Title'):
+        titles = sheets["alternate_titles"][['ONET_Code', column]].dropna()
+        entries += zip(titles[column], titles['ONET_Code'], ["alternate"] * len(titles))
+    reported = sheets["reported_titles"][['ONET_Code', 'Reported Job Title']].dropna()
+    entries += zip(reported['Reported Job Title'], reported['ONET_Code'], ["reported"] * len(reported))
+
+    index = TitleIndex.from_titles(entries)
+    log(f"Title index: {len(index)} titles, {len(index.tokens)} words, {len(index.codes)} occupations")
+    return index
+
+
+# --- Process-wide index ---
+_title_index = None
+_title_index_lock = threading.Lock()
+
+
+def get_title_index(path=TITLE_INDEX_PATH):
+    """The saved title index, loaded on first use; None if it was never built."""
+    global _title_index
+    with _title_index_lock:
+        if _title_index is None:
+            try:
+                _title_index = TitleIndex.load(path)
+            except FileNotFoundError:
+                return None
+        return _title_index
+
+
+def suggest_titles(text, limit=SUGGESTION_LIMIT):
+    """Autocomplete suggestions (TitleMatch records) for a partially typed job title."""
+    index = get_title_index()
+    return [] if index is None else index.search(text, limit)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the job title autocomplete index.")
+    parser.add_argument("--data-dir", default=DATA_DIR, help="directory holding the O*NET .xlsx files (default: %(default)s)")
+    parser.add_argument("--output", default=TITLE_INDEX_PATH, help="index file to write (default: %(default)s)")
+    parser.add_argument("--workers", type=int, default=None, help="parser processes")
+    args = parser.parse_args(argv)
+
+    build_title_index(args.data_dir, args.workers).save(args.output)
+    print(f"Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,276 @@
+# weight_tuning.py
+#
+# Offline evaluation of hybrid score weights against logged feedback.
+#
+# Each feedback rating is joined to the last usage log row of its session
+# at or before it: the profile the user submitted and the top match they
+# were shown. The question for a candidate weighting w = (RIASEC, education,
+# skills) is where that top match would have ranked for that profile. A
+# liked match should stay near the top and a disliked one should drop.
+#
+# All sessions are scored once, in batches, through the engine's
+# _score_components. For each session, every other eligible job j becomes
+# the difference d_j of its three component scores from the top match's,
+# and j outranks the top match under w exactly when w . d_j > 0 (>= 0 for
+# jobs before it in the catalog, as the engine breaks ties by position).
+# Whether that holds for every non-negative w, for none, or only for those
+# zero wherever d_j is not follows from the signs of d_j alone; those jobs
+# are counted per session once. For the remaining jobs, better on one
+# component and worse on another, w . d_j is linear along each row of the
+# simplex grid, so the weightings where j outranks form one run per row,
+# found from where the line crosses zero. Summing the runs per session gives
+# the rank under every weighting of the grid at once (5151 weightings at a
+# 0.01 step) in (jobs x grid rows) work, without re-running the engine.
+#
+# Ranking metrics per weighting, at cutoff k (rank counted from 0):
+#   rating_dcg   mean of (rating - 3) / log2(rank + 2) over rated sessions,
+#                0 past k; the objective the report is sorted by
+#   liked_mrr    mean 1 / (rank + 1) of top matches rated 4-5, 0 past k
+#   liked_hit    share of those ranked within k
+#   disliked_hit share of top matches rated 1-2 ranked within k (lower is better)
+#
+#   python weight_tuning.py [--step 0.01] [--k 10] [--top 10] [--output sweep.csv]
+#   SMARTPATH_HYBRID_WEIGHTS=0.5,0.2,0.3 streamlit run app.py    # apply the chosen weights
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+import analytics
+from analytics import EDUCATION_LEVELS
+from feedback import FEEDBACK_FILE, FeedbackStore
+from recommender_engine import (
+    HYBRID_WEIGHTS, RIASEC_TRAITS, SKILL_PREFIX, _score_components, _user_matrices, get_catalog,
+)
+
+SESSION_CELLS = 1 << 22  # (session x job) cells scored per batch
+PAIR_CELLS = 1 << 24  # (session x weighting) counts, and bytes of (job x grid row) temporaries, per pass
+LIKED = 4  # ratings at or above this count as liked
+DISLIKED = 2  # and at or below this as disliked
+
+
+def weight_grid(step=0.01):
+    """Every (RIASEC, education, skills) weighting on the simplex with the given step, as rows."""
+    n = int(round(1 / step))
+    return np.array([(a, b, n - a - b) for a in range(n + 1) for b in range(n + 1 - a)], dtype=float) / n
+
+
+def load_rated_sessions(usage_path=None, feedback_path=FEEDBACK_FILE):
+    """
+    Feedback ratings joined to the usage row they rate: one row per rating
+    with the profile columns, ``education`` label, ``skills`` and
+    ``top_match`` from the usage log.
+    """
+    usage = pd.read_csv(usage_path or analytics.USAGE_LOG, dtype={"skills": str, "session_id": str},
+                        keep_default_na=False)
+    ratings = FeedbackStore(feedback_path).load()[["timestamp", "session_id", "rating"]]
+    usage["timestamp"] = pd.to_datetime(usage["timestamp"], errors="coerce")
+    ratings["timestamp"] = pd.to_datetime(ratings["timestamp"], errors="coerce")
+    usage = usage.dropna(subset=["timestamp"]).sort_values("timestamp", kind="stable")
+    ratings = ratings.dropna(subset=["timestamp"]).sort_values("timestamp", kind="stable")
+
+    rated = pd.merge_asof(ratings, usage, on="timestamp", by="session_id", direction="backward")
+    return rated.dropna(subset=["top_match"]).reset_index(drop=True)
+
+
+def _profiles(rated):
+    return [
+        {
+            **{trait: float(row[trait]) for trait in RIASEC_TRAITS},
+            "education_level": (EDUCATION_LEVELS.index(row["education"]) + 1) / len(EDUCATION_LEVELS),
+            "skills": [SKILL_PREFIX + skill for skill in row["skills"].split(analytics.SKILL_SEPARATOR) if skill],
+        }
+        for row in rated.to_dict("records")
+    ]
+
+
+class WeightSweep:
+    """
+    Ranks of the logged top matches under every weighting of the simplex
+    grid with ``step``, followed by the ``extra`` weightings (rows) that are
+    not on it.
+    """
+
+    def __init__(self, catalog, profiles, top_rows, ratings, step=0.01, extra=(), k=10):
+        self.catalog = catalog
+        self.ratings = np.asarray(ratings, dtype=float)
+        self.n = int(round(1 / step))
+        extra = np.asarray(extra, dtype=float).reshape(-1, 3)
+        self.extra = extra[~np.isclose(np.round(extra * self.n), extra * self.n).all(axis=1)]
+        self.grid = np.vstack([weight_grid(step), self.extra])
+        self.k = k
+        self.ranks = np.empty((len(profiles), len(self.grid)), dtype=np.int32)
+        chunk = max(1, SESSION_CELLS // max(catalog.size, 1))
+        for start in range(0, len(profiles), chunk):
+            end = min(start + chunk, len(profiles))
+            self.ranks[start:end] = self._chunk_ranks(profiles[start:end], np.asarray(top_rows[start:end]))
+
+    def _chunk_ranks(self, profiles, top_rows):
+        catalog = self.catalog
+        user_riasec, user_education, user_skills = _user_matrices(catalog, profiles)
+        num_eligible = catalog.eligible_counts(user_education)
+        size = int(num_eligible.max())
+        components = np.stack(_score_components(catalog, user_riasec, user_education, user_skills, size))
+        components = components.astype(np.float64)  # (3, sessions, jobs)
+
+        sessions = np.arange(len(profiles))
+        differences = components - components[:, sessions, top_rows][:, :, None]
+        eligible = np.arange(size)[None, :] < num_eligible[:, None]
+        eligible[sessions, top_rows] = False
+
+        # Hybrid ties keep catalog order, as the engine's top-k does: a job before the
+        # top match outranks it when w . d >= 0, a job after it when w . d > 0
+        earlier = np.arange(size)[None, :] < top_rows[:, None]
+        positive = (differences > 0).any(axis=0) & eligible
+        negative = (differences < 0).any(axis=0) & eligible
+        masks = 1 << np.arange(len(differences))
+        zeros = np.einsum("csj,c->sj", (differences == 0).astype(np.int64), masks)  # equal components, as a bit mask
+        always = (earlier & ~negative & eligible) | (~earlier & positive & ~negative & (zeros == 0))
+        ranks = np.repeat(np.count_nonzero(always, axis=1).astype(np.int32)[:, None], len(self.grid), axis=1)
+
+        # With some components equal and the others all worse (before the top match) or all
+        # better (after it), only which weights are non-zero matters: w . d >= 0 exactly when
+        # w is zero wherever d is not, and w . d > 0 exactly when it is not
+        num_masks = 1 << len(differences)
+        nonzero_weights = (self.grid > 0) @ masks
+        within_zeros = (nonzero_weights[None, :] & ~np.arange(num_masks)[:, None]) == 0  # (zero masks, weightings)
+        for tied, outranks in [(earlier & ~positive & negative, within_zeros),
+                               (~earlier & positive & ~negative & (zeros > 0), ~within_zeros)]:
+            tied_sessions, tied_jobs = np.nonzero(tied)
+            histogram = np.bincount(tied_sessions * num_masks + zeros[tied_sessions, tied_jobs],
+                                    minlength=len(profiles) * num_masks).reshape(len(profiles), num_masks)
+            ranks += (histogram @ outranks).astype(np.int32)
+
+        owners, mixed_jobs = np.nonzero(positive & negative)
+        pairs = differences[:, owners, mixed_jobs].T  # (pairs, 3), grouped by session
+        inclusive = earlier[owners, mixed_jobs]
+        grid_size = len(self.grid) - len(self.extra)
+        step = max(1, PAIR_CELLS // grid_size)
+        for first in range(0, len(profiles), step):
+            selected = slice(*np.searchsorted(owners, [first, first + step]))
+            ranks[first:first + step, :grid_size] += self._grid_counts(
+                pairs[selected], inclusive[selected], owners[selected] - first, min(step, len(profiles) - first))
+        for column, weights in enumerate(self.extra, start=grid_size):
+            scores = pairs @ weights
+            outranks = np.where(inclusive, scores >= 0, scores > 0)
+            ranks[:, column] += np.bincount(owners, outranks, minlength=len(profiles)).astype(np.int32)
+        return ranks
+
+    def _grid_counts(self, pairs, inclusive, owners, num_sessions):
+        """
+        Per session, how many pairs have w . d > 0 (>= 0 where ``inclusive``)
+        at each grid weighting.
+
+        With w = (i, j, n - i - j) / n, n (w . d) = c_i + j e, where
+        c_i = i (d0 - d2) + n d2 and e = d1 - d2: for each grid row i the
+        positive weightings form one run of j, [0, j_end] or [j_start, n - i].
+        The runs go into a difference array over (session, i, j) whose
+        cumulative sum along j is the count, in (pairs x rows) work rather
+        than (pairs x weightings).
+        """
+        n = self.n
+        rows = np.arange(n + 1)
+        last = n - rows[None, :]
+        width = n + 2
+        cells = num_sessions * (n + 1) * width
+        counts = np.zeros(cells, dtype=np.int64)
+        step = max(1, PAIR_CELLS // (8 * (n + 1)))
+        for start in range(0, len(pairs), step):
+            d = pairs[start:start + step]
+            c = rows[None, :] * (d[:, 0] - d[:, 2])[:, None] + n * d[:, 2][:, None]
+            e = (d[:, 1] - d[:, 2])[:, None]
+            with np.errstate(divide="ignore", invalid="ignore"):
+                threshold = np.clip(-c / e, -1, n + 1)  # the run's boundary j, where c_i + j e = 0
+            ties = inclusive[start:start + step, None]
+            run_start = np.where(e > 0, np.where(ties, np.ceil(threshold), np.floor(threshold) + 1), 0)
+            run_end = np.where(e < 0, np.where(ties, np.floor(threshold), np.ceil(threshold) - 1), last)
+            flat = e == 0  # a constant sign along the whole row
+            positive = (c > 0) | ((c == 0) & ties)
+            run_start = np.where(flat, np.where(positive, 0, last + 1), np.clip(run_start, 0, last + 1)).astype(np.int64)
+            run_end = np.where(flat, last, np.clip(run_end, -1, last)).astype(np.int64)
+            run_end = np.maximum(run_end, run_start - 1)  # empty runs open and close at the same j
+
+            # Owners are sorted, so this pass only touches the cells from its first session on
+            first = owners[start] * (n + 1) * width
+            base = (owners[start:start + step, None] * (n + 1) + rows[None, :]) * width - first
+            opened = np.bincount((base + run_start).ravel())
+            closed = np.bincount((base + run_end + 1).ravel())
+            counts[first:first + len(opened)] += opened
+            counts[first:first + len(closed)] -= closed
+        counts = np.cumsum(counts.reshape(num_sessions, n + 1, width), axis=2)
+        on_grid = np.arange(width)[None, :] <= n - rows[:, None]  # row-major, the order of weight_grid
+        return counts[:, on_grid].astype(np.int32)
+
+    def metrics(self):
+        """DataFrame of the ranking metrics per weighting, best rating_dcg first."""
+        within = self.ranks < self.k
+        discount = np.where(within, 1 / np.log2(self.ranks + 2), 0.0)
+        liked = self.ratings >= LIKED
+        disliked = self.ratings <= DISLIKED
+
+        def mean_over(mask, values):
+            return values[mask].mean(axis=0) if mask.any() else np.full(len(self.grid), np.nan)
+
+        frame = pd.DataFrame(self.grid, columns=["riasec", "education", "skills"])
+        frame["rating_dcg"] = ((self.ratings - 3)[:, None] * discount).mean(axis=0)
+        frame["liked_mrr"] = mean_over(liked, np.where(within, 1 / (self.ranks + 1), 0.0))
+        frame["liked_hit"] = mean_over(liked, within)
+        frame["disliked_hit"] = mean_over(disliked, within)
+        return frame.sort_values("rating_dcg", ascending=False, kind="stable").reset_index(drop=True)
+
+
+def sweep(rated, step=0.01, extra=(), k=10, catalog=None):
+    """Run a WeightSweep over joined rated sessions; returns (metrics DataFrame, sessions used)."""
+    if catalog is None:
+        catalog = get_catalog()
+    titles = catalog.metadata['Title']
+    title_rows = {}
+    for row, title in enumerate(titles):
+        title_rows.setdefault(title, row)
+
+    rated = rated[rated["education"].isin(EDUCATION_LEVELS)]
+    top_rows = rated["top_match"].map(title_rows)
+    rated = rated[top_rows.notna()]
+    top_rows = top_rows[top_rows.notna()].astype(np.int64).to_numpy()
+
+    profiles = _profiles(rated)
+    # A top match the profile is no longer eligible for (e.g. after a catalog update) cannot be ranked
+    eligible = np.array([top < catalog.eligible_count(profile["education_level"])
+                         for profile, top in zip(profiles, top_rows)], dtype=bool)
+    profiles = [profile for profile, keep in zip(profiles, eligible) if keep]
+    result = WeightSweep(catalog, profiles, top_rows[eligible], rated["rating"].to_numpy()[eligible], step, extra, k)
+    return result.metrics(), len(profiles)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sweep hybrid score weights against logged feedback.")
+    parser.add_argument("--usage", default=analytics.USAGE_LOG, help="usage log (default: %(default)s)")
+    parser.add_argument("--feedback", default=FEEDBACK_FILE, help="feedback log (default: %(default)s)")
+    parser.add_argument("--step", type=float, default=0.01, help="grid step on the weight simplex (default: %(default)s)")
+    parser.add_argument("--k", type=int, default=10, help="ranking cutoff (default: %(default)s)")
+    parser.add_argument("--top", type=int, default=10, help="weightings to print (default: %(default)s)")
+    parser.add_argument("--output", default=None, help="CSV to write every weighting's metrics to")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    rated = load_rated_sessions(args.usage, args.feedback)
+    results, sessions = sweep(rated, args.step, [HYBRID_WEIGHTS], args.k)
+    print(f"{sessions} rated sessions x {len(results)} weightings in {time.perf_counter() - started:.1f}s")
+    if not sessions:
+        return
+
+    current = results[np.isclose(results[["riasec", "education", "skills"]], HYBRID_WEIGHTS).all(axis=1)].head(1)
+    pd.set_option("display.width", 120)
+    print("Current weights:")
+    print(current.to_string(index=False, float_format="{:.4f}".format))
+    print(f"Best {args.top} by rating_dcg@{args.k}:")
+    print(results.head(args.top).to_string(index=False, float_format="{:.4f}".format))
+    if args.output:
+        results.to_csv(args.output, index=False)
+        print(f"Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()